@@ -16,18 +16,17 @@ Typical Usage:
 
 Refer to the BIDS specification for more details on data type definitions.
 """
-import yaml
 from BIDSTools.resource_paths import DATATYPES_YAML
-from BIDSTools.helper import load_yaml_file
+from BIDSTools.schema_loader import load_schema_file
 
 
 
 class DataTypes:
     def __init__(self):
         """
-        Initialize a DataTypes object and load data types from a YAML file.
+        Initialize a DataTypes object with the data types of the shared, read-only schema.
         """
-        self.data_types = load_yaml_file(DATATYPES_YAML)
+        self.data_types = load_schema_file(DATATYPES_YAML)
 
     def get_data_type_value(self, data_type_name):
         """
@@ -18,9 +18,9 @@ Refer to the BIDS specification for directory structure guidelines.
 """
 
 from pathlib import Path
-import yaml
 import BIDSTools.helper as helper
-from resource_paths import DIRECTORIES_YAML
+from BIDSTools.resource_paths import DIRECTORIES_YAML
+from BIDSTools.schema_loader import load_schema_file
 
 
 class DirectoryStructure:
@@ -54,14 +54,13 @@ class DirectoryStructure:
 
         # Check if the file exists
         if absolute_path.exists():
-            with open(absolute_path, 'r') as file:
-                directory_rules = yaml.safe_load(file)
-
-                if directory_rules:
-                    self.all_directory = list(set(helper.find_keys_in_dict(
-                        directory_rules, 'level')))
-                else:
-                    print(f"yml file does not exist,{absolute_path}")
+            directory_rules = load_schema_file(absolute_path)
+
+            if directory_rules:
+                self.all_directory = list(set(helper.find_keys_in_dict(
+                    directory_rules, 'level')))
+            else:
+                print(f"yml file does not exist,{absolute_path}")
         else:
             print("check the file path :", absolute_path)
         return self.all_directory
@@ -7,16 +7,15 @@ It provides utilities to retrieve entity names and details .
 
 
 """
-import yaml
 from BIDSTools.resource_paths import ENTITIES_YAML
-from BIDSTools.helper import load_yaml_file
+from BIDSTools.schema_loader import load_schema_file
 
 class Entity:
     def __init__(self):
         """
-        Initialize an Entity object and load entities from a YAML file.
+        Initialize an Entity object with the entities of the shared, read-only schema.
         """
-        self.entities = load_yaml_file(ENTITIES_YAML)
+        self.entities = load_schema_file(ENTITIES_YAML)
 
 
 
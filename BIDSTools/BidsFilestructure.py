@@ -17,10 +17,9 @@ Typical Usage:
 Refer to the BIDS specification for file structure guidelines.
 """
 
-import yaml
-
 import os
 from BIDSTools.resource_paths import CORE_FILES_YAML, DIRECTORIES_YAML, FILES_YAML, TABLES_YAML
+from BIDSTools.schema_loader import load_schema_file
 
 class FileStructure:
     def __init__(self, relative_path=CORE_FILES_YAML):
@@ -44,17 +43,15 @@ class FileStructure:
         Retrieve all file names from the YAML file containing file structure rules.
         """
 
-        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                               FILES_YAML), 'r') as file:
-
-            file_rules = yaml.safe_load(file)
-            if file_rules:
-                for key in file_rules:
-                    self.all_files.append(key)
-                    if file_rules.get(key).get("file_type") == "regular":
-                        self.top_level_files.append(key)
-                    else:
-                        self.top_level_directory.append(key)
+        file_rules = load_schema_file(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                   FILES_YAML))
+        if file_rules:
+            for key in file_rules:
+                self.all_files.append(key)
+                if file_rules.get(key).get("file_type") == "regular":
+                    self.top_level_files.append(key)
+                else:
+                    self.top_level_directory.append(key)
 
     def get_all_files_detail(self, relative_path):
         """
@@ -64,14 +61,13 @@ class FileStructure:
             relative_path (str): The relative path to the YAML
             file containing file structure details.
         """
-        with open(relative_path, 'r') as file:
-            file_rules = yaml.safe_load(file)
-            if file_rules:
-                for key, value in file_rules.items():
-                    if key in self.top_level_files:
-                        self.top_level_file_details[key] = value
-                    else:
-                        self.top_level_directory_detail[key] = value
+        file_rules = load_schema_file(relative_path)
+        if file_rules:
+            for key, value in file_rules.items():
+                if key in self.top_level_files:
+                    self.top_level_file_details[key] = value
+                else:
+                    self.top_level_directory_detail[key] = value
 
     def get_detail(self):
         """
@@ -22,11 +22,10 @@ Example:
 See the BIDS specification for more details on modality definitions.
 """
 
-import yaml
 import os
 
 from BIDSTools.resource_paths import MODALITIES_YAML
-from BIDSTools.helper import load_yaml_file
+from BIDSTools.schema_loader import load_schema_file
 class Modality:
     def __init__(self, relative_path=None):
         """
@@ -46,12 +45,12 @@ class Modality:
         self.modalities = []
         self.modality_details = {}
 
-        with open(relative_path, "r") as file:
-            modalities_yaml = yaml.safe_load(file)
-            if modalities_yaml:
-               self.modalities = [p['display_name'].upper() for p in modalities_yaml.values()]
+        modalities_yaml = load_schema_file(relative_path)
+        if modalities_yaml:
+            self.modalities = [p['display_name'].upper() for p in modalities_yaml.values()]
 
-               self.modality_details = {p['display_name'].upper(): k for k, p in modalities_yaml.items()}
+            self.modality_details = {p['display_name'].upper(): k
+                                     for k, p in modalities_yaml.items()}
 
 def main():
     """
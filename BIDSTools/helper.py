@@ -19,6 +19,8 @@ Refer to the BIDSTools documentation for more details on helper utilities and YA
 import os
 import yaml
 
+from BIDSTools.schema_loader import load_schema_file
+
 
 def find_keys_in_dict(dictionary, target_value):
     """
@@ -107,8 +109,7 @@ def get_directories_with_details(yaml_file):
     directory_recommended = []
     top_level_directory = []
 
-    with open(yaml_file, 'r') as file:
-        data = yaml.safe_load(file)
+    data = load_schema_file(yaml_file)
 
     for directory, info in data.get('raw', {}).items():
         if 'entity' in info:
@@ -17,4 +17,9 @@ DIRECTORIES_YAML = os.path.join(RESSOURCES_DIR, 'schema', 'rules', 'directories.
 FILES_YAML = os.path.join(RESSOURCES_DIR, 'schema', 'objects', 'files.yaml')
 BIDS_VERSION = os.path.join(RESSOURCES_DIR, 'schema', 'BIDS_VERSION')
 CORE_FILES_YAML = os.path.join(RESSOURCES_DIR, 'schema', 'rules', 'files', 'common', 'core.yaml')
-TABLES_YAML = os.path.join(RESSOURCES_DIR, 'schema', 'rules', 'files', 'common', 'tables.yaml')
\ No newline at end of file
+TABLES_YAML = os.path.join(RESSOURCES_DIR, 'schema', 'rules', 'files', 'common', 'tables.yaml')
+SCHEMA_VERSION = os.path.join(RESSOURCES_DIR, 'schema', 'SCHEMA_VERSION')
+
+# YAML schemas loaded by the BIDSTools classes, parsed together and cached, see schema_loader.py
+SCHEMA_FILES = (MODALITIES_YAML, DATATYPES_YAML, ENTITIES_YAML, DIRECTORIES_YAML, FILES_YAML,
+                CORE_FILES_YAML, TABLES_YAML)
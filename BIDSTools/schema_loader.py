@@ -0,0 +1,188 @@
+"""
+schema_loader.py
+
+This module loads the YAML files of the BIDS schema shipped in the 'ressources' directory.
+Each schema file is parsed at most once per process and the parsed content is shared, read-only,
+between all BIDSTools classes.
+
+Main Features:
+- Parses the schema files used by BIDSTools (see `resource_paths.SCHEMA_FILES`) together and
+  stores them in a binary cache file (pickle), such that later processes do not parse YAML.
+- The cache file is only used while SCHEMA_VERSION and the modification times of all schema
+  files are unchanged.
+- Returns read-only dictionaries and tuples, such that the shared content can not be modified
+  by one of its users.
+
+Typical Usage:
+    from BIDSTools.schema_loader import load_schema_file
+    from BIDSTools.resource_paths import MODALITIES_YAML
+    modalities = load_schema_file(MODALITIES_YAML)
+
+The cache is stored in the directory given by the environment variable BIDSTOOLS_CACHE_DIR,
+by default '~/.cache/BIDSTools'. The cache file is read with pickle and must therefore not be
+writable by other users.
+"""
+import contextlib
+import functools
+import os
+import pickle
+import tempfile
+
+import yaml
+
+from BIDSTools.resource_paths import SCHEMA_FILES, SCHEMA_VERSION
+
+# version of the format of the cache file, to be increased when the cached content changes
+SCHEMA_CACHE_FORMAT = 1
+
+# LibYAML based loader if available, producing the same content as yaml.safe_load
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+class FrozenDict(dict):
+    """
+    Read-only dictionary containing the content of a schema file.
+
+    Behaves like a dict for all read operations, but raises a TypeError when being modified.
+    Use `dict(frozen)` to obtain a modifiable (shallow) copy.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(f"'{type(self).__name__}' object does not support modification")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+def freeze(value):
+    """
+    Convert the content of a YAML file to read-only containers.
+
+    Args:
+        value: The parsed YAML content.
+
+    Returns:
+        The content with all dictionaries converted to FrozenDict and all lists to tuples.
+    """
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def get_cache_file():
+    """
+    Get the location of the schema cache file.
+
+    Returns:
+        str: Path of the cache file.
+    """
+    cache_dir = os.environ.get('BIDSTOOLS_CACHE_DIR')
+    if cache_dir is None:
+        cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+                                 'BIDSTools')
+    return os.path.join(cache_dir, 'schema.pickle')
+
+
+def load_schema_bundle(paths=SCHEMA_FILES, cache_file=None):
+    """
+    Load multiple schema files, using the cache file if it is up to date.
+
+    The cache file is (re)written if it is missing or outdated. Failing to write the cache file
+    is ignored.
+
+    Args:
+        paths (tuple): Paths of the YAML files to load.
+        cache_file (str, optional): Path of the cache file. If not provided, no cache is used.
+
+    Returns:
+        FrozenDict: The read-only content of each file, by absolute path of the file.
+    """
+    paths = tuple(os.path.abspath(path) for path in paths)
+    key = _bundle_key(paths)
+
+    if cache_file is not None:
+        try:
+            with open(cache_file, 'rb') as file:
+                cached_key, bundle = pickle.load(file)
+            if cached_key == key:
+                return bundle
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+            # missing or unreadable cache, parse the schema files instead
+            pass
+
+    bundle = FrozenDict((path, freeze(_parse_yaml(path))) for path in paths)
+
+    if cache_file is not None:
+        _write_cache(cache_file, (key, bundle))
+    return bundle
+
+
+def load_schema_file(path):
+    """
+    Load the read-only content of a schema file.
+
+    Schema files listed in `resource_paths.SCHEMA_FILES` are loaded from the shared schema
+    bundle, other files are parsed on first use. Repeated calls return the same object.
+
+    Args:
+        path (str): Path to the YAML file.
+
+    Returns:
+        The read-only content of the file, see `freeze`.
+    """
+    path = os.path.abspath(path)
+    bundle = _shared_bundle()
+    if path in bundle:
+        return bundle[path]
+    return _load_single_file(path)
+
+
+@functools.lru_cache(maxsize=None)
+def _shared_bundle():
+    # schema bundle shared by all users in this process
+    return load_schema_bundle(SCHEMA_FILES, get_cache_file())
+
+
+@functools.lru_cache(maxsize=None)
+def _load_single_file(path):
+    return freeze(_parse_yaml(path))
+
+
+def _parse_yaml(path):
+    with open(path, 'r') as file:
+        return yaml.load(file, Loader=YAML_LOADER)
+
+
+def _bundle_key(paths):
+    # identifies the content of the schema files without parsing them
+    with open(SCHEMA_VERSION, 'r') as file:
+        schema_version = file.read().strip()
+    signatures = []
+    for path in paths:
+        stat = os.stat(path)
+        signatures.append((path, stat.st_mtime_ns, stat.st_size))
+    return SCHEMA_CACHE_FORMAT, schema_version, tuple(signatures)
+
+
+def _write_cache(cache_file, content):
+    # the cache file is replaced atomically, such that concurrent processes never read a
+    # partially written cache. The cache is optional, e.g. for read-only home directories,
+    # such that failing to write it is ignored
+    cache_dir = os.path.dirname(os.path.abspath(cache_file))
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        file = tempfile.NamedTemporaryFile('wb', dir=cache_dir, delete=False)
+    except OSError:
+        return
+    try:
+        with file:
+            pickle.dump(content, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(file.name, cache_file)
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.remove(file.name)
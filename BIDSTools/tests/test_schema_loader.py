@@ -0,0 +1,87 @@
+import os
+import sys
+import tempfile
+import unittest
+import shutil
+from unittest import mock
+
+# Ajouter le chemin du dossier parent pour trouver le package BIDSTools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from BIDSTools import schema_loader
+from BIDSTools.schema_loader import load_schema_bundle, load_schema_file, FrozenDict
+from BIDSTools.resource_paths import DATATYPES_YAML
+from BIDSTools.BidsDatatype import DataTypes
+from BIDSTools.BidsEntity import Entity
+from BIDSTools.BidsFilestructure import FileStructure
+
+
+class TestSchemaLoader(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a temporary directory containing schema files and the cache."""
+        self.outdir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.outdir, 'cache', 'schema.pickle')
+        self.schema_file = os.path.join(self.outdir, 'datatypes.yaml')
+        with open(self.schema_file, 'w') as f:
+            f.write('anat:\n  value: anat\n  extensions: [.nii, .json]\n')
+        # shared schema loaded into the temporary directory instead of the user cache
+        self.environ = mock.patch.dict(os.environ, {'BIDSTOOLS_CACHE_DIR': self.outdir})
+        self.environ.start()
+        schema_loader._shared_bundle.cache_clear()
+
+    def tearDown(self):
+        """Clean up the temporary directory after each test."""
+        self.environ.stop()
+        schema_loader._shared_bundle.cache_clear()
+        shutil.rmtree(self.outdir)
+
+    def test_cached_bundle(self):
+        bundle = load_schema_bundle([self.schema_file], self.cache_file)
+        self.assertEqual(bundle[self.schema_file],
+                         {'anat': {'value': 'anat', 'extensions': ('.nii', '.json')}})
+        self.assertTrue(os.path.exists(self.cache_file))
+
+        # the cached bundle is used without parsing the schema files
+        with mock.patch.object(schema_loader, '_parse_yaml') as parse:
+            cached = load_schema_bundle([self.schema_file], self.cache_file)
+            parse.assert_not_called()
+        self.assertEqual(cached, bundle)
+        self.assertIsInstance(cached[self.schema_file], FrozenDict)
+
+    def test_modified_schema_file(self):
+        load_schema_bundle([self.schema_file], self.cache_file)
+        with open(self.schema_file, 'w') as f:
+            f.write('beh:\n  value: beh\n')
+        stat = os.stat(self.schema_file)
+        os.utime(self.schema_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        bundle = load_schema_bundle([self.schema_file], self.cache_file)
+        self.assertEqual(bundle[self.schema_file], {'beh': {'value': 'beh'}})
+
+    def test_unwritable_cache(self):
+        blocking_file = os.path.join(self.outdir, 'cache')
+        with open(blocking_file, 'w'):
+            pass
+        bundle = load_schema_bundle([self.schema_file], self.cache_file)
+        self.assertIn('anat', bundle[self.schema_file])
+        self.assertEqual(sorted(os.listdir(self.outdir)), ['cache', 'datatypes.yaml'])
+
+    def test_read_only(self):
+        data_types = load_schema_file(DATATYPES_YAML)
+        with self.assertRaises(TypeError):
+            data_types['anat'] = {}
+        with self.assertRaises(TypeError):
+            data_types['anat'].update(value='other')
+        self.assertEqual(dict(data_types), data_types)
+
+    def test_shared_instance(self):
+        self.assertIs(DataTypes().data_types, DataTypes().data_types)
+        self.assertIs(DataTypes().data_types, load_schema_file(DATATYPES_YAML))
+        self.assertIs(Entity().entities, Entity().entities)
+        self.assertIs(FileStructure().get_detail_for_file('README'),
+                      FileStructure().get_detail_for_file('README'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,8 +3,14 @@ from datetime import datetime
 import filecmp
 import shutil
 import argparse
+import csv
+import itertools
+import logging
 import os
 import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 import bep032tools.validator.BEP032Validator
 
@@ -23,6 +29,12 @@ except ImportError:
     HAVE_NEO = False
 
 from bep032tools.validator.BEP032Validator import build_rule_regexp
+from bep032tools.generator.streaming import DEFAULT_CHUNK_SIZE
+from bep032tools.generator.fastcopy import CopyStats, copy_file, link_or_copy_file
+from bep032tools.generator.digest import DigestIndex
+from bep032tools.generator.utils import MetadataStore
+from bep032tools.generator.journal import GenerationJournal
+from bep032tools.generator.atomic import AtomicGroup, DURABILITY_LEVELS
 from bep032tools.rulesStructured import RULES_SET
 from bep032tools.rulesStructured import DATA_EXTENSIONS
 
@@ -34,6 +46,10 @@ METADATA_LEVEL_BY_NAME = {build_rule_regexp(v)[0]: k for k, values in METADATA_L
 # function inspection options
 ESSENTIAL_CSV_COLUMNS = ['sub_id']
 OPTIONAL_CSV_COLUMNS = ['ses_id', 'task', 'run', 'data_source']
+# number of csv rows read and dispatched at once when generating a dataset
+CSV_CHUNK_SIZE = 10000
+
+logger = logging.getLogger(__name__)
 
 
 class BEP032Data:
@@ -82,6 +98,8 @@ class BEP032Data:
 
         self.filename_stem = None
         self._basedir = None
+        # buffer for metadata files, see `generator.utils.MetadataStore`
+        self.metadata_store = None
 
     def register_data_sources(self, *sources, task=None, run=None):
         """
@@ -185,7 +203,9 @@ class BEP032Data:
 
         return data_folder
 
-    def organize_data_files(self, mode='link', autoconvert=None):
+    def organize_data_files(self, mode='link', autoconvert=None, conversion_cache=None,
+                            conversion_workers=1, memory_budget=None, streaming=False,
+                            digest_index=None, group=None):
         """
         Add all the data files for which info has been gathered in register_data_sources to the
         BIDS data structure
@@ -193,58 +213,125 @@ class BEP032Data:
         Parameters
         ----------
         mode: str
-            Can be either 'link', 'copy' or 'move'.
+            Can be either 'link', 'copy', 'move' or 'auto', see `create_file`.
         autoconvert: str
             accepted values: 'nix', 'nwb'. Automatically convert to the specified format.
             Warning: Using this feature can require extensive compute resources. Default: None
+        conversion_cache: ConversionCache
+            cache of converted data files. Sources that were already converted are hardlinked
+            from the cache instead of being converted again. Default: None
+        conversion_workers: int
+            number of processes used to convert data files. Default: 1
+        memory_budget: int
+            see `convert_data_files`. Default: None
+        streaming: bool
+            convert data files with bounded memory usage, see `convert_data`. Default: False
+        digest_index: DigestIndex
+            leave existing data files untouched if their content is identical, see
+            `create_file`. Default: None
+        group: AtomicGroup
+            group committing the data files, see `create_file`. Default: None (the data files
+            are committed together once all of them were created, with full durability)
+
+        Returns
+        ----------
+        list
+            `CopyStats` of each created data file. The method and transfer rate of each file
+            are also logged at INFO level.
         """
-        postfix = '_ephys'
         if self.basedir is None:
             raise ValueError('No base directory set.')
 
         if self.filename_stem is None:
             raise ValueError('No filename stem set.')
 
-        data_folder = self.get_data_folder(mode='absolute')
-
-        for key, sources in self.data.items():
-            converted_data_files = []
-
-            # add '_' prefix for filename concatenation
-            if key:
-                key = '_' + key
-
-            # convert each source to single data of valid format if required
-            for source_idx, source in enumerate(sources):
+        if group is None:
+            with AtomicGroup() as group:
+                return self.organize_data_files(mode=mode, autoconvert=autoconvert,
+                                                conversion_cache=conversion_cache,
+                                                conversion_workers=conversion_workers,
+                                                memory_budget=memory_budget,
+                                                streaming=streaming, digest_index=digest_index,
+                                                group=group)
+
+        # check all sources before starting the conversion
+        to_convert = []
+        for sources in self.data.values():
+            for source in sources:
                 if autoconvert is None:
                     if source.suffix not in DATA_EXTENSIONS:
                         raise ValueError(
                             f'Wrong file format of data {source.suffix}. '
                             f'Valid formats are {DATA_EXTENSIONS}. Use `autoconvert`'
                             f'parameter for automatic conversion.')
-                    converted_data_files.append(source)
                 elif autoconvert not in ['nwb', 'nix']:
                     raise ValueError(
                         f'`autoconvert` only accepts `nix` and `nwb` as values, '
                         f'received {autoconvert}.')
                 elif source.suffix != f'.{autoconvert}':
-                    print(f'Converting data file to {autoconvert} format.')
-                    converted_data_files.append(convert_data(source, autoconvert))
+                    to_convert.append(source)
+
+        converted = {}
+        if to_convert:
+            converted_files = convert_data_files(to_convert, autoconvert,
+                                                 workers=conversion_workers,
+                                                 memory_budget=memory_budget,
+                                                 cache=conversion_cache,
+                                                 streaming=streaming)
+            converted = dict(zip(to_convert, converted_files))
+
+        stats = []
+        for source, destination in self.get_data_files(autoconvert=autoconvert):
+            file = source if autoconvert is None else converted[source]
+            stats.append(create_file(file, destination, mode, exist_ok=True,
+                                     digest_index=digest_index, group=group))
+            logger.info('Created %s (%s): %d bytes, %.0f bytes/s', destination,
+                        stats[-1].method, stats[-1].size, stats[-1].rate)
+
+        return stats
+
+    def get_data_files(self, autoconvert=None):
+        """
+        Determine the data files created in the BIDS data structure by `organize_data_files`
+
+        Parameters
+        ----------
+        autoconvert: str
+            see `organize_data_files`
+
+        Returns
+        ----------
+        list
+            tuples of the registered source and the destination path of each data file
+        """
+        postfix = '_ephys'
+        data_folder = self.get_data_folder(mode='absolute')
+
+        data_files = []
+        for key, sources in self.data.items():
+            # add '_' prefix for filename concatenation
+            if key:
+                key = '_' + key
+
+            # gather the sources yielding a data file of valid format
+            if autoconvert is not None:
+                sources = [source for source in sources if source.suffix != f'.{autoconvert}']
 
-            for i, file in enumerate(converted_data_files):
+            for i, source in enumerate(sources):
                 # preserve the suffix
-                suffix = file.suffix
+                suffix = source.suffix if autoconvert is None else f'.{autoconvert}'
                 # append split postfix if required
                 split = ''
-                if len(converted_data_files) > 1:
+                if len(sources) > 1:
                     # note JS & ST 2022/11/30: this test is incorrect and should be reimplemented
                     # splits should be introduced only if several data files have
                     # the same values for all their entities (sub, ses, task, run etc.)
                     split = f'_split-{i}'
 
                 new_filename = self.filename_stem + key + split + postfix + suffix
-                destination = data_folder / new_filename
-                create_file(file, destination, mode, exist_ok=True)
+                data_files.append((source, data_folder / new_filename))
+
+        return data_files
 
     def generate_metadata_file_participants(self, output):
         raise NotImplementedError()
@@ -275,8 +362,14 @@ class BEP032Data:
         raise NotImplementedError()
 
     def generate_all_metadata_files(self):
-        dest_path = self.get_data_folder(mode='absolute')
+        self.generate_shared_metadata_files()
+        self.generate_session_metadata_files()
 
+    def generate_shared_metadata_files(self):
+        """
+        Generate the metadata files that are shared with other sessions or subjects, i.e. the
+        dataset description, participants, tasks and sessions files
+        """
         self.generate_metadata_file_dataset_description(self.basedir
                                                         / "dataset_description")
         self.generate_metadata_file_participants(self.basedir / f"participants")
@@ -286,6 +379,13 @@ class BEP032Data:
         if self.ses_id:
             self.generate_metadata_file_sessions(self.get_data_folder().parents[1] /
                                                  f'sub-{self.sub_id}_sessions')
+
+    def generate_session_metadata_files(self):
+        """
+        Generate the metadata files located in the data folder of this session
+        """
+        dest_path = self.get_data_folder(mode='absolute')
+
         for key in self.data.keys():
             if self.filename_stem is None:
                 raise ValueError('No filename stem set.')
@@ -319,7 +419,9 @@ class BEP032Data:
         bep032tools.validator.BEP032Validator.is_valid(self.basedir)
 
     @classmethod
-    def generate_bids_dataset(cls, csv_file, pathToDir, autoconvert=None):
+    def generate_bids_dataset(cls, csv_file, pathToDir, autoconvert=None, workers=1,
+                              conversion_cache=None, skip_identical=False, resume=False,
+                              durability='full'):
         """
         Create a bids dataset from specifications in a csv file.
         One row of the csv file corresponds to one BEP032 data file in the output BIDS dataset.
@@ -348,50 +450,287 @@ class BEP032Data:
             Path to directory where the directories will be created.
         autoconvert: str
             see `organize_data_files`
+        workers: int
+            Number of processes used to generate the dataset. Rows are grouped by subject and
+            session, such that each session folder is only written by a single process. The
+            metadata files shared between sessions (see `generate_shared_metadata_files`) are
+            generated by the calling process in a single step at the end. Default: 1
+        conversion_cache: ConversionCache
+            see `organize_data_files`
+        skip_identical: bool
+            leave existing data files untouched if their content is identical to the source.
+            Content digests are kept in an index at the top level of the dataset, such that
+            unchanged files are detected without reading them again. Default: False
+        resume: bool
+            continue an interrupted generation. The data files created are always recorded in
+            a journal at the top level of the dataset while generating, such that any
+            interrupted generation can be resumed. When resuming, rows
+            whose data files were completed are skipped and files of rows interrupted while
+            being processed are created again. Metadata files are generated for all rows.
+            Default: False
+        durability: str
+            durability of the generated files, see `atomic.AtomicGroup`. All files are
+            written atomically. The data files of a row become visible together, as do the
+            metadata files written by a process. The records of the journal are only flushed
+            with 'full' durability. Default: 'full'
         """
 
-        df = extract_structure_from_csv(csv_file)
+        rows = iter_csv_rows(csv_file)
 
         if not os.path.isdir(pathToDir):
             os.makedirs(pathToDir)
 
-        for data_kwargs in df.to_dict('index').values():
-            data_source = data_kwargs.pop('data_source', None)
-
-            # extract task and run information if present in the input csf file
-            # this should probably be extended to support all BIDS-supported entities
-            task = data_kwargs.pop('task', '')
-            run = data_kwargs.pop('run', '')
-
-            # replace empty values by good defaults for later function calls
-            if task == '':
-                task = None
-            if run == '':
-                run = None
-
-            data_instance = cls(**data_kwargs)
-            data_instance.basedir = pathToDir
-            data_instance.generate_directory_structure()
-            if data_source is not None:
-                data_instance.register_data_sources(data_source, task=task, run=run)
-                data_instance.organize_data_files(mode='copy', autoconvert=autoconvert)
-            try:
+        digest_index = DigestIndex.for_dataset(pathToDir) if skip_identical else None
+        metadata_store = MetadataStore(durability=durability)
+        journal = GenerationJournal(pathToDir, resume=resume, durability=durability)
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                running = {}
+                # most recent batch of each session, to avoid concurrent writes to a session
+                last_batch = {}
+
+                def collect(future):
+                    session = running.pop(future)
+                    if last_batch.get(session) is future:
+                        del last_batch[session]
+                    # propagate errors of the worker processes
+                    worker_changes = future.result()
+                    if digest_index is not None:
+                        digest_index.update(worker_changes)
+
+                for session, session_rows in _iter_session_batches(rows):
+                    if session in last_batch:
+                        wait([last_batch[session]])
+                        collect(last_batch[session])
+                    # bound the number of rows waiting for processing
+                    while len(running) >= 2 * workers:
+                        done, _ = wait(running, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            collect(future)
+
+                    # workers only receive the digests of the files of their session
+                    session_digest_index = None
+                    if digest_index is not None:
+                        session_digest_index = digest_index.subset(
+                            [_session_folder(pathToDir, *session)])
+                    future = executor.submit(_generate_session_rows, cls, session_rows, pathToDir,
+                                             autoconvert, conversion_cache, session_digest_index,
+                                             journal, durability)
+                    running[future] = session
+                    last_batch[session] = future
+
+                for future in list(running):
+                    wait([future])
+                    collect(future)
+
+            for row in iter_csv_rows(csv_file):
+                cls.generate_from_csv_row(row, pathToDir, stage='shared',
+                                          metadata_store=metadata_store)
+        else:
+            # metadata files of a session folder are written once the rows of the session are
+            # processed, only the shared metadata files are kept until the end
+            session_store = MetadataStore(durability=durability)
+            session = None
+            for row in rows:
+                if (row['sub_id'], row.get('ses_id')) != session:
+                    session_store.flush()
+                    session = (row['sub_id'], row.get('ses_id'))
+                cls.generate_from_csv_row(row, pathToDir, autoconvert=autoconvert,
+                                          conversion_cache=conversion_cache,
+                                          digest_index=digest_index,
+                                          metadata_store=session_store,
+                                          shared_metadata_store=metadata_store, journal=journal,
+                                          durability=durability)
+            session_store.flush()
+
+        metadata_store.flush()
+        if digest_index is not None:
+            digest_index.save()
+        journal.close()
+
+    @classmethod
+    def generate_from_csv_row(cls, row, pathToDir, autoconvert=None, stage='all',
+                              conversion_cache=None, digest_index=None, metadata_store=None,
+                              journal=None, durability='full', shared_metadata_store=None):
+        """
+        Create the part of a bids dataset specified by a single row of a csv file.
+
+        Parameters
+        ----------
+        row: dict
+            content of the csv row by column label, see `generate_bids_dataset`
+        pathToDir: str
+            Path to directory where the directories will be created.
+        autoconvert: str
+            see `organize_data_files`
+        stage: str
+            'all' to generate the data files and all metadata files, 'session' to only generate
+            the data files and the metadata files of the session folder and 'shared' to only
+            generate the metadata files shared with other sessions. Default: 'all'
+        conversion_cache: ConversionCache
+            see `organize_data_files`
+        digest_index: DigestIndex
+            see `organize_data_files`
+        metadata_store: MetadataStore
+            buffer for the generated metadata files. The pending content is not flushed.
+            Default: None (files are written directly)
+        shared_metadata_store: MetadataStore
+            buffer for the generated metadata files shared with other sessions, see
+            `generate_shared_metadata_files`. Default: None (same as `metadata_store`)
+        journal: GenerationJournal
+            journal recording the data files created. Data files are not created again if
+            the row was completed according to the journal. Default: None
+        durability: str
+            durability of the data files, see `atomic.AtomicGroup`. Default: 'full'
+
+        Returns
+        -------
+        BEP032Data
+            the instance representing the row
+        """
+        if stage not in ['all', 'session', 'shared']:
+            raise ValueError(f'Invalid generation stage "{stage}"')
+
+        data_kwargs = dict(row)
+        data_source = data_kwargs.pop('data_source', None)
+
+        # extract task and run information if present in the input csf file
+        # this should probably be extended to support all BIDS-supported entities
+        task = data_kwargs.pop('task', '')
+        run = data_kwargs.pop('run', '')
+
+        # replace empty values by good defaults for later function calls
+        if task == '':
+            task = None
+        if run == '':
+            run = None
+
+        data_instance = cls(**data_kwargs)
+        data_instance.basedir = pathToDir
+        data_instance.metadata_store = metadata_store
+        data_instance.generate_directory_structure()
+        if data_source is not None:
+            data_instance.register_data_sources(data_source, task=task, run=run)
+            if stage != 'shared':
+                unit = None if journal is None else journal.unit_id(row, autoconvert)
+                if unit is None or not journal.is_completed(unit):
+                    data_files = [destination for _, destination
+                                  in data_instance.get_data_files(autoconvert=autoconvert)]
+                    if unit is not None:
+                        journal.begin(unit, data_files)
+                    with AtomicGroup(durability) as group:
+                        data_instance.organize_data_files(mode='copy', autoconvert=autoconvert,
+                                                          conversion_cache=conversion_cache,
+                                                          digest_index=digest_index, group=group)
+                    if unit is not None:
+                        journal.commit(unit, data_files)
+        try:
+            if stage == 'all' and shared_metadata_store is not None:
+                data_instance.metadata_store = shared_metadata_store
+                data_instance.generate_shared_metadata_files()
+                data_instance.metadata_store = metadata_store
+                data_instance.generate_session_metadata_files()
+            elif stage == 'all':
                 data_instance.generate_all_metadata_files()
-            except NotImplementedError:
-                pass
+            elif stage == 'session':
+                data_instance.generate_session_metadata_files()
+            else:
+                data_instance.generate_shared_metadata_files()
+        except NotImplementedError:
+            pass
+
+        return data_instance
+
+
+def _iter_session_batches(rows):
+    # group chunks of rows by subject and session, preserving the order of rows within a session
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, CSV_CHUNK_SIZE))
+        if not chunk:
+            return
+        sessions = {}
+        for row in chunk:
+            sessions.setdefault((row['sub_id'], row.get('ses_id')), []).append(row)
+        yield from sessions.items()
+
+
+def _generate_session_rows(cls, rows, pathToDir, autoconvert, conversion_cache=None,
+                           digest_index=None, journal=None, durability='full'):
+    with MetadataStore(durability=durability) as metadata_store:
+        for row in rows:
+            cls.generate_from_csv_row(row, pathToDir, autoconvert=autoconvert, stage='session',
+                                      conversion_cache=conversion_cache,
+                                      digest_index=digest_index, metadata_store=metadata_store,
+                                      journal=journal, durability=durability)
+    # only the entries added by this process are sent back
+    return None if digest_index is None else digest_index.changes()
+
+
+def _session_folder(pathToDir, sub_id, ses_id):
+    if ses_id is None:
+        return Path(pathToDir, f'sub-{sub_id}')
+    return Path(pathToDir, f'sub-{sub_id}', f'ses-{ses_id}')
+
+
+def convert_data(source_file_or_folder, output_format, cache=None, streaming=False,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Convert a data file or folder to a BIDS-supported format using neo
 
+    Parameters
+    ----------
+    source_file_or_folder: (str, path)
+        data to be converted
+    output_format: str
+        'nix' or 'nwb'
+    cache: ConversionCache
+        cache to look up and store the converted file in. Default: None
+    streaming: bool
+        load the data lazily and transfer signals in chunks of `chunk_size` bytes, such that the
+        memory usage does not depend on the size of the data. Only supported for the 'nix'
+        format and for sources readable lazily by neo. Default: False
+    chunk_size: int
+        size of the buffer used for streaming conversion in bytes. Default: 64 MiB
 
-def convert_data(source_file_or_folder, output_format):
+    Returns
+    ----------
+    path
+        path of the converted file, located next to the source
+    """
     if not HAVE_NEO:
         raise ValueError('Conversion of data required neo package to be installed. '
                          'Use `pip install neo`')
-
-    io_read = neo.io.get_io(source_file_or_folder)
-    block = io_read.read_block()
+    if streaming and output_format != 'nix':
+        raise ValueError(f'Streaming conversion is only supported for `nix`, not {output_format}')
 
     output_file = Path(source_file_or_folder).with_suffix('.' + output_format)
 
-    if output_format == 'nix':
+    if cache is not None:
+        key = cache.key(source_file_or_folder, output_format)
+        entry = cache.get(key, output_format)
+        if entry is not None:
+            cache.link(entry, output_file)
+            return output_file
+
+    # the output file might be a link to a cached file, which must not be modified
+    output_file.unlink(missing_ok=True)
+
+    io_read = neo.io.get_io(source_file_or_folder)
+    if streaming:
+        if not io_read.support_lazy:
+            raise ValueError(f'Streaming conversion is not supported for '
+                             f'{type(io_read).__name__}')
+        block = io_read.read_block(lazy=True)
+    else:
+        block = io_read.read_block()
+
+    if streaming:
+        # only defined if neo is available
+        from bep032tools.generator.streaming import ChunkedNixIO
+        io_write = ChunkedNixIO(output_file, mode='rw', chunk_size=chunk_size)
+    elif output_format == 'nix':
         io_write = neo.NixIO(output_file, mode='rw')
     elif output_format == 'nwb':
         io_write = neo.NWBIO(str(output_file), mode='w')
@@ -412,12 +751,97 @@ def convert_data(source_file_or_folder, output_format):
         if hasattr(io, 'close'):
             io.close()
 
+    if cache is not None:
+        cache.put(key, output_format, output_file)
+
     return output_file
 
 
-def create_file(source, destination, mode, exist_ok=False):
+def convert_data_files(sources, output_format, workers=1, memory_budget=None, cache=None,
+                       streaming=False):
+    """
+    Convert multiple data files or folders to a BIDS-supported format, see `convert_data`.
+    Sources occurring multiple times are only converted once. The progress and duration of each
+    conversion is reported.
+
+    Parameters
+    ----------
+    sources: list
+        data files or folders to be converted
+    output_format: str
+        'nix' or 'nwb'
+    workers: int
+        number of processes used for the conversion. Default: 1
+    memory_budget: int
+        maximal amount of memory in bytes to be used by simultaneous conversions. The memory
+        required by a conversion is estimated by the size of its source, or by the size of the
+        streaming buffer for streaming conversions. A conversion exceeding the budget on its own
+        is only run when no other conversion is running. Default: None
+    cache: ConversionCache
+        see `convert_data`. Default: None
+    streaming: bool
+        see `convert_data`. Default: False
+
+    Returns
+    ----------
+    list
+        paths of the converted files in the order of the sources
     """
-    Create a file at a destination location
+    unique_sources = list(dict.fromkeys(Path(source) for source in sources))
+    output_files = {}
+
+    def report(source, duration):
+        print(f'[{len(output_files)}/{len(unique_sources)}] Converted {source} to '
+              f'{output_format} format ({duration:.1f} s).')
+
+    if workers <= 1 or len(unique_sources) <= 1:
+        for source in unique_sources:
+            output_files[source], duration = _timed_convert_data(source, output_format, cache,
+                                                                 streaming)
+            report(source, duration)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            queue = deque(unique_sources)
+            running = {}
+            reserved = 0
+            while queue or running:
+                while queue and len(running) < workers:
+                    size = DEFAULT_CHUNK_SIZE if streaming else _data_size(queue[0])
+                    if running and memory_budget is not None and reserved + size > memory_budget:
+                        break
+                    source = queue.popleft()
+                    future = executor.submit(_timed_convert_data, source, output_format, cache,
+                                             streaming)
+                    running[future] = (source, size)
+                    reserved += size
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    source, size = running.pop(future)
+                    reserved -= size
+                    output_files[source], duration = future.result()
+                    report(source, duration)
+
+    return [output_files[Path(source)] for source in sources]
+
+
+def _timed_convert_data(source, output_format, cache, streaming=False):
+    start = time.perf_counter()
+    output_file = convert_data(source, output_format, cache=cache, streaming=streaming)
+    return output_file, time.perf_counter() - start
+
+
+def _data_size(source):
+    source = Path(source)
+    if source.is_dir():
+        return sum(p.stat().st_size for p in source.rglob('*') if p.is_file())
+    return source.stat().st_size
+
+
+def create_file(source, destination, mode, exist_ok=False, digest_index=None, group=None):
+    """
+    Create a file at a destination location. The file is created at a temporary location and
+    renamed to the destination once complete, see `atomic.AtomicGroup`.
 
     Parameters
     ----------
@@ -426,34 +850,74 @@ def create_file(source, destination, mode, exist_ok=False):
     destination: str
         Destination location of the file.
     mode: str
-        File creation mode. Valid parameters are 'copy', 'link' and 'move'.
+        File creation mode. Valid parameters are 'copy', 'link', 'move' and 'auto'. 'copy' uses
+        the fastest copy method supported by the file system (see `fastcopy.copy_file`),
+        'auto' creates a hardlink if possible and a copy otherwise.
     exist_ok: bool
         If False, raise an Error if the destination already exist. Default: False
-        
+    digest_index: DigestIndex
+        If provided, an existing destination with the same content as the source is left
+        untouched instead of being recreated (except for the 'move' mode). Default: None
+    group: AtomicGroup
+        group committing the file. The file appears at the destination once the group is
+        committed. Default: None (the file is committed immediately with full durability)
+
+    Returns
+    ----------
+    CopyStats
+        method used, size and duration of the file creation
+
     Raises
     ----------
     ValueError
         In case of invalid creation mode.
     """
+    if group is None:
+        with AtomicGroup() as group:
+            return create_file(source, destination, mode, exist_ok=exist_ok,
+                               digest_index=digest_index, group=group)
+
+    start = time.perf_counter()
     if Path(destination).exists():
         if not exist_ok:
             raise ValueError(f'Destination already exists: {destination}')
         # ensure file content is the same
-        elif not filecmp.cmp(source, destination, shallow=True):
+        if digest_index is not None:
+            identical = digest_index.is_identical(source, destination)
+        else:
+            identical = filecmp.cmp(source, destination, shallow=True)
+        if not identical:
             raise ValueError(f'File content of source ({source}) and destination ({destination}) '
                              f'differs.')
-        # remove current version to create new version with new mode
-        Path(destination).unlink()
-
-    if mode == 'copy':
-        shutil.copy(source, destination)
-    elif mode == 'link':
-        os.link(source, destination)
-    elif mode == 'move':
-        shutil.move(source, destination)
-    else:
+        if digest_index is not None and mode != 'move':
+            return CopyStats('skip', os.stat(destination).st_size, time.perf_counter() - start)
+        # the current version is replaced by the new version with new mode on commit
+
+    if mode not in ['copy', 'auto', 'link', 'move']:
         raise ValueError(f'Invalid file creation mode "{mode}"')
 
+    if mode == 'move':
+        # moved files are committed immediately, such that aborting the group can not remove the
+        # only copy of the data
+        with AtomicGroup(group.durability) as move_group:
+            with move_group.path(destination) as tmp:
+                shutil.move(source, tmp)
+        return CopyStats(mode, os.stat(destination).st_size, time.perf_counter() - start)
+
+    # the content of hardlinks is not written and does not need to be flushed
+    with group.path(destination, sync=mode != 'link') as tmp:
+        if mode == 'copy':
+            stats = copy_file(source, tmp)
+        elif mode == 'auto':
+            stats = link_or_copy_file(source, tmp)
+        else:
+            os.link(source, tmp)
+            stats = CopyStats(mode, os.stat(tmp).st_size, time.perf_counter() - start)
+
+    if digest_index is not None:
+        group.on_commit(digest_index.record_copy, source, destination)
+    return stats
+
 
 def extract_structure_from_csv(csv_file):
     """
@@ -480,7 +944,8 @@ def extract_structure_from_csv(csv_file):
     # Check is the header contains all required names
     if not set(ESSENTIAL_CSV_COLUMNS).issubset(df.columns):
         raise ValueError(f'Csv file ({csv_file}) does not contain required information '
-                         f'({ESSENTIAL_CSV_COLUMNS}). Accepted column names are specified in the BEP.')
+                         f'({ESSENTIAL_CSV_COLUMNS}). Accepted column names are specified in the '
+                         f'BEP.')
 
     # ensure all fields contain information
     if df[ESSENTIAL_CSV_COLUMNS].isnull().values.any():
@@ -489,13 +954,58 @@ def extract_structure_from_csv(csv_file):
     return df
 
 
+def iter_csv_rows(csv_file, chunksize=CSV_CHUNK_SIZE):
+    """
+    Read the rows of a csv file that contains folder structure information.
+
+    The header of the file is checked immediately, while the rows are read in chunks of
+    `chunksize` rows on iteration, such that the memory required does not depend on the size of
+    the file. See `extract_structure_from_csv` for the expected content.
+
+    Parameters
+    ----------
+    csv_file: str
+        The file to be loaded.
+    chunksize: int
+        Number of rows read at once. Default: 10000
+
+    Returns
+    -------
+    iterator
+        dictionaries of the content of each row by column label
+    """
+    if not HAVE_PANDAS:
+        raise ImportError('Extraction of bep032tools structure from csv requires pandas.')
+
+    with open(csv_file, newline='') as f:
+        header = next(csv.reader(f), [])
+
+    # Check is the header contains all required names
+    if not set(ESSENTIAL_CSV_COLUMNS).issubset(header):
+        raise ValueError(f'Csv file ({csv_file}) does not contain required information '
+                         f'({ESSENTIAL_CSV_COLUMNS}). Accepted column names are specified in the '
+                         f'BEP.')
+
+    return _iter_csv_chunks(csv_file, chunksize)
+
+
+def _iter_csv_chunks(csv_file, chunksize):
+    with pd.read_csv(csv_file, dtype=str, na_filter=False, chunksize=chunksize) as reader:
+        for chunk in reader:
+            # ensure all fields contain information
+            if chunk[ESSENTIAL_CSV_COLUMNS].isnull().values.any():
+                raise ValueError(f'Csv file contains empty cells for mandatory fields.')
+            yield from chunk.to_dict('records')
+
+
 def main():
     """
 
     Notes
     ----------
 
-    Usage via command line: BEP032Generator.py [-h] pathToCsv pathToDir
+    Usage via command line: BEP032Generator.py [-h] [-v] [-j JOBS] [--skip-identical]
+                            [--resume] [--durability {full,relaxed}] pathToCsv pathToDir
 
     positional arguments:
         pathToCsv   Path to your csv file
@@ -504,21 +1014,45 @@ def main():
 
     optional arguments:
         -h, --help  show this help message and exit
+
+        -v, --verbose  report the method and transfer rate of each data file created
+
+        -j JOBS, --jobs JOBS  number of sessions generated in parallel
+
+        --skip-identical  leave existing data files with identical content untouched
+
+        --resume  continue an interrupted generation
+
+        --durability {full,relaxed}  durability of the generated files
     """
 
     parser = argparse.ArgumentParser()
     parser.add_argument('pathToCsv', help='Path to your csv file')
     parser.add_argument('pathToDir', help='Path to your folder')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='report the method and transfer rate of each data file created')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of sessions generated in parallel')
+    parser.add_argument('--skip-identical', action='store_true',
+                        help='leave existing data files with identical content untouched')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue an interrupted generation')
+    parser.add_argument('--durability', choices=DURABILITY_LEVELS, default='full',
+                        help='durability of the generated files')
 
     # Create two argument groups
 
     args = parser.parse_args()
+    if args.verbose:
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
 
     # Check if directory exists
     if not os.path.isdir(args.pathToDir):
         print('Directory does not exist:', args.pathToDir)
         exit(1)
-    BEP032Data.generate_bids_dataset(args.pathToCsv, args.pathToDir)
+    BEP032Data.generate_bids_dataset(args.pathToCsv, args.pathToDir, workers=args.jobs,
+                                     skip_identical=args.skip_identical, resume=args.resume,
+                                     durability=args.durability)
 
 
 if __name__ == '__main__':
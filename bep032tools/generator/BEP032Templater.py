@@ -1,5 +1,6 @@
 import shutil
 import argparse
+import logging
 import re
 
 import bep032tools.validator.BEP032Validator
@@ -14,6 +15,7 @@ from bep032tools.validator.BEP032Validator import build_rule_regexp
 from bep032tools.rulesStructured import RULES_SET
 from bep032tools.generator.utils import *
 from bep032tools.generator.BEP032Generator import BEP032Data
+from bep032tools.generator.atomic import DURABILITY_LEVELS
 
 METADATA_LEVELS = {i: r['authorized_metadata_files'] for i, r in enumerate(RULES_SET)}
 METADATA_LEVEL_BY_NAME = {build_rule_regexp(v)[0]: k for k, values in METADATA_LEVELS.items() for v
@@ -57,8 +59,8 @@ class BEP032TemplateData(BEP032Data):
             ['sub-' + self.sub_id, 'rattus norvegicus', 'p20', 'M', '2001-01-01T00:00:00']],
             columns=['participant_id', 'species', 'age', 'sex', 'birthday'])
         participant_df.set_index('participant_id', inplace=True)
-        if not output.with_suffix('.tsv').exists():
-            save_tsv(participant_df, output)
+        if not metadata_file_exists(output.with_suffix('.tsv'), store=self.metadata_store):
+            save_tsv(participant_df, output, store=self.metadata_store)
 
     def generate_metadata_file_tasks(self, output):
         # here we want to call save_json and save_tsv()
@@ -77,15 +79,15 @@ class BEP032TemplateData(BEP032Data):
             "Funding": ["The north pole fund 007"],
             "ReferencesAndLinks": "https://doi.org/007/007",
         }
-        save_json(task_dict, output)
+        save_json(task_dict, output, store=self.metadata_store)
 
     def generate_metadata_file_sessions(self, output):
         session_df = pd.DataFrame([
             ['ses-' + self.ses_id, '2009-06-15T13:45:30', '120']],
             columns=['session_id', 'acq_time', 'systolic_blood_pressure'])
         session_df.set_index('session_id', inplace=True)
-        if not output.with_suffix('.tsv').exists():
-            save_tsv(session_df, output)
+        if not metadata_file_exists(output.with_suffix('.tsv'), store=self.metadata_store):
+            save_tsv(session_df, output, store=self.metadata_store)
 
     def generate_metadata_file_probes(self, output):
         probes_df = pd.DataFrame([
@@ -96,7 +98,7 @@ class BEP032TemplateData(BEP032Data):
             columns=['probe_id', 'type', 'coordinate_space', 'material', 'x', 'y', 'z', 'shape',
                      'contact_size'])
         probes_df.set_index('probe_id', inplace=True)
-        save_tsv(probes_df, output)
+        save_tsv(probes_df, output, store=self.metadata_store)
 
     def generate_metadata_file_channels(self, output):
         channels_df = pd.DataFrame([
@@ -107,7 +109,7 @@ class BEP032TemplateData(BEP032Data):
             columns=['channel_id', 'contact_id', 'type', 'units', 'sampling_frequency', 'gain',
                      'status'])
         channels_df.set_index('channel_id', inplace=True)
-        save_tsv(channels_df, output)
+        save_tsv(channels_df, output, store=self.metadata_store)
 
     def generate_metadata_file_contacts(self, output):
         contact_df = pd.DataFrame([
@@ -121,7 +123,7 @@ class BEP032TemplateData(BEP032Data):
                      'shape',
                      'contact_size'])
         contact_df.set_index('contact_id', inplace=True)
-        save_tsv(contact_df, output)
+        save_tsv(contact_df, output, store=self.metadata_store)
 
     def generate_metadata_file_ephys(self, output):
         ephys_dict = {
@@ -153,15 +155,17 @@ class BEP032TemplateData(BEP032Data):
                 },
             },
         }
-        save_json(ephys_dict, output)
+        save_json(ephys_dict, output, store=self.metadata_store)
 
     def generate_metadata_file_scans(self, output):
         pass
 
     def generate_all_metadata_files(self):
-        dest_path = self.get_data_folder(mode='absolute')
-
         self.generate_directory_structure()
+        self.generate_shared_metadata_files()
+        self.generate_session_metadata_files()
+
+    def generate_shared_metadata_files(self):
         self.generate_metadata_file_dataset_description(
             self.basedir / "dataset_description")
         self.generate_metadata_file_participants(self.basedir / f"participants")
@@ -169,6 +173,10 @@ class BEP032TemplateData(BEP032Data):
         self.generate_metadata_file_tasks(self.basedir / f"tasks")
         self.generate_metadata_file_sessions(
             self.get_data_folder().parents[1] / f'sub-{self.sub_id}_sessions')
+
+    def generate_session_metadata_files(self):
+        dest_path = self.get_data_folder(mode='absolute')
+
         for key in self.data.keys():
             stem = f'sub-{self.sub_id}_ses-{self.ses_id}'
             if key:
@@ -268,7 +276,8 @@ def main():
     Notes
     ----------
 
-    Usage via command line: BEP032Generator.py [-h] pathToCsv pathToDir
+    Usage via command line: BEP032Templater.py [-h] [-v] [-j JOBS] [--skip-identical]
+                            [--resume] [--durability {full,relaxed}] pathToCsv pathToDir
 
     positional arguments:
         pathToCsv   Path to your csv file
@@ -277,21 +286,46 @@ def main():
 
     optional arguments:
         -h, --help  show this help message and exit
+
+        -v, --verbose  report the method and transfer rate of each data file created
+
+        -j JOBS, --jobs JOBS  number of sessions generated in parallel
+
+        --skip-identical  leave existing data files with identical content untouched
+
+        --resume  continue an interrupted generation
+
+        --durability {full,relaxed}  durability of the generated files
     """
 
     parser = argparse.ArgumentParser()
     parser.add_argument('pathToCsv', help='Path to your csv file')
     parser.add_argument('pathToDir', help='Path to your folder')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='report the method and transfer rate of each data file created')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of sessions generated in parallel')
+    parser.add_argument('--skip-identical', action='store_true',
+                        help='leave existing data files with identical content untouched')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue an interrupted generation')
+    parser.add_argument('--durability', choices=DURABILITY_LEVELS, default='full',
+                        help='durability of the generated files')
 
     # Create two argument groups
 
     args = parser.parse_args()
+    if args.verbose:
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
 
     # Check if directory exists
     if not os.path.isdir(args.pathToDir):
         print('Directory does not exist:', args.pathToDir)
         exit(1)
-    BEP032TemplateData.generate_bids_dataset(args.pathToCsv, args.pathToDir)
+    BEP032TemplateData.generate_bids_dataset(args.pathToCsv, args.pathToDir,
+                                             workers=args.jobs,
+                                             skip_identical=args.skip_identical, resume=args.resume,
+                                             durability=args.durability)
 
 
 if __name__ == '__main__':
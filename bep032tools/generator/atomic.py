@@ -0,0 +1,208 @@
+import os
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+# 'full': committed files survive a system crash, 'relaxed': committed files survive an
+# interruption of the writing process only
+DURABILITY_LEVELS = ['full', 'relaxed']
+
+
+def temp_path(path):
+    """
+    Generate a unique temporary path in the directory of a file
+
+    Parameters
+    ----------
+    path: (str, path)
+        final location of the file
+
+    Returns
+    ----------
+    path
+        hidden path next to the final location
+    """
+    path = Path(path)
+    return path.with_name(f'.{path.name}.{uuid.uuid4().hex}.tmp')
+
+
+def _fsync_file(path):
+    fd = os.open(path, os.O_RDWR)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_directory(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        # directories can not be opened on all platforms (e.g. Windows)
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class AtomicGroup:
+    """
+    Set of files committed together.
+
+    Files of the group are written to temporary files in the directory of their final location
+    and renamed to their final location when the group is committed. Files therefore never
+    appear partially written and the files of a group become visible together. If the
+    group is aborted, the temporary files are removed and existing files are left untouched.
+
+    The group can be used as a context manager, which commits the group on success and aborts
+    it if an exception occurs.
+
+    Parameters
+    ----------
+    durability: str
+        'full' to flush the files and their directory entries to disk on commit, such that
+        committed files survive a system crash. 'relaxed' to only rename the files, which is
+        faster, but only protects against interruptions of the writing process.
+        Default: 'full'
+    """
+
+    def __init__(self, durability='full'):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f'Invalid durability "{durability}". '
+                             f'Valid levels are {DURABILITY_LEVELS}.')
+        self.durability = durability
+        # tuples of temporary path, final path and whether the content needs to be flushed
+        self.pending = []
+        self.callbacks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+    @contextmanager
+    def path(self, destination, sync=True):
+        """
+        Provide a temporary path to create a file of the group at
+
+        Parameters
+        ----------
+        destination: (str, path)
+            final location of the file. An existing file is replaced on commit.
+        sync: bool
+            flush the content of the file to disk on commit. Can be disabled for files whose
+            content is not written, e.g. links. Default: True
+
+        Yields
+        ----------
+        path
+            temporary path to create the file at. Removed if an exception occurs.
+        """
+        tmp = temp_path(destination)
+        try:
+            yield tmp
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        self.pending.append((tmp, Path(destination), sync))
+
+    @contextmanager
+    def open(self, destination, mode='w', **kwargs):
+        """
+        Open a file of the group for writing, see `path`
+
+        Parameters
+        ----------
+        destination: (str, path)
+            final location of the file
+        mode: str
+            mode in which the file is opened, see `open`. Default: 'w'
+        **kwargs:
+            passed on to `open`
+
+        Yields
+        ----------
+        file object
+        """
+        with self.path(destination, sync=False) as tmp:
+            with open(tmp, mode, **kwargs) as f:
+                yield f
+                if self.durability == 'full':
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def on_commit(self, callback, *args):
+        """
+        Register a function called after the files of the group were committed
+
+        Parameters
+        ----------
+        callback: callable
+            function to call
+        *args:
+            arguments of the call
+        """
+        self.callbacks.append((callback, args))
+
+    def commit(self):
+        """
+        Move all files of the group to their final location
+        """
+        full = self.durability == 'full'
+        if full:
+            for tmp, _, sync in self.pending:
+                if sync:
+                    _fsync_file(tmp)
+
+        directories = set()
+        for tmp, destination, _ in self.pending:
+            os.replace(tmp, destination)
+            directories.add(destination.parent)
+
+        if full:
+            for directory in directories:
+                _fsync_directory(directory)
+        self.pending.clear()
+
+        for callback, args in self.callbacks:
+            callback(*args)
+        self.callbacks.clear()
+
+    def abort(self):
+        """
+        Remove the temporary files of the group
+        """
+        for tmp, _, _ in self.pending:
+            tmp.unlink(missing_ok=True)
+        self.pending.clear()
+        self.callbacks.clear()
+
+
+@contextmanager
+def atomic_open(path, mode='w', durability='full', **kwargs):
+    """
+    Open a file for writing, such that it is replaced atomically once closed, see `AtomicGroup`
+
+    Parameters
+    ----------
+    path: (str, path)
+        location of the file
+    mode: str
+        mode in which the file is opened, see `open`. Default: 'w'
+    durability: str
+        see `AtomicGroup`. Default: 'full'
+    **kwargs:
+        passed on to `open`
+
+    Yields
+    ----------
+    file object
+    """
+    with AtomicGroup(durability) as group:
+        with group.open(path, mode, **kwargs) as f:
+            yield f
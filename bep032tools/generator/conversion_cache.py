@@ -0,0 +1,198 @@
+import hashlib
+import os
+import uuid
+from pathlib import Path
+
+from bep032tools.generator.fastcopy import copy_file
+
+try:
+    import neo
+
+    HAVE_NEO = True
+except ImportError:
+    HAVE_NEO = False
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ConversionCache:
+    """
+    Content addressed storage of converted data files.
+
+    Converted files are stored under a key derived from the source data, the target format and
+    the neo version used for the conversion, such that unchanged sources are not converted again.
+    The least recently used entries are evicted once the total size of the cache exceeds
+    `max_size`. The usage of an entry is recorded by a separate marker file in the hidden `.usage`
+    folder of the cache, since the entries themselves share their modification time with all
+    files linked to them.
+
+    Parameters
+    ----------
+    cache_dir: (str, path)
+        directory in which the converted files are stored. Created if it does not exist.
+    max_size: int
+        maximal total size of the cached files in bytes. Default: None (no limit)
+    fast: bool
+        identify sources by their size, modification time and inode instead of hashing their
+        content. This avoids reading the sources, but sources modified without changing
+        these attributes are not detected. Default: False
+    """
+
+    def __init__(self, cache_dir, max_size=None, fast=False):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self.fast = fast
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.usage_dir = self.cache_dir / '.usage'
+        self.usage_dir.mkdir(exist_ok=True)
+
+    def key(self, source, output_format):
+        """
+        Generate the cache key of a conversion
+
+        Parameters
+        ----------
+        source: (str, path)
+            file or folder to be converted
+        output_format: str
+            target format of the conversion, e.g. 'nix' or 'nwb'
+
+        Returns
+        ----------
+        str
+            hexadecimal key of the conversion
+        """
+        source = Path(source)
+        if source.is_dir():
+            files = sorted(p for p in source.rglob('*') if p.is_file())
+        else:
+            files = [source]
+
+        digest = hashlib.sha256()
+        digest.update(f'{output_format}\0{neo.__version__ if HAVE_NEO else None}\0'.encode())
+        for file in files:
+            digest.update(f'{file.relative_to(source) if file != source else ""}\0'.encode())
+            if self.fast:
+                stat = file.stat()
+                digest.update(f'{stat.st_size}:{stat.st_mtime_ns}:{stat.st_ino}\0'.encode())
+            else:
+                with open(file, 'rb') as f:
+                    for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                        digest.update(chunk)
+        return digest.hexdigest()
+
+    def _entry(self, key, output_format):
+        return self.cache_dir / f'{key}.{output_format}'
+
+    def _touch(self, entry):
+        # the modification time of the marker records the last usage for the eviction
+        (self.usage_dir / entry.name).touch()
+
+    def _last_usage(self, entry):
+        try:
+            return (self.usage_dir / entry.name).stat().st_mtime_ns
+        except FileNotFoundError:
+            # entries without usage record are evicted first
+            return 0
+
+    def get(self, key, output_format):
+        """
+        Look up a converted file in the cache
+
+        Parameters
+        ----------
+        key: str
+            key of the conversion as generated by `key`
+        output_format: str
+            target format of the conversion
+
+        Returns
+        ----------
+        path
+            path of the cached file or None if the conversion is not cached
+        """
+        entry = self._entry(key, output_format)
+        if not entry.exists():
+            return None
+        self._touch(entry)
+        return entry
+
+    def put(self, key, output_format, file):
+        """
+        Add a converted file to the cache. The file is hardlinked into the cache if possible and
+        copied otherwise.
+
+        Parameters
+        ----------
+        key: str
+            key of the conversion as generated by `key`
+        output_format: str
+            target format of the conversion
+        file: (str, path)
+            converted file
+
+        Returns
+        ----------
+        path
+            path of the cached file
+        """
+        entry = self._entry(key, output_format)
+        tmp_entry = self.cache_dir / f'.{uuid.uuid4().hex}.tmp'
+        try:
+            os.link(file, tmp_entry)
+        except OSError:
+            copy_file(file, tmp_entry)
+        os.replace(tmp_entry, entry)
+        self._touch(entry)
+
+        self.evict()
+        return entry
+
+    def size(self):
+        """
+        Total size of the cached files in bytes
+        """
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _entries(self):
+        return [entry for entry in self.cache_dir.iterdir()
+                if entry.is_file() and not entry.name.startswith('.')]
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache does not exceed `max_size`
+        """
+        if self.max_size is None:
+            return
+
+        entries = [(self._last_usage(entry), entry.stat().st_size, entry)
+                   for entry in self._entries()]
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total_size <= self.max_size:
+                break
+            entry.unlink(missing_ok=True)
+            (self.usage_dir / entry.name).unlink(missing_ok=True)
+            total_size -= size
+
+    def link(self, entry, destination):
+        """
+        Provide a cached file at a destination. The file is hardlinked if possible and copied
+        otherwise.
+
+        Parameters
+        ----------
+        entry: path
+            path of the cached file as returned by `get` or `put`
+        destination: (str, path)
+            path at which the file should be provided. Existing files are replaced.
+        """
+        destination = Path(destination)
+        if destination.exists() and os.path.samefile(entry, destination):
+            return
+        destination.unlink(missing_ok=True)
+        try:
+            os.link(entry, destination)
+        except OSError:
+            copy_file(entry, destination)
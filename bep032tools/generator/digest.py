@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from bep032tools.validator.BEP032Validator import DIGEST_INDEX_FILENAME
+from bep032tools.generator.atomic import atomic_open
+
+DIGEST_INDEX_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_signature(path):
+    """
+    Signature of a file changing whenever the file is replaced or modified
+
+    Parameters
+    ----------
+    path: (str, path)
+        file to be described
+
+    Returns
+    ----------
+    list
+        inode, modification time in nanoseconds and size of the file
+    """
+    stat = os.stat(path)
+    return [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+
+
+class DigestIndex:
+    """
+    Persistent index of file content digests, used to detect identical files without
+    comparing their content.
+
+    Digests (blake2b of the file content) are cached together with the signature of the file
+    (see `file_signature`) and only recomputed when the signature changes. In addition, the
+    signatures of source and destination are recorded for each file created by copying, such that
+    an unchanged copy is recognized without reading either file.
+
+    Parameters
+    ----------
+    index_file: (str, path)
+        location of the index. Loaded if it exists and no entries are given.
+    digests: dict
+        digest entries of the index, see `subset`. Default: None
+    copies: dict
+        copy entries of the index, see `subset`. Default: None
+    """
+
+    def __init__(self, index_file, digests=None, copies=None):
+        self.index_file = Path(index_file)
+        self.digests = {}
+        self.copies = {}
+        # keys of the entries added or modified since the index was created
+        self._changed_digests = set()
+        self._changed_copies = set()
+
+        if digests is not None or copies is not None:
+            self.digests = dict(digests or {})
+            self.copies = dict(copies or {})
+            return
+
+        try:
+            with open(self.index_file) as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(content, dict) and content.get('version') == DIGEST_INDEX_VERSION:
+            self.digests = content['digests']
+            self.copies = content['copies']
+
+    @classmethod
+    def for_dataset(cls, basedir):
+        """
+        Load the index stored at the top level of a data set
+
+        Parameters
+        ----------
+        basedir: (str, path)
+            root folder of the data set
+
+        Returns
+        ----------
+        DigestIndex
+        """
+        return cls(Path(basedir) / DIGEST_INDEX_FILENAME)
+
+    def digest(self, path):
+        """
+        Content digest of a file. Computed only if the file changed since the last computation.
+
+        Parameters
+        ----------
+        path: (str, path)
+            file to be described
+
+        Returns
+        ----------
+        str
+            hexadecimal digest of the file content
+        """
+        key = os.path.abspath(path)
+        signature = file_signature(path)
+        cached = self.digests.get(key)
+        if cached is not None and cached[:3] == signature:
+            return cached[3]
+
+        digest = hashlib.blake2b()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        self.digests[key] = signature + [digest.hexdigest()]
+        self._changed_digests.add(key)
+        return digest.hexdigest()
+
+    def record_digest(self, path, digest):
+        """
+        Record the digest of a file written with known content, such that it is not read again
+
+        Parameters
+        ----------
+        path: (str, path)
+            file written
+        digest: str
+            hexadecimal blake2b digest of the content of the file
+        """
+        key = os.path.abspath(path)
+        self.digests[key] = file_signature(path) + [digest]
+        self._changed_digests.add(key)
+
+    def is_identical(self, source, destination):
+        """
+        Check if two files have the same content
+
+        Parameters
+        ----------
+        source: (str, path)
+            first file
+        destination: (str, path)
+            second file
+
+        Returns
+        ----------
+        bool
+            True if the content of the files is identical
+        """
+        if os.path.samefile(source, destination):
+            return True
+        copy = self.copies.get(os.path.abspath(destination))
+        if copy is not None and copy == [os.path.abspath(source), file_signature(source),
+                                         file_signature(destination)]:
+            return True
+        if os.path.getsize(source) != os.path.getsize(destination):
+            return False
+        return self.digest(source) == self.digest(destination)
+
+    def record_copy(self, source, destination):
+        """
+        Record that a file was created as a copy of another file
+
+        Parameters
+        ----------
+        source: (str, path)
+            file copied
+        destination: (str, path)
+            created file
+        """
+        key = os.path.abspath(destination)
+        self.copies[key] = [os.path.abspath(source), file_signature(source),
+                            file_signature(destination)]
+        self._changed_copies.add(key)
+
+    def subset(self, folders):
+        """
+        Index restricted to the files within some folders, e.g. to be passed to a different
+        process. The digests of the sources of the copies within the folders are kept as well.
+
+        Parameters
+        ----------
+        folders: list
+            folders (str, path) whose entries are kept
+
+        Returns
+        ----------
+        DigestIndex
+            index containing the selected entries
+        """
+        prefixes = tuple(os.path.join(os.path.abspath(folder), '') for folder in folders)
+        copies = {key: copy for key, copy in self.copies.items() if key.startswith(prefixes)}
+        sources = {copy[0] for copy in copies.values()}
+        digests = {key: digest for key, digest in self.digests.items()
+                   if key.startswith(prefixes) or key in sources}
+        return DigestIndex(self.index_file, digests=digests, copies=copies)
+
+    def changes(self):
+        """
+        Index containing only the entries added or modified since this index was created
+
+        Returns
+        ----------
+        DigestIndex
+            index containing the changed entries
+        """
+        return DigestIndex(self.index_file,
+                           digests={key: self.digests[key] for key in self._changed_digests},
+                           copies={key: self.copies[key] for key in self._changed_copies})
+
+    def update(self, other):
+        """
+        Add the entries of another index, e.g. filled by a different process
+
+        Parameters
+        ----------
+        other: DigestIndex
+            index to take entries from
+        """
+        self.digests.update(other.digests)
+        self.copies.update(other.copies)
+        self._changed_digests.update(other.digests)
+        self._changed_copies.update(other.copies)
+
+    def save(self):
+        """
+        Store the index. The index is replaced atomically, such that concurrent writers can only
+        lose entries, but not corrupt the index.
+        """
+        # a lost index only causes digests to be computed again
+        with atomic_open(self.index_file, durability='relaxed') as f:
+            json.dump({'version': DIGEST_INDEX_VERSION, 'digests': self.digests,
+                       'copies': self.copies}, f)
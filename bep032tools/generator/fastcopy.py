@@ -0,0 +1,175 @@
+import errno
+import os
+import shutil
+import time
+from collections import namedtuple
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+# ioctl request cloning a file on copy-on-write file systems (btrfs, xfs), see ioctl_ficlone(2)
+FICLONE = 0x40049409
+# buffer size of the userspace copy in bytes
+COPY_BUFFER_SIZE = 8 * 1024 * 1024
+# amount of data transferred per call of the kernel copy functions
+KERNEL_COPY_CHUNK_SIZE = 1024 * 1024 * 1024
+
+# errors indicating that a copy method is not supported for the given files
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.ENOTSUP, errno.EOPNOTSUPP,
+                      errno.EBADF, errno.ETXTBSY, errno.ENOTTY, errno.EPERM}
+
+
+class CopyStats(namedtuple('CopyStats', ['method', 'size', 'duration'])):
+    """
+    Summary of the creation of a file
+
+    Attributes
+    ----------
+    method: str
+        method used to create the file, e.g. 'reflink', 'copy_file_range', 'sendfile',
+        'buffered', 'link' or 'move'
+    size: int
+        size of the file in bytes
+    duration: float
+        duration of the creation in seconds
+    """
+    __slots__ = ()
+
+    @property
+    def rate(self):
+        """
+        Transfer rate in bytes per second
+        """
+        if self.duration <= 0:
+            return float('inf')
+        return self.size / self.duration
+
+
+def _reflink(src_fd, dst_fd, size):
+    if fcntl is None:
+        raise OSError(errno.ENOTSUP, 'reflink not supported on this platform')
+    fcntl.ioctl(dst_fd, FICLONE, src_fd)
+
+
+def _copy_file_range(src_fd, dst_fd, size):
+    if not hasattr(os, 'copy_file_range'):
+        raise OSError(errno.ENOSYS, 'copy_file_range not available')
+    offset = 0
+    while offset < size:
+        copied = os.copy_file_range(src_fd, dst_fd, min(KERNEL_COPY_CHUNK_SIZE, size - offset),
+                                    offset, offset)
+        _check_progress('copy_file_range', copied, offset, size)
+        offset += copied
+
+
+def _sendfile(src_fd, dst_fd, size):
+    if not hasattr(os, 'sendfile'):
+        raise OSError(errno.ENOSYS, 'sendfile not available')
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(dst_fd, src_fd, offset, min(KERNEL_COPY_CHUNK_SIZE, size - offset))
+        _check_progress('sendfile', sent, offset, size)
+        offset += sent
+
+
+def _check_progress(name, transferred, offset, size):
+    # kernel copy functions transfer no data for some file systems (e.g. procfs or some FUSE
+    # mounts) instead of failing. Nothing transferred at the start means that the method is not
+    # supported, later on the source was truncated while being copied
+    if transferred == 0:
+        if offset == 0:
+            raise OSError(errno.ENOTSUP, f'{name} did not transfer any data')
+        raise OSError(errno.EIO, f'Short copy by {name}: {offset} of {size} bytes transferred')
+
+
+def _buffered(src_fd, dst_fd, size):
+    buffer = bytearray(min(COPY_BUFFER_SIZE, max(size, 1)))
+    view = memoryview(buffer)
+    with open(src_fd, 'rb', buffering=0, closefd=False) as src, \
+            open(dst_fd, 'wb', buffering=0, closefd=False) as dst:
+        while True:
+            n_read = src.readinto(buffer)
+            if not n_read:
+                break
+            dst.write(view[:n_read])
+
+
+COPY_METHODS = [('reflink', _reflink),
+                ('copy_file_range', _copy_file_range),
+                ('sendfile', _sendfile),
+                ('buffered', _buffered)]
+
+
+def copy_file(source, destination, methods=None):
+    """
+    Copy the content and permission bits of a file using the fastest method available.
+
+    The methods are tried in order: a reflink clone sharing the data blocks on copy-on-write
+    file systems, an in-kernel copy via `os.copy_file_range` or `os.sendfile` and finally a
+    copy through a large userspace buffer.
+
+    Parameters
+    ----------
+    source: (str, path)
+        file to be copied
+    destination: (str, path)
+        path of the copy. An existing file is overwritten.
+    methods: list
+        names of the methods to try, see `COPY_METHODS`. Default: None (all methods)
+
+    Returns
+    ----------
+    CopyStats
+        method used, size and duration of the copy
+    """
+    start = time.perf_counter()
+    candidates = [(name, method) for name, method in COPY_METHODS
+                  if methods is None or name in methods]
+
+    with open(source, 'rb') as src:
+        size = os.fstat(src.fileno()).st_size
+        with open(destination, 'wb') as dst:
+            for name, method in candidates:
+                try:
+                    method(src.fileno(), dst.fileno(), size)
+                except OSError as e:
+                    if e.errno not in UNSUPPORTED_ERRNOS or name == 'buffered':
+                        raise
+                    # discard partially copied data before trying the next method
+                    dst.truncate(0)
+                    continue
+                break
+            else:
+                raise ValueError(f'No copy method available among {methods}')
+
+    shutil.copymode(source, destination)
+    return CopyStats(name, size, time.perf_counter() - start)
+
+
+def link_or_copy_file(source, destination):
+    """
+    Hardlink a file if source and destination are located on the same file system and copy it
+    using `copy_file` otherwise.
+
+    Parameters
+    ----------
+    source: (str, path)
+        file to be linked or copied
+    destination: (str, path)
+        path of the new file
+
+    Returns
+    ----------
+    CopyStats
+        method used, size and duration of the file creation
+    """
+    start = time.perf_counter()
+    try:
+        os.link(source, destination)
+    except OSError as e:
+        if e.errno not in UNSUPPORTED_ERRNOS and e.errno != errno.EMLINK:
+            raise
+        return copy_file(source, destination)
+    return CopyStats('link', os.stat(destination).st_size, time.perf_counter() - start)
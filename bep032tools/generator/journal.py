@@ -0,0 +1,163 @@
+import glob
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from bep032tools.validator.BEP032Validator import JOURNAL_FILENAME
+from bep032tools.generator.atomic import DURABILITY_LEVELS
+from bep032tools.generator.digest import file_signature
+
+
+class GenerationJournal:
+    """
+    Write-ahead journal of the data files created while generating a dataset.
+
+    Each unit of work (typically a row of the csv specification) is recorded before its data
+    files are created, together with the planned destinations, and again once all files are
+    complete, together with their signatures (see `digest.file_signature`). After an
+    interruption, completed units can be skipped and the files of units started but not
+    completed removed before creating them again. Units whose files were modified or removed
+    since their completion are treated as not completed.
+
+    Records are appended as single lines, such that multiple processes can share a journal.
+
+    Parameters
+    ----------
+    directory: (str, path)
+        root folder of the dataset, in which the journal is stored
+    resume: bool
+        load the records of a previous run. Otherwise an existing journal is discarded.
+        Default: False
+    durability: str
+        'full' to flush each record to disk, such that the journal survives a system crash,
+        'relaxed' to only survive an interruption of the writing process, see
+        `atomic.AtomicGroup`. Default: 'full'
+    """
+
+    def __init__(self, directory, resume=False, durability='full'):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f'Invalid durability "{durability}". '
+                             f'Valid levels are {DURABILITY_LEVELS}.')
+        self.path = Path(directory) / JOURNAL_FILENAME
+        self.durability = durability
+        # signatures of the files of each completed unit, by unit
+        self.completed = {}
+        self.started = {}
+
+        if resume:
+            self._load()
+        elif self.path.exists():
+            self.path.unlink()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # the last record of an interrupted run can be incomplete
+                continue
+            if record['event'] == 'begin':
+                self.started[record['unit']] = record['files']
+            elif record['event'] == 'done':
+                self.started.pop(record['unit'], None)
+                self.completed[record['unit']] = record['files']
+
+    @staticmethod
+    def unit_id(*content):
+        """
+        Identifier of a unit of work based on its specification
+
+        Parameters
+        ----------
+        *content:
+            json serializable description of the unit, e.g. the content of a csv row
+
+        Returns
+        ----------
+        str
+            hexadecimal identifier
+        """
+        return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+    def is_completed(self, unit):
+        """
+        Check if a unit was completed and its files are unchanged since. The files of a
+        completed unit that was modified since are removed by the next `begin` of the unit.
+        """
+        files = self.completed.get(unit)
+        if files is None:
+            return False
+        for file, signature in files.items():
+            try:
+                unchanged = file_signature(file) == signature
+            except FileNotFoundError:
+                unchanged = False
+            if not unchanged:
+                del self.completed[unit]
+                self.started[unit] = list(files)
+                return False
+        return True
+
+    def begin(self, unit, files):
+        """
+        Record the start of a unit. Files left over by an interrupted attempt of the unit are
+        removed, including the temporary files of the planned files (see `atomic.temp_path`).
+
+        Parameters
+        ----------
+        unit: str
+            identifier of the unit, see `unit_id`
+        files: list
+            paths of the files to be created by the unit
+        """
+        for file in self.started.pop(unit, []):
+            Path(file).unlink(missing_ok=True)
+            _remove_temporary_files(file)
+        for file in files:
+            _remove_temporary_files(file)
+        self._append({'event': 'begin', 'unit': unit, 'files': [str(f) for f in files]})
+
+    def commit(self, unit, files):
+        """
+        Record the completion of a unit
+
+        Parameters
+        ----------
+        unit: str
+            identifier of the unit, see `unit_id`
+        files: list
+            paths of the files created by the unit
+        """
+        signatures = {str(f): file_signature(f) for f in files}
+        self._append({'event': 'done', 'unit': unit, 'files': signatures})
+        self.completed[unit] = signatures
+
+    def close(self):
+        """
+        Remove the journal after a successful run
+        """
+        self.path.unlink(missing_ok=True)
+
+    def _append(self, record):
+        line = (json.dumps(record) + '\n').encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line)
+            if self.durability == 'full':
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _remove_temporary_files(path):
+    # remove the temporary files of an interrupted creation of a file, see `atomic.temp_path`
+    path = Path(path)
+    for tmp in path.parent.glob(f'.{glob.escape(path.name)}.*.tmp'):
+        tmp.unlink(missing_ok=True)
@@ -0,0 +1,114 @@
+import json
+import os
+import pickle
+import sqlite3
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+from bep032tools.generator.digest import file_signature
+
+try:
+    import pynwb
+
+    PYNWB_VERSION = pynwb.__version__
+except ImportError:
+    PYNWB_VERSION = None
+
+# version of the format of the cached records, to be increased when the records change
+METADATA_CACHE_VERSION = 2
+
+
+class MetadataCache:
+    """
+    Persistent cache of the metadata extracted from data files, stored in a SQLite database.
+
+    Records are stored per file together with the signature of the file (see
+    `digest.file_signature`), the parameters of the extraction and the pynwb version, and are
+    only returned as long as all of them are unchanged. All records are read in a single query
+    when the cache is opened.
+
+    Records are stored as pickles, such that cache files must only be shared between trusted
+    users.
+
+    Parameters
+    ----------
+    cache_file: (str, path)
+        location of the SQLite database. Created if it does not exist.
+    """
+
+    def __init__(self, cache_file):
+        self.cache_file = Path(cache_file)
+        self.pending = {}
+
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS metadata (path TEXT PRIMARY KEY, '
+                               'signature TEXT, parameters TEXT, record BLOB)')
+            self.entries = {path: (signature, parameters, record) for path, signature,
+                            parameters, record in connection.execute('SELECT * FROM metadata')}
+
+    @contextmanager
+    def _connect(self):
+        # connection committing on success and closed on exit
+        with closing(sqlite3.connect(self.cache_file)) as connection:
+            with connection:
+                yield connection
+
+    @staticmethod
+    def _parameters(parameters):
+        return json.dumps([METADATA_CACHE_VERSION, PYNWB_VERSION, parameters], sort_keys=True,
+                          default=str)
+
+    def get(self, path, parameters):
+        """
+        Look up the metadata of a file
+
+        Parameters
+        ----------
+        path: (str, path)
+            file the metadata was extracted from
+        parameters:
+            json serializable parameters of the extraction
+
+        Returns
+        ----------
+        object
+            the cached metadata or None if no valid record exists
+        """
+        entry = self.entries.get(os.path.abspath(path))
+        if entry is None:
+            return None
+        signature, cached_parameters, record = entry
+        if signature != json.dumps(file_signature(path)) or \
+                cached_parameters != self._parameters(parameters):
+            return None
+        return pickle.loads(record)
+
+    def put(self, path, parameters, record):
+        """
+        Add the metadata of a file. The record is stored when calling `save`.
+
+        Parameters
+        ----------
+        path: (str, path)
+            file the metadata was extracted from
+        parameters:
+            json serializable parameters of the extraction
+        record: object
+            picklable metadata of the file
+        """
+        entry = (json.dumps(file_signature(path)), self._parameters(parameters),
+                 pickle.dumps(record))
+        self.pending[os.path.abspath(path)] = entry
+        self.entries[os.path.abspath(path)] = entry
+
+    def save(self):
+        """
+        Store the pending records in a single transaction
+        """
+        if not self.pending:
+            return
+        with self._connect() as connection:
+            connection.executemany('INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?)',
+                                   [(path,) + entry for path, entry in self.pending.items()])
+        self.pending.clear()
@@ -1,87 +1,211 @@
+import functools
+import hashlib
+import itertools
 import json
+import os
 import re
 import shutil
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from pynwb import NWBHDF5IO
 from pynwb.ecephys import ElectricalSeries
 from tqdm import tqdm
 
-from bep032tools.validator.BEP032Validator import is_valid
+from bep032tools.validator.BEP032Validator import is_valid, WRITTEN_FILES_FILENAME
+from .atomic import AtomicGroup, atomic_open
 from .bidsconverter import BidsConverter
+from .digest import DigestIndex
+from .metadata_cache import MetadataCache
+from .nwbheader import read_nwb_header, ElectricalSeriesHeader, UnsupportedNwbFile
+
+PARTICIPANTS_COLUMNS = ['species', 'participant_id', 'sex', 'birthdate', 'age', 'genotype',
+                        'weight']
+SESSIONS_COLUMNS = ['session_id', '#_trials', 'comment']
+WRITTEN_FILES_VERSION = 1
+# top-level folders of a BIDS dataset which are never modified by `NwbToBIDS.organize`
+PROTECTED_FOLDERS = ('derivatives', 'sourcedata')
 
 
 class NwbToBIDS(BidsConverter):
+    """
+    Converter of a dataset of nwb files to a BIDS dataset
+
+    Parameters
+    ----------
+    dataset_path: (str, path)
+        folder containing the nwb files
+    workers: int
+        number of processes reading the metadata of the nwb files. Default: 1
+    reader: str
+        'header' to only read the metadata required from the HDF5 structure of the files (see
+        `nwbheader.read_nwb_header`), falling back to pynwb for files with unusual content.
+        'pynwb' to read the complete files with pynwb. Default: 'header'
+    metadata_cache: (str, path)
+        SQLite file in which the metadata of the nwb files are cached, e.g. next to the
+        dataset. Metadata of unchanged files are read from the cache instead of the files,
+        see `metadata_cache.MetadataCache`. Default: None (no caching)
+    **kwargs:
+        default values of metadata not contained in the nwb files, e.g.
+        `PowerLineFrequency` or `probe_type`
+    """
 
-    def __init__(self, dataset_path, **kwargs):
+    def __init__(self, dataset_path, workers=1, reader='header', metadata_cache=None,
+                 **kwargs):
         super().__init__(dataset_path, **kwargs)
-        self.datafiles_list = [path for path in self.dataset_path.glob('**/*.nwb') if '.git' not in str(path)]
+        if reader not in ['header', 'pynwb']:
+            raise ValueError(f'Invalid nwb reader "{reader}"')
+        self.workers = workers
+        self.reader = reader
+        self.metadata_cache = None if metadata_cache is None else MetadataCache(metadata_cache)
+        # sorted to process the files in the same order on all platforms
+        self.datafiles_list = sorted(path for path in self.dataset_path.glob('**/*.nwb')
+                                     if '.git' not in str(path))
         assert len(self.datafiles_list) > 0, 'no nwb files found'
         self._extract_metadata()
 
     def _extract_metadata(self):
-        self._participants_dict.update(data=pd.DataFrame(
-            columns=['species', 'participant_id', 'sex',
-                     'birthdate', 'age', 'genotype', 'weight']))
-        for file_no, nwb_file in enumerate(tqdm(self.datafiles_list)):
-            with NWBHDF5IO(str(nwb_file), 'r') as io:
-                nwbfile = io.read()
-
-                # 1) FULL DATASET INFO:
-                # subject info:
-                sub_df, subject_label = self._get_subject_info(nwbfile,
-                                                               subject_suffix=str(file_no))
-                if not self._participants_dict['data']['participant_id'].str.contains(
-                        subject_label).any():
-                    self._participants_dict['data'].loc[
-                        len(self._participants_dict['data'].index)] = sub_df
-                # dataset_info:
-                if self._dataset_desc_json['data'] is None:
-                    self._dataset_desc_json['data'] = self._get_dataset_info(nwbfile)
-
-                # 2) SUBJECT SPECIFIC:
-                # session info:
-                base_location_1 = Path(f'{subject_label}')
-                session_default_dict = dict(name=base_location_1 / f'{subject_label}_sessions.tsv',
-                                            data=pd.DataFrame(
-                                                columns=['session_id', '#_trials', 'comment']))
-                session_info = self._get_session_info(nwbfile)
-                sessions_label = session_info[0]
-                sessions_df = self._sessions_dict.get(subject_label, session_default_dict)['data']
-                if not sessions_df['session_id'].str.contains(sessions_label).any():
-                    sessions_df.loc[len(sessions_df.index)] = session_info
-                    session_default_dict.update(data=sessions_df)
-                self._sessions_dict[subject_label] = session_default_dict
-
-                # 3) SUBJECT>SESSION SPECIFIC:
-                base_location_2 = Path(subject_label) / Path(sessions_label) / Path('ephys')
-                # channels_info:
-                channel_default_dict = dict(
-                    name=base_location_2 / f'{subject_label}_{sessions_label}_channels.tsv',
-                    data=self._get_channels_info(nwbfile))
-                self._channels_dict[subject_label].update({sessions_label: channel_default_dict})
-                # ephys_json:
-                ephys_default_dict = dict(
-                    name=base_location_2 / f'{subject_label}_{sessions_label}_ephys.json',
-                    data=self._get_ephys_info(nwbfile, **self._kwargs))
-                self._ephys_dict[subject_label].update({sessions_label: ephys_default_dict})
-                # contacts/probes info:
-                contact_df, probes_df = self._get_contacts_info(nwbfile, **self._kwargs)
-                contacts_default_dict = dict(
-                    name=base_location_2 / f'{subject_label}_{sessions_label}_contacts.tsv',
-                    data=contact_df)
-                probes_default_dict = dict(
-                    name=base_location_2 / f'{subject_label}_{sessions_label}_probes.tsv',
-                    data=probes_df)
-                self._contacts_dict[subject_label].update({sessions_label: contacts_default_dict})
-                self._probes_dict[subject_label].update({sessions_label: probes_default_dict})
-                # nwbfile location:
-                nwbfile_default_dict = dict(
-                    name=base_location_2 / f'{subject_label}_{sessions_label}_ephys.nwb',
-                    data=nwb_file)
-                self._nwbfile_name_dict[subject_label].update(
-                    {sessions_label: nwbfile_default_dict})
+        # the metadata of a file do not depend on its position in the dataset, such that
+        # adding or removing files does not invalidate the cached metadata of other files
+        metadata = [None] * len(self.datafiles_list)
+        if self.metadata_cache is not None:
+            metadata = [self.metadata_cache.get(nwb_file, self._kwargs)
+                        for nwb_file in self.datafiles_list]
+
+        missing = [file_no for file_no, file_metadata in enumerate(metadata)
+                   if file_metadata is None]
+        args = (itertools.repeat(type(self)), [self.datafiles_list[i] for i in missing],
+                itertools.repeat(self._kwargs), itertools.repeat(self.reader))
+        if self.workers > 1 and len(missing) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = list(tqdm(executor.map(_extract_file_metadata, *args),
+                                    total=len(missing)))
+        else:
+            results = list(tqdm(map(_extract_file_metadata, *args), total=len(missing)))
+
+        for file_no, file_metadata in zip(missing, results):
+            metadata[file_no] = file_metadata
+            if self.metadata_cache is not None:
+                self.metadata_cache.put(self.datafiles_list[file_no], self._kwargs,
+                                        file_metadata)
+        if self.metadata_cache is not None:
+            self.metadata_cache.save()
+
+        # results are merged in the order of the files, independent of the completion order,
+        # such that the result does not depend on the number of workers or cached files.
+        # Rows of the participants and sessions tables are collected by label and the tables
+        # created once all files are merged
+        participants = {}
+        sessions = {}
+        for file_no, (nwb_file, file_metadata) in enumerate(zip(self.datafiles_list, metadata)):
+            self._add_file_metadata(nwb_file, file_no, file_metadata, participants, sessions)
+
+        self._participants_dict.update(data=pd.DataFrame(list(participants.values()),
+                                                         columns=PARTICIPANTS_COLUMNS))
+        for subject_label, subject_sessions in sessions.items():
+            self._sessions_dict[subject_label] = dict(
+                name=Path(subject_label) / f'{subject_label}_sessions.tsv',
+                data=pd.DataFrame(list(subject_sessions.values()), columns=SESSIONS_COLUMNS))
+
+    @classmethod
+    def _read_file_metadata(cls, nwbfile, kwargs):
+        """
+        Extract the metadata of a single nwb file
+
+        The metadata do not depend on the other files of the dataset. Subjects without
+        identifier are labelled when merging the metadata, see `_add_file_metadata`.
+
+        Parameters
+        ----------
+        nwbfile: NWBFile
+            content of the nwb file, or its header as returned by `nwbheader.read_nwb_header`
+        kwargs: dict
+            default values of metadata not contained in the nwb file
+
+        Returns
+        ----------
+        dict
+            metadata by type, see `_add_file_metadata`
+        """
+        sub_df, subject_label = cls._get_subject_info(nwbfile)
+        if nwbfile.subject is None:
+            subject_label = None
+        contact_df, probes_df = cls._get_contacts_info(nwbfile, **kwargs)
+        return dict(subject=sub_df, subject_label=subject_label,
+                    dataset=cls._get_dataset_info(nwbfile),
+                    session=cls._get_session_info(nwbfile),
+                    channels=cls._get_channels_info(nwbfile),
+                    ephys=cls._get_ephys_info(nwbfile, **kwargs),
+                    contacts=contact_df, probes=probes_df)
+
+    def _add_file_metadata(self, nwb_file, file_no, file_metadata, participants, sessions):
+        """
+        Merge the metadata of a single nwb file into the metadata of the dataset
+
+        Parameters
+        ----------
+        nwb_file: path
+            location of the nwb file
+        file_no: int
+            position of the file in the dataset, used to label subjects without identifier
+        file_metadata: dict
+            metadata as returned by `_read_file_metadata`
+        participants: dict
+            rows of the participants table by subject label. The first row of each subject
+            is kept.
+        sessions: dict
+            rows of the sessions tables by subject and session label. The first row of each
+            session is kept.
+        """
+        # 1) FULL DATASET INFO:
+        # subject info:
+        sub_df, subject_label = file_metadata['subject'], file_metadata['subject_label']
+        if subject_label is None:
+            subject_label = f'sub-noname{file_no}'
+            # the row of the metadata record (possibly cached) is not modified
+            sub_df = sub_df[:1] + [subject_label] + sub_df[2:]
+        participants.setdefault(subject_label, sub_df)
+        # dataset_info:
+        if self._dataset_desc_json['data'] is None:
+            self._dataset_desc_json['data'] = file_metadata['dataset']
+
+        # 2) SUBJECT SPECIFIC:
+        # session info:
+        session_info = file_metadata['session']
+        sessions_label = session_info[0]
+        sessions.setdefault(subject_label, {}).setdefault(sessions_label, session_info)
+
+        # 3) SUBJECT>SESSION SPECIFIC:
+        base_location_2 = Path(subject_label) / Path(sessions_label) / Path('ephys')
+        # channels_info:
+        channel_default_dict = dict(
+            name=base_location_2 / f'{subject_label}_{sessions_label}_channels.tsv',
+            data=file_metadata['channels'])
+        self._channels_dict[subject_label].update({sessions_label: channel_default_dict})
+        # ephys_json:
+        ephys_default_dict = dict(
+            name=base_location_2 / f'{subject_label}_{sessions_label}_ephys.json',
+            data=file_metadata['ephys'])
+        self._ephys_dict[subject_label].update({sessions_label: ephys_default_dict})
+        # contacts/probes info:
+        contacts_default_dict = dict(
+            name=base_location_2 / f'{subject_label}_{sessions_label}_contacts.tsv',
+            data=file_metadata['contacts'])
+        probes_default_dict = dict(
+            name=base_location_2 / f'{subject_label}_{sessions_label}_probes.tsv',
+            data=file_metadata['probes'])
+        self._contacts_dict[subject_label].update({sessions_label: contacts_default_dict})
+        self._probes_dict[subject_label].update({sessions_label: probes_default_dict})
+        # nwbfile location:
+        nwbfile_default_dict = dict(
+            name=base_location_2 / f'{subject_label}_{sessions_label}_ephys.nwb',
+            data=nwb_file)
+        self._nwbfile_name_dict[subject_label].update(
+            {sessions_label: nwbfile_default_dict})
 
     @staticmethod
     def _get_subject_info(nwbfile, subject_suffix=''):
@@ -119,23 +243,21 @@ class NwbToBIDS(BidsConverter):
 
     @staticmethod
     def _get_channels_info(nwbfile):
-        channels_df = pd.DataFrame(
-            columns=['channel_id', 'contact_id', 'type', 'units', 'sampling_frequency',
-                     'unit_conversion_multiplier'])
+        columns = ['channel_id', 'contact_id', 'type', 'units', 'sampling_frequency',
+                   'unit_conversion_multiplier']
         es = [
             i for i in nwbfile.children if isinstance(
-                i, ElectricalSeries)]
-        if len(es) > 0:
-            es = es[0]
-            no_channels = es.data.shape[1]
-            sampling_frequency = es.rate
-            conversion = es.conversion
-            unit = es.unit
-            for chan_no in range(no_channels):
-                channels_df.loc[len(channels_df.index)] = [chan_no, chan_no, 'neural signal',
-                                                           unit,
-                                                           sampling_frequency, conversion]
-        return channels_df
+                i, (ElectricalSeries, ElectricalSeriesHeader))]
+        if len(es) == 0:
+            return pd.DataFrame(columns=columns)
+
+        es = es[0]
+        channel_ids = np.arange(es.data.shape[1])
+        # scalar values are broadcast to all channels
+        return pd.DataFrame({'channel_id': channel_ids, 'contact_id': channel_ids,
+                             'type': 'neural signal', 'units': es.unit,
+                             'sampling_frequency': es.rate,
+                             'unit_conversion_multiplier': es.conversion}, columns=columns)
 
     @staticmethod
     def _get_ephys_info(nwbfile, **kwargs):
@@ -145,104 +267,319 @@ class NwbToBIDS(BidsConverter):
 
     @staticmethod
     def _get_contacts_info(nwbfile, **kwargs):
-        contacts_df = pd.DataFrame(
-            columns=[
-                'x',
-                'y',
-                'z',
-                'impedance',
-                'contact_id',
-                'probe_id',
-                'location'])
-        probes_df = pd.DataFrame(columns=['probe_id', 'type'])
+        columns = ['x', 'y', 'z', 'impedance', 'contact_id', 'probe_id', 'location']
         e_table = nwbfile.electrodes
-        if e_table is not None:
-            for contact_no in range(len(e_table)):
-                contacts_df.loc[len(contacts_df.index)] = [e_table.x[contact_no],
-                                                           e_table.y[contact_no],
-                                                           e_table.z[contact_no],
-                                                           e_table.imp[contact_no],
-                                                           contact_no,
-                                                           e_table.group[contact_no].device.name,
-                                                           e_table.location[contact_no]]
-        for probe_id in contacts_df['probe_id'].unique():
-            probes_df.loc[len(probes_df.index)] = [
-                probe_id, kwargs.get('probe_type', 'acute')]
+        if e_table is None or len(e_table) == 0:
+            contacts_df = pd.DataFrame(columns=columns)
+        else:
+            # whole columns are read at once and device names resolved once per group
+            groups = e_table.group[:]
+            device_names = {}
+            for group in groups:
+                if id(group) not in device_names:
+                    device_names[id(group)] = group.device.name
+            contacts_df = pd.DataFrame({
+                'x': e_table.x[:],
+                'y': e_table.y[:],
+                'z': e_table.z[:],
+                'impedance': e_table.imp[:],
+                'contact_id': np.arange(len(e_table)),
+                'probe_id': [device_names[id(group)] for group in groups],
+                'location': e_table.location[:]}, columns=columns)
+
+        probes_df = pd.DataFrame({'probe_id': contacts_df['probe_id'].unique(),
+                                  'type': kwargs.get('probe_type', 'acute')},
+                                 columns=['probe_id', 'type'])
         return contacts_df, probes_df
 
     def organize(self, output_path=None, move_nwb=False,
-                 re_write=True, validate=True):
+                 re_write=True, validate=True, durability='full', workers=1, sync=False):
+        """
+        Write the BIDS dataset
+
+        Parameters
+        ----------
+        output_path: (str, path)
+            root folder of the BIDS dataset. Default: None (folder 'BIDSExt' next to the
+            nwb dataset)
+        move_nwb: bool
+            move the nwb files into the BIDS dataset instead of linking them. Default: False
+        re_write: bool
+            remove an existing BIDS dataset first. Ignored if `sync` is set. Default: True
+        validate: bool
+            validate the BIDS dataset after writing. Default: True
+        durability: str
+            durability of the written files, see `atomic.AtomicGroup`. Files are written
+            atomically and the files of each session folder are committed together.
+            Default: 'full'
+        workers: int
+            maximal number of sessions written concurrently by a thread pool, e.g. to
+            overlap the latency of network storage. Default: 1
+        sync: bool
+            update an existing BIDS dataset in place instead of writing it from scratch. Only
+            new or changed files are written, files written by a previous run that are not part
+            of the dataset anymore are removed and unchanged files (including the links to the
+            nwb files) are left alone. Files not written by this method, nwb files moved into
+            the dataset and the content of hidden folders, 'derivatives' and 'sourcedata' are
+            never removed. Generated files are compared by the digests of their content, which
+            are stored in the dataset (see `digest.DigestIndex`), such that unchanged files are
+            not read again. Default: False
+
+        Returns
+        ----------
+        OrganizeStats
+            number and size of the files written and duration of the writing
+        """
+        start = time.perf_counter()
         if output_path is None:
             output_path = self.dataset_path.parent / 'BIDSExt' / self.dataset_path.name
         else:
             output_path = Path(output_path)
-        if re_write and output_path.exists():
+
+        digests = None
+        if sync:
+            digests = DigestIndex.for_dataset(output_path)
+        elif re_write and output_path.exists():
             shutil.rmtree(output_path)
+        # files written by previous runs
+        written_files = _load_written_files(output_path)
+
+        sessions = [(subject_id, session_id)
+                    for subject_id in self._participants_dict['data']['participant_id']
+                    for session_id in self._sessions_dict[subject_id]['data']['session_id']]
+
+        # create the directory tree in a single pass, such that write jobs are independent
+        directories = {output_path}
+        directories.update((output_path / ses_file_dict['name']).parent
+                           for ses_file_dict in self._sessions_dict.values())
+        directories.update(output_path / subject_id / session_id / 'ephys'
+                           for subject_id, session_id in sessions)
+        for directory in sorted(directories):
+            directory.mkdir(parents=True, exist_ok=True)
+
         # CREATE FILES:
+        jobs = [functools.partial(self._write_dataset_files, output_path, durability, digests)]
+        jobs.extend(functools.partial(self._write_session_files, output_path, subject_id,
+                                      session_id, move_nwb, durability, digests)
+                    for subject_id, session_id in sessions)
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(job) for job in jobs]
+                # propagate errors of the write jobs
+                results = [future.result() for future in futures]
+        else:
+            results = [job() for job in jobs]
+        # (file, number of bytes written or None if the file was left unchanged)
+        results = list(itertools.chain.from_iterable(results))
+
+        planned_files = {loc for loc, _ in results}
+        removed = 0
+        if sync:
+            removed = _remove_stale(output_path, written_files - planned_files)
+            written_files = set()
+            digests.save()
+        _save_written_files(output_path, written_files | planned_files)
+
+        stats = OrganizeStats(sum(written is not None for _, written in results),
+                              sum(written for _, written in results if written is not None),
+                              time.perf_counter() - start,
+                              sum(written is None for _, written in results),
+                              removed)
+
+        if validate:
+            is_valid(output_path)
+
+        return stats
+
+    def _write_dataset_files(self, output_path, durability, digests=None):
+        # write the files at the top and subject level, return the files and bytes written
+        results = []
         # 1) data_desc, participants:
-        output_path.mkdir(parents=True, exist_ok=True)
-        data, loc = self._parse_data_dict(self._participants_dict, output_path)
-        data.dropna(axis='columns', how='all', inplace=True)
-        data.to_csv(loc, sep='\t', index=False)
-        data, loc = self._parse_data_dict(self._dataset_desc_json, output_path)
-        with open(loc, 'w') as j:
-            if all([True for au in data['Authors'] if au is None]):
-                _ = data.pop('Authors')
+        with AtomicGroup(durability) as group:
+            data, loc = self._parse_data_dict(self._participants_dict, output_path)
+            data.dropna(axis='columns', how='all', inplace=True)
+            results.append(self._write_text(data.to_csv(sep='\t', index=False), loc, group,
+                                            digests))
+            data, loc = self._parse_data_dict(self._dataset_desc_json, output_path)
+            if all([True for au in data.get('Authors', []) if au is None]):
+                _ = data.pop('Authors', None)
             dataset_desc_tosave = {k: v for k,
                                             v in data.items() if v is not None}
-            json.dump(dataset_desc_tosave, j)
+            results.append(self._write_text(json.dumps(dataset_desc_tosave), loc, group,
+                                            digests))
 
         # 2) sessions.tsv:
-        for ses_file_dict in self._sessions_dict.values():
-            data, loc = self._parse_data_dict(ses_file_dict, output_path)
-            if not loc.parent.exists():
-                loc.parent.mkdir(parents=True)
-            data.to_csv(loc, sep='\t', index=False)
-
-        # 3) subject>sessions>ephys specific files:
-        for subject_id in self._participants_dict['data']['participant_id']:
-            for session_id in self._sessions_dict[subject_id]['data']['session_id']:
-                # ephys.json
-                base_loc = output_path / subject_id / session_id / 'ephys'
-                if not base_loc.exists():
-                    base_loc.mkdir(parents=True)
-                data, loc = self._parse_data_dict(
-                    self._ephys_dict[subject_id][session_id],
-                    output_path)
-                with open(loc, 'w') as j:
-                    json.dump(data, j)
-                # channels tsv:
-                data, loc = self._parse_data_dict(
-                    self._channels_dict[subject_id][session_id],
-                    output_path)
-                self._write_csv(data, loc)
-                # contacts/probes tsv:
-                data, loc = self._parse_data_dict(
-                    self._contacts_dict[subject_id][session_id],
-                    output_path)
-                self._write_csv(data, loc)
-                data, loc = self._parse_data_dict(
-                    self._probes_dict[subject_id][session_id],
-                    output_path)
-                self._write_csv(data, loc)
-                # nwbfile move:
-                data, loc = self._parse_data_dict(
-                    self._nwbfile_name_dict[subject_id][session_id],
-                    output_path)
-                if move_nwb:
-                    if not loc.exists():
-                        data.replace(loc)
-                else:
-                    if not loc.exists():
-                        loc.symlink_to(data)
+        with AtomicGroup(durability) as group:
+            for ses_file_dict in self._sessions_dict.values():
+                data, loc = self._parse_data_dict(ses_file_dict, output_path)
+                results.append(self._write_text(data.to_csv(sep='\t', index=False), loc,
+                                                group, digests))
 
-        if validate:
-            is_valid(output_path)
+        return results
+
+    def _write_session_files(self, output_path, subject_id, session_id, move_nwb, durability,
+                             digests=None):
+        # write the files of a session folder, return the files and bytes written
+        results = []
+        with AtomicGroup(durability) as group:
+            # ephys.json
+            data, loc = self._parse_data_dict(
+                self._ephys_dict[subject_id][session_id],
+                output_path)
+            results.append(self._write_text(json.dumps(data), loc, group, digests))
+            # channels, contacts and probes tsv:
+            for data_dict in [self._channels_dict, self._contacts_dict, self._probes_dict]:
+                data, loc = self._parse_data_dict(data_dict[subject_id][session_id], output_path)
+                results.append(self._write_csv(data, loc, group, digests))
+            # nwbfile move:
+            data, loc = self._parse_data_dict(
+                self._nwbfile_name_dict[subject_id][session_id],
+                output_path)
+            results.append(self._write_nwb(data, loc, group, move_nwb, sync=digests is not None))
+
+        return results
 
     def _parse_data_dict(self, data_dict, output_path):
         return data_dict['data'], output_path / data_dict['name']
 
-    def _write_csv(self, data, loc):
-        if not loc.exists():
-            data.dropna(axis='columns', how='all', inplace=True)
-            data.to_csv(loc, sep='\t', index=False)
+    def _write_csv(self, data, loc, group, digests=None):
+        # write a table unless the file exists or, when synchronizing, is unchanged
+        if digests is None and loc.exists():
+            return loc, None
+        data.dropna(axis='columns', how='all', inplace=True)
+        return self._write_text(data.to_csv(sep='\t', index=False), loc, group, digests)
+
+    @staticmethod
+    def _write_text(text, loc, group, digests=None):
+        # write text to a file of a group, return the file and the number of bytes written.
+        # With a digest index, files with identical content are not written (None bytes)
+        content = text.encode('utf-8')
+        if digests is not None:
+            digest = hashlib.blake2b(content).hexdigest()
+            if loc.is_file() and not loc.is_symlink() and digests.digest(loc) == digest:
+                return loc, None
+            group.on_commit(digests.record_digest, loc, digest)
+        with group.open(loc, 'wb') as f:
+            f.write(content)
+        return loc, len(content)
+
+    @staticmethod
+    def _write_nwb(data, loc, group, move_nwb, sync=False):
+        # link or move a nwb file into the dataset unless it exists, return the file and the
+        # number of bytes written. When synchronizing, links to a different file are replaced
+        if move_nwb:
+            if loc.exists() and not loc.is_symlink():
+                return loc, None
+            # renaming is atomic already and the file must not be removed if the group is
+            # aborted
+            data.replace(loc)
+            return loc, 0
+        if sync:
+            if loc.is_symlink() and os.readlink(loc) == str(data):
+                return loc, None
+        elif loc.exists():
+            return loc, None
+        with group.path(loc, sync=False) as tmp:
+            tmp.symlink_to(data)
+        return loc, 0
+
+
+def _load_written_files(output_path):
+    # files written by previous runs of `NwbToBIDS.organize`, see `_save_written_files`
+    try:
+        with open(output_path / WRITTEN_FILES_FILENAME) as f:
+            content = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    if not isinstance(content, dict) or content.get('version') != WRITTEN_FILES_VERSION:
+        return set()
+    return {output_path / file for file in content['files']}
+
+
+def _save_written_files(output_path, files):
+    # a lost list only causes stale files to be kept by the next synchronization
+    with atomic_open(output_path / WRITTEN_FILES_FILENAME, durability='relaxed') as f:
+        json.dump({'version': WRITTEN_FILES_VERSION,
+                   'files': sorted(str(file.relative_to(output_path)) for file in files)}, f)
+
+
+def _remove_stale(output_path, stale_files):
+    # remove files written by a previous `NwbToBIDS.organize` which are not part of the dataset
+    # anymore, together with the folders left empty. Nwb files moved into the dataset might be
+    # the only copy of the data and are kept. Return the number of removed files
+    removed = 0
+    folders = set()
+    for file in stale_files:
+        parts = file.relative_to(output_path).parts
+        if parts[0] in PROTECTED_FOLDERS or any(part.startswith('.') for part in parts[:-1]):
+            continue
+        if file.suffix == '.nwb' and not file.is_symlink():
+            continue
+        try:
+            file.unlink()
+        except FileNotFoundError:
+            continue
+        removed += 1
+        folders.update(list(file.parents)[:len(parts) - 1])
+    # deepest folders first, such that parents of removed folders can be empty
+    for folder in sorted(folders, key=lambda f: len(f.parts), reverse=True):
+        try:
+            folder.rmdir()
+        except OSError:
+            # folder still contains other files
+            pass
+    return removed
+
+
+class OrganizeStats(namedtuple('OrganizeStats',
+                               ['files', 'size', 'duration', 'unchanged', 'removed'],
+                               defaults=(0, 0))):
+    """
+    Summary of the files written by `NwbToBIDS.organize`
+
+    Attributes
+    ----------
+    files: int
+        number of files created, including links to the nwb files
+    size: int
+        number of bytes written, excluding the nwb files
+    duration: float
+        duration of the writing in seconds
+    unchanged: int
+        number of existing files left unchanged
+    removed: int
+        number of stale files removed when synchronizing an existing dataset
+    """
+    __slots__ = ()
+
+    @property
+    def rate(self):
+        """
+        Throughput in bytes per second
+        """
+        if self.duration <= 0:
+            return float('inf')
+        return self.size / self.duration
+
+    @property
+    def file_rate(self):
+        """
+        Throughput in files per second
+        """
+        if self.duration <= 0:
+            return float('inf')
+        return self.files / self.duration
+
+
+def _extract_file_metadata(cls, nwb_file, kwargs, reader='header'):
+    # open a nwb file and extract its metadata, see `NwbToBIDS._read_file_metadata`
+    if reader == 'header':
+        try:
+            header = read_nwb_header(nwb_file)
+        except UnsupportedNwbFile:
+            pass
+        else:
+            return cls._read_file_metadata(header, kwargs)
+
+    with NWBHDF5IO(str(nwb_file), 'r') as io:
+        return cls._read_file_metadata(io.read(), kwargs)
@@ -0,0 +1,182 @@
+from collections import namedtuple
+from types import SimpleNamespace
+
+import h5py
+from dateutil.parser import parse as parse_date
+
+# neurodata types of the core namespace recognized as (subclasses of) ElectricalSeries
+ELECTRICAL_SERIES_TYPES = ['ElectricalSeries', 'SpikeEventSeries']
+# groups whose members are direct children of the NWBFile container
+CHILD_GROUPS = ['acquisition', 'analysis', 'scratch', 'stimulus/presentation',
+                'stimulus/templates']
+SUBJECT_FIELDS = ['subject_id', 'species', 'sex', 'date_of_birth', 'age', 'genotype', 'weight']
+
+
+class UnsupportedNwbFile(Exception):
+    """
+    Raised if a nwb file contains content that can not be interpreted by `read_nwb_header`
+    """
+
+
+class ElectricalSeriesHeader(namedtuple('ElectricalSeriesHeader',
+                                        ['data', 'rate', 'conversion', 'unit'])):
+    """
+    Attributes of an ElectricalSeries read by `read_nwb_header`. `data` only provides the
+    `shape` of the recorded data.
+    """
+    __slots__ = ()
+
+
+class TableHeader(SimpleNamespace):
+    """
+    Columns of a DynamicTable read by `read_nwb_header`, supporting `len`
+    """
+
+    def __init__(self, length, **columns):
+        super().__init__(**columns)
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+
+def read_nwb_header(path):
+    """
+    Read the metadata of a nwb file used by `NwbToBIDS` without reading the complete file.
+
+    Only the attributes and datasets required for the conversion to BIDS are read from the
+    HDF5 file. The returned object provides these metadata with the same attribute names as a
+    `pynwb.NWBFile`: `subject`, `session_id`, `session_start_time`, `session_description`,
+    `trials`, `experimenter`, `institution`, `lab`, `electrodes` and `children` (containing
+    only the ElectricalSeries).
+
+    Parameters
+    ----------
+    path: (str, path)
+        nwb file to read
+
+    Returns
+    ----------
+    SimpleNamespace
+        metadata of the nwb file
+
+    Raises
+    ----------
+    UnsupportedNwbFile
+        if the file contains content that can not be interpreted reliably, e.g. unknown
+        versions, extension types or missing columns. The file should be read with pynwb
+        instead.
+    """
+    try:
+        with h5py.File(path, 'r') as f:
+            return _read_header(f)
+    except UnsupportedNwbFile:
+        raise
+    except (KeyError, ValueError, TypeError, IndexError, AttributeError, OSError) as e:
+        raise UnsupportedNwbFile(f'Could not read header of {path}: {e}') from e
+
+
+def _read_header(f):
+    version = _attribute(f, 'nwb_version')
+    if version is None or not version.startswith('2.'):
+        raise UnsupportedNwbFile(f'Unsupported nwb version {version}')
+
+    general = f.get('general', {})
+    experimenter = _string(general, 'experimenter')
+    if isinstance(experimenter, str):
+        experimenter = (experimenter,)
+
+    trials = f.get('intervals/trials')
+
+    return SimpleNamespace(
+        subject=_read_subject(general.get('subject')),
+        session_id=_string(general, 'session_id'),
+        session_start_time=parse_date(_string(f, 'session_start_time')),
+        session_description=_string(f, 'session_description'),
+        trials=None if trials is None else TableHeader(len(trials['id'])),
+        experimenter=experimenter,
+        institution=_string(general, 'institution'),
+        lab=_string(general, 'lab'),
+        electrodes=_read_electrodes(f, general.get('extracellular_ephys/electrodes')),
+        children=_read_electrical_series(f))
+
+
+def _read_subject(group):
+    if group is None:
+        return None
+    subject = SimpleNamespace(**{field: _string(group, field) for field in SUBJECT_FIELDS})
+    if subject.date_of_birth is not None:
+        subject.date_of_birth = parse_date(subject.date_of_birth)
+    return subject
+
+
+def _read_electrodes(f, table):
+    if table is None:
+        return None
+
+    # electrode groups are identified by their object ids, which compare equal for the same
+    # object, such that the device of each group is only resolved once
+    devices = {}
+    groups = []
+    for reference in table['group'][:]:
+        group_id = h5py.h5r.dereference(reference, f.id)
+        if group_id not in devices:
+            group = h5py.Group(group_id)
+            link = group.get('device', getlink=True)
+            if not isinstance(link, h5py.SoftLink):
+                raise UnsupportedNwbFile(f'Unexpected device link of {group.name}')
+            devices[group_id] = SimpleNamespace(
+                device=SimpleNamespace(name=link.path.rsplit('/', 1)[-1]))
+        groups.append(devices[group_id])
+
+    return TableHeader(len(table['id']), x=table['x'][:], y=table['y'][:], z=table['z'][:],
+                       imp=table['imp'][:], location=table['location'].asstr()[:],
+                       group=groups)
+
+
+def _read_electrical_series(f):
+    series = []
+    for group_name in CHILD_GROUPS:
+        for child in f.get(group_name, {}).values():
+            neurodata_type = _attribute(child, 'neurodata_type')
+            if neurodata_type is None:
+                continue
+            if _attribute(child, 'namespace') != 'core':
+                # extension types could be derived from ElectricalSeries
+                raise UnsupportedNwbFile(f'Unsupported extension type of {child.name}')
+            if neurodata_type in ELECTRICAL_SERIES_TYPES:
+                series.append(child)
+
+    if len(series) > 1:
+        # the order of multiple series is defined by the pynwb object graph
+        raise UnsupportedNwbFile('Multiple ElectricalSeries found')
+
+    headers = []
+    for es in series:
+        data = es['data']
+        starting_time = es.get('starting_time')
+        rate = None if starting_time is None else float(starting_time.attrs['rate'])
+        headers.append(ElectricalSeriesHeader(
+            data=SimpleNamespace(shape=data.shape),
+            rate=rate,
+            conversion=float(data.attrs.get('conversion', 1.0)),
+            unit=_attribute(data, 'unit')))
+    return headers
+
+
+def _attribute(obj, name):
+    value = obj.attrs.get(name)
+    if isinstance(value, bytes):
+        value = value.decode()
+    return value
+
+
+def _string(group, name):
+    # read a text dataset as str or tuple of str, None if it does not exist
+    dataset = group.get(name)
+    if dataset is None:
+        return None
+    value = dataset.asstr()[()]
+    if dataset.shape:
+        return tuple(value)
+    return value
@@ -0,0 +1,68 @@
+try:
+    import neo
+    from neo.io.proxyobjects import AnalogSignalProxy
+
+    HAVE_NEO = True
+except ImportError:
+    HAVE_NEO = False
+
+# size of the buffer used to transfer signals in bytes
+DEFAULT_CHUNK_SIZE = 64 * 1024 * 1024
+
+
+if HAVE_NEO:
+    class ChunkedNixIO(neo.NixIO):
+        """
+        NixIO writing lazily loaded analog signals in chunks.
+
+        Analog signals loaded lazily (`AnalogSignalProxy`) are transferred from the source
+        file in time chunks of all channels, such that the memory required for writing a signal
+        is bounded by `chunk_size` instead of the size of the signal. All other objects are
+        written as by `neo.NixIO`.
+
+        Parameters
+        ----------
+        filename: (str, path)
+            path of the nix file
+        mode: str
+            see `neo.NixIO`. Default: 'rw'
+        chunk_size: int
+            size of the buffer used to transfer a signal in bytes. Default: 64 MiB
+        """
+
+        def __init__(self, filename, mode='rw', chunk_size=DEFAULT_CHUNK_SIZE, **kwargs):
+            super().__init__(str(filename), mode=mode, **kwargs)
+            self.chunk_size = chunk_size
+
+        def _write_analogsignal(self, anasig, nixblock, nixgroup):
+            if not isinstance(anasig, AnalogSignalProxy):
+                return super()._write_analogsignal(anasig, nixblock, nixgroup)
+
+            n_samples, n_channels = anasig.shape
+            itemsize = 8 if anasig.dtype == 'float64' else 4
+            chunk_samples = max(1, self.chunk_size // (itemsize * n_channels))
+            chunk_starts = range(0, n_samples, chunk_samples)
+            sampling_period = anasig.sampling_period
+
+            def load_chunk(i_start):
+                t_start = anasig.t_start + i_start * sampling_period
+                if i_start + chunk_samples >= n_samples:
+                    t_stop = None
+                else:
+                    t_stop = t_start + chunk_samples * sampling_period
+                return anasig.load(time_slice=(t_start, t_stop))
+
+            # the first chunk defines the data arrays and their metadata
+            first_chunk = load_chunk(0)
+            if 'nix_name' in anasig.annotations:
+                first_chunk.annotate(nix_name=anasig.annotations['nix_name'])
+            super()._write_analogsignal(first_chunk, nixblock, nixgroup)
+            nix_name = first_chunk.annotations['nix_name']
+            anasig.annotate(nix_name=nix_name)
+            del first_chunk
+
+            data_arrays = self._signal_map[nix_name]
+            for i_start in chunk_starts[1:]:
+                chunk = load_chunk(i_start).magnitude
+                for channel, data_array in enumerate(data_arrays):
+                    data_array.append(chunk[:, channel])
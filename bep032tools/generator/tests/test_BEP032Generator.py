@@ -1,12 +1,18 @@
 import os
+import re
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 from parameterized import parameterized
 from pathlib import Path
 import numpy as np
 
 from bep032tools.generator.tests.utils import (initialize_test_directory, test_directory,
                                                generate_example_csv_file)
-from bep032tools.generator.BEP032Generator import BEP032Data, extract_structure_from_csv
+import bep032tools.generator.BEP032Generator
+from bep032tools.generator.BEP032Generator import (BEP032Data, extract_structure_from_csv,
+                                                   iter_csv_rows)
+from bep032tools.generator.digest import DigestIndex
 
 
 class Test_BEP032Data_ece(unittest.TestCase):
@@ -118,6 +124,29 @@ class Test_BEP032Data_ece(unittest.TestCase):
         for observed_file in observed_files:
             os.remove(observed_file)
 
+    def test_data_file_conversion_parallel(self):
+        self.bep032tools_data.generate_directory_structure()
+
+        sources = []
+        for i in range(3):
+            source = self.ascii_data_filename.with_name(f'test_ascii_data_{i}.txt')
+            np.savetxt(str(source), np.full((10, 2), i), delimiter='\t')
+            sources.append(source)
+        self.bep032tools_data.register_data_sources(*sources)
+        self.bep032tools_data.organize_data_files(mode='copy', autoconvert='nix',
+                                                  conversion_workers=2,
+                                                  memory_budget=1)
+
+        # the split index follows the order of the registered sources
+        import neo
+        for i in range(3):
+            observed_files = list(self.bep032tools_data.get_data_folder().glob(
+                f'*_split-{i}_ephys.nix'))
+            self.assertEqual(len(observed_files), 1)
+            with neo.NixIO(str(observed_files[0]), mode='ro') as io:
+                block = io.read_block()
+            self.assertEqual(block.segments[0].analogsignals[0][0, 0].magnitude, i)
+
     # This test currently fails due to https://github.com/NeuralEnsemble/python-neo/issues/1198'
     # def test_data_file_conversion_source_folder(self):
     #     self.bep032tools_data.generate_directory_structure()
@@ -403,6 +432,18 @@ class Test_ReadCsv(unittest.TestCase):
         expected_headers = ['sub_id', 'ses_id']
         self.assertListEqual(expected_headers, list(df))
 
+    def test_iter_csv_rows(self):
+        expected = list(extract_structure_from_csv(self.csv_file).to_dict('index').values())
+        self.assertListEqual(list(iter_csv_rows(self.csv_file)), expected)
+        self.assertListEqual(list(iter_csv_rows(self.csv_file, chunksize=2)), expected)
+
+    def test_iter_csv_rows_missing_column(self):
+        csv_file = Path(self.csv_file).with_name('invalid.csv')
+        csv_file.write_text('ses_id\n20200101\n')
+        # the header is checked before iterating
+        with self.assertRaises(ValueError):
+            iter_csv_rows(csv_file)
+
 
 class Test_GenerateStruct(unittest.TestCase):
 
@@ -494,6 +535,69 @@ class Test_FolderGeneration_full(unittest.TestCase):
             generation = True
         self.assertTrue(generation)
 
+    def test_copy_report(self):
+        """
+        Checks that the method and transfer rate of each data file created are reported.
+        """
+        with self.assertLogs('bep032tools.generator.BEP032Generator', level='INFO') as logs:
+            BEP032Data.generate_bids_dataset(self.csv_file, self.test_dir)
+        data_files = sorted(self.test_dir.rglob('*_ephys.nix'))
+        messages = [record.getMessage() for record in logs.records]
+        self.assertEqual(len(messages), len(data_files))
+        for data_file in data_files:
+            size = data_file.stat().st_size
+            self.assertTrue(any(re.fullmatch(rf'Created {re.escape(str(data_file))} \(\w+\): '
+                                             rf'{size} bytes, (\d+|inf) bytes/s', message)
+                                for message in messages), messages)
+
+    def test_parallel_generation(self):
+        """
+        Checks that generating with multiple workers yields the same files as a serial run.
+        """
+        serial_dir = self.test_dir.parent / 'serial'
+        BEP032Data.generate_bids_dataset(self.csv_file, serial_dir)
+        # dispatch rows in small chunks, such that sessions are split across chunks
+        chunk_size = bep032tools.generator.BEP032Generator.CSV_CHUNK_SIZE
+        bep032tools.generator.BEP032Generator.CSV_CHUNK_SIZE = 1
+        try:
+            BEP032Data.generate_bids_dataset(self.csv_file, self.test_dir, workers=2)
+        finally:
+            bep032tools.generator.BEP032Generator.CSV_CHUNK_SIZE = chunk_size
+
+        serial_files = sorted(p.relative_to(serial_dir) for p in serial_dir.rglob('*'))
+        parallel_files = sorted(p.relative_to(self.test_dir) for p in self.test_dir.rglob('*'))
+        self.assertListEqual(serial_files, parallel_files)
+        for path in serial_files:
+            if (serial_dir / path).is_file():
+                self.assertEqual((serial_dir / path).read_bytes(),
+                                 (self.test_dir / path).read_bytes())
+
+    def test_parallel_digest_index(self):
+        """
+        Checks that workers only exchange the digest index entries of their sessions.
+        """
+        BEP032Data.generate_bids_dataset(self.csv_file, self.test_dir, skip_identical=True)
+        copies = DigestIndex.for_dataset(self.test_dir).copies
+        self.assertTrue(copies)
+
+        generate_rows = bep032tools.generator.BEP032Generator._generate_session_rows
+        # threads instead of processes, such that the calls of the workers can be inspected
+        with mock.patch('bep032tools.generator.BEP032Generator.ProcessPoolExecutor',
+                        ThreadPoolExecutor), \
+                mock.patch('bep032tools.generator.BEP032Generator._generate_session_rows',
+                           wraps=generate_rows) as worker:
+            BEP032Data.generate_bids_dataset(self.csv_file, self.test_dir, workers=2,
+                                             skip_identical=True)
+
+        self.assertTrue(worker.call_args_list)
+        for call in worker.call_args_list:
+            rows, digest_index = call.args[1], call.args[5]
+            session_folder = Path(self.test_dir, f'sub-{rows[0]["sub_id"]}',
+                                  f'ses-{rows[0]["ses_id"]}').absolute()
+            self.assertTrue(digest_index.copies)
+            for key in digest_index.copies:
+                self.assertIn(session_folder, Path(key).parents)
+        self.assertEqual(DigestIndex.for_dataset(self.test_dir).copies, copies)
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,10 +1,13 @@
 import os
 import unittest
 from pathlib import Path
+from unittest import mock
+
 from bep032tools.generator.tests.utils import (initialize_test_directory, test_directory,
                                                generate_example_csv_file)
 from bep032tools.generator.BEP032Generator import extract_structure_from_csv
 from bep032tools.generator.BEP032Templater import BEP032TemplateData
+from bep032tools.generator.utils import MetadataStore
 
 
 class Test_BEP032TemplateData(unittest.TestCase):
@@ -169,8 +172,41 @@ class Test_GenerateStruct(unittest.TestCase):
 
                 self.assertTrue(found_path)
 
+    def test_parallel_generation(self):
+        serial_dir = Path(test_directory) / 'serial'
+        parallel_dir = Path(test_directory) / 'parallel'
+        BEP032TemplateData.generate_bids_dataset(self.csv_file, serial_dir)
+        BEP032TemplateData.generate_bids_dataset(self.csv_file, parallel_dir, workers=2)
+
+        serial_files = sorted(p.relative_to(serial_dir) for p in serial_dir.rglob('*'))
+        parallel_files = sorted(p.relative_to(parallel_dir) for p in parallel_dir.rglob('*'))
+        self.assertListEqual(serial_files, parallel_files)
+
+    def test_session_files_flushed_per_session(self):
+        csv_file = generate_example_csv_file(mode='full')
+        flushed = []
+        flush = MetadataStore.flush
+
+        def record_flush(store):
+            flushed.append(sorted(path.name for path in list(store.tsv) + list(store.json)))
+            flush(store)
+
+        with mock.patch.object(MetadataStore, 'flush', autospec=True, side_effect=record_flush):
+            BEP032TemplateData.generate_bids_dataset(csv_file, Path(test_directory) / 'dataset')
+
+        flushed = [names for names in flushed if names]
+        # the files of each session are written before the next session is processed and the
+        # shared files are written at the end
+        self.assertEqual(len(flushed), 3)
+        for names, subject in zip(flushed, ['sub-mouse-A', 'sub-mouse-B']):
+            self.assertTrue(names)
+            self.assertTrue(all(name.startswith(subject) for name in names), names)
+        self.assertIn('participants.tsv', flushed[-1])
+
     def doCleanups(self):
         initialize_test_directory(clean=True)
+        for i in range(4):
+            Path(f'my_data_file_{i}.nix').unlink(missing_ok=True)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,96 @@
+import os
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from bep032tools.generator.tests.utils import initialize_test_directory, test_directory
+from bep032tools.generator.atomic import AtomicGroup, atomic_open
+from bep032tools.generator.utils import save_tsv, MetadataStore
+from bep032tools.generator.BEP032Generator import create_file
+
+
+class TestAtomicGroup(unittest.TestCase):
+
+    def setUp(self):
+        initialize_test_directory(clean=True)
+        self.folder = test_directory / 'atomic'
+        self.folder.mkdir()
+
+    def test_files_visible_on_commit(self):
+        files = [self.folder / 'a.json', self.folder / 'b.json']
+        with AtomicGroup() as group:
+            for file in files:
+                with group.open(file) as f:
+                    f.write(file.name)
+            self.assertFalse(any(file.exists() for file in files))
+
+        for file in files:
+            self.assertEqual(file.read_text(), file.name)
+        self.assertEqual(sorted(os.listdir(self.folder)), ['a.json', 'b.json'])
+
+    def test_abort_keeps_existing_file(self):
+        file = self.folder / 'a.json'
+        file.write_text('original')
+        with self.assertRaises(RuntimeError):
+            with atomic_open(file) as f:
+                f.write('partial')
+                raise RuntimeError()
+
+        self.assertEqual(file.read_text(), 'original')
+        self.assertEqual(os.listdir(self.folder), ['a.json'])
+
+    def test_relaxed_durability(self):
+        file = self.folder / 'a.json'
+        with mock.patch('os.fsync') as fsync:
+            with atomic_open(file, durability='relaxed') as f:
+                f.write('content')
+            fsync.assert_not_called()
+            with atomic_open(file) as f:
+                f.write('content')
+            fsync.assert_called()
+        self.assertEqual(file.read_text(), 'content')
+
+    def test_invalid_durability(self):
+        with self.assertRaises(ValueError):
+            AtomicGroup('none')
+
+    def test_on_commit(self):
+        committed = []
+        file = self.folder / 'a.json'
+        with AtomicGroup() as group:
+            with group.open(file) as f:
+                f.write('content')
+            group.on_commit(lambda: committed.append(file.exists()))
+            self.assertEqual(committed, [])
+        self.assertEqual(committed, [True])
+
+    def test_create_file_group(self):
+        source = self.folder / 'source.nix'
+        source.write_text('data')
+        destination = self.folder / 'destination.nix'
+        with AtomicGroup(durability='relaxed') as group:
+            create_file(source, destination, 'copy', group=group)
+            self.assertFalse(destination.exists())
+        self.assertEqual(destination.read_text(), 'data')
+
+    def test_metadata_files(self):
+        df = pd.DataFrame({'A': ['a', 'b']}, index=pd.Index(['1', '2'], name='index'))
+        tsv_file = self.folder / 'save_tsv.tsv'
+        save_tsv(df, tsv_file)
+
+        store = MetadataStore(durability='relaxed')
+        store.save_tsv(df, self.folder / 'store.tsv')
+        store.save_json({'A': 1}, self.folder / 'store.json')
+        store.flush()
+
+        self.assertEqual(tsv_file.read_text(), (self.folder / 'store.tsv').read_text())
+        self.assertEqual(sorted(os.listdir(self.folder)),
+                         ['save_tsv.tsv', 'store.json', 'store.tsv'])
+
+    def tearDown(self):
+        initialize_test_directory(clean=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import os
+import unittest
+
+import numpy as np
+
+from bep032tools.generator.tests.utils import initialize_test_directory, test_directory
+from bep032tools.generator.conversion_cache import ConversionCache
+from bep032tools.generator.BEP032Generator import convert_data, BEP032Data
+
+try:
+    import neo
+
+    HAVE_NEO = True
+except ImportError:
+    HAVE_NEO = False
+
+
+class TestConversionCache(unittest.TestCase):
+
+    def setUp(self):
+        initialize_test_directory(clean=True)
+        self.cache = ConversionCache(test_directory / 'cache')
+        self.source = test_directory / 'source.txt'
+        self.source.write_text('1 2 3\n')
+
+    def test_key(self):
+        key = self.cache.key(self.source, 'nix')
+        self.assertEqual(key, self.cache.key(self.source, 'nix'))
+        self.assertNotEqual(key, self.cache.key(self.source, 'nwb'))
+
+        self.source.write_text('1 2 4\n')
+        self.assertNotEqual(key, self.cache.key(self.source, 'nix'))
+
+    def test_key_fast(self):
+        cache = ConversionCache(test_directory / 'cache', fast=True)
+        key = cache.key(self.source, 'nix')
+        self.assertEqual(key, cache.key(self.source, 'nix'))
+
+        os.utime(self.source, ns=(0, 0))
+        self.assertNotEqual(key, cache.key(self.source, 'nix'))
+
+    def test_key_folder(self):
+        folder = test_directory / 'source_folder'
+        folder.mkdir()
+        (folder / 'a.txt').write_text('a')
+        key = self.cache.key(folder, 'nix')
+
+        (folder / 'b.txt').write_text('b')
+        self.assertNotEqual(key, self.cache.key(folder, 'nix'))
+
+    def test_put_get(self):
+        key = self.cache.key(self.source, 'nix')
+        self.assertIsNone(self.cache.get(key, 'nix'))
+
+        converted = test_directory / 'source.nix'
+        converted.write_text('converted')
+        entry = self.cache.put(key, 'nix', converted)
+        self.assertEqual(self.cache.get(key, 'nix'), entry)
+        self.assertEqual(entry.read_text(), 'converted')
+
+        destination = test_directory / 'destination.nix'
+        self.cache.link(entry, destination)
+        self.assertEqual(destination.read_text(), 'converted')
+
+    def test_eviction(self):
+        cache = ConversionCache(test_directory / 'cache', max_size=25)
+        entries = []
+        for i in range(3):
+            converted = test_directory / f'converted_{i}.nix'
+            converted.write_text('x' * 10)
+            entries.append(cache.put(f'key{i}', 'nix', converted))
+            # ensure distinct usage times
+            os.utime(cache.usage_dir / entries[-1].name, ns=(i * 10 ** 9, i * 10 ** 9))
+            if i == 1:
+                # mark the first entry as most recently used
+                cache.get('key0', 'nix')
+
+        self.assertLessEqual(cache.size(), 25)
+        self.assertIsNotNone(cache.get('key0', 'nix'))
+        self.assertIsNone(cache.get('key1', 'nix'))
+        self.assertIsNotNone(cache.get('key2', 'nix'))
+        self.assertEqual(sorted(p.name for p in cache.usage_dir.iterdir()),
+                         ['key0.nix', 'key2.nix'])
+
+    def test_get_keeps_linked_files(self):
+        # using a cached file does not modify the files linked to it
+        converted = test_directory / 'source.nix'
+        converted.write_text('converted')
+        os.utime(converted, ns=(0, 0))
+        entry = self.cache.put('key', 'nix', converted)
+        destination = test_directory / 'destination.nix'
+        self.cache.link(entry, destination)
+
+        self.assertEqual(self.cache.get('key', 'nix'), entry)
+        self.assertEqual(os.stat(destination).st_mtime_ns, 0)
+        self.assertEqual(os.stat(converted).st_mtime_ns, 0)
+
+    @unittest.skipUnless(HAVE_NEO, 'requires neo')
+    def test_convert_data_cached(self):
+        # a cached conversion is reused without reading the source with neo
+        key = self.cache.key(self.source, 'nix')
+        converted = test_directory / 'precomputed.nix'
+        converted.write_text('converted')
+        self.cache.put(key, 'nix', converted)
+
+        output_file = convert_data(self.source, 'nix', cache=self.cache)
+        self.assertEqual(output_file, self.source.with_suffix('.nix'))
+        self.assertEqual(output_file.read_text(), 'converted')
+
+    @unittest.skipUnless(HAVE_NEO, 'requires neo')
+    def test_convert_data_uncached(self):
+        # converting without cache replaces a link to a cached file instead of writing into it
+        source = test_directory / 'data.txt'
+        np.savetxt(source, np.random.random((10, 3)))
+        key = self.cache.key(source, 'nix')
+        converted = test_directory / 'precomputed.nix'
+        converted.write_text('converted')
+        entry = self.cache.put(key, 'nix', converted)
+        self.cache.link(entry, source.with_suffix('.nix'))
+
+        output_file = convert_data(source, 'nix')
+        self.assertFalse(os.path.samefile(output_file, entry))
+        self.assertEqual(entry.read_text(), 'converted')
+
+    @unittest.skipUnless(HAVE_NEO, 'requires neo')
+    def test_organize_data_files(self):
+        source = test_directory / 'data.txt'
+        np.savetxt(source, np.random.random((10, 3)))
+        basedir = test_directory / 'project'
+        basedir.mkdir()
+
+        for ses_id in ['ses1', 'ses2']:
+            data = BEP032Data('sub1', ses_id)
+            data.basedir = basedir
+            data.generate_directory_structure()
+            data.register_data_sources(source)
+            data.organize_data_files(mode='copy', autoconvert='nix',
+                                     conversion_cache=self.cache)
+
+        entry = self.cache.get(self.cache.key(source, 'nix'), 'nix')
+        self.assertIsNotNone(entry)
+        # the converted file next to the source is a link to the cached file
+        self.assertTrue(os.path.samefile(entry, source.with_suffix('.nix')))
+        self.assertEqual(len(list(basedir.rglob('*.nix'))), 2)
+
+    def tearDown(self):
+        initialize_test_directory(clean=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
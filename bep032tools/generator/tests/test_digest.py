@@ -0,0 +1,112 @@
+import os
+import unittest
+from unittest import mock
+
+from bep032tools.generator.tests.utils import initialize_test_directory, test_directory
+from bep032tools.generator.digest import DigestIndex
+from bep032tools.generator.BEP032Generator import create_file
+
+
+class TestDigestIndex(unittest.TestCase):
+
+    def setUp(self):
+        initialize_test_directory(clean=True)
+        self.index = DigestIndex.for_dataset(test_directory)
+        self.source = test_directory / 'source.bin'
+        self.source.write_bytes(b'content')
+
+    def test_digest(self):
+        other = test_directory / 'other.bin'
+        other.write_bytes(b'content')
+        self.assertEqual(self.index.digest(self.source), self.index.digest(other))
+
+        other.write_bytes(b'modified')
+        self.assertNotEqual(self.index.digest(self.source), self.index.digest(other))
+
+    def test_digest_cached(self):
+        digest = self.index.digest(self.source)
+        key = os.path.abspath(self.source)
+        # a cached digest is used as long as the file signature is unchanged
+        self.index.digests[key][3] = 'cached'
+        self.assertEqual(self.index.digest(self.source), 'cached')
+
+        self.source.write_bytes(b'new content')
+        self.assertNotEqual(self.index.digest(self.source), digest)
+
+    def test_recorded_digest(self):
+        expected = self.index.digest(self.source)
+        index = DigestIndex.for_dataset(test_directory)
+        with mock.patch('builtins.open') as open_mock:
+            index.record_digest(self.source, expected)
+            # recorded digests are used without reading the file
+            self.assertEqual(index.digest(self.source), expected)
+            open_mock.assert_not_called()
+
+    def test_recorded_copy(self):
+        destination = test_directory / 'destination.bin'
+        destination.write_bytes(b'content')
+        self.index.record_copy(self.source, destination)
+        # recorded copies are identical without computing digests
+        self.assertTrue(self.index.is_identical(self.source, destination))
+        self.assertEqual(self.index.digests, {})
+
+        destination.write_bytes(b'altered')
+        self.assertFalse(self.index.is_identical(self.source, destination))
+
+    def test_save_load(self):
+        destination = test_directory / 'destination.bin'
+        create_file(self.source, destination, 'copy', digest_index=self.index)
+        self.index.save()
+
+        index = DigestIndex.for_dataset(test_directory)
+        self.assertEqual(index.copies, self.index.copies)
+        self.assertTrue(index.is_identical(self.source, destination))
+
+    def test_subset_changes(self):
+        session = test_directory / 'sub-1' / 'ses-1'
+        other_session = test_directory / 'sub-1' / 'ses-10'
+        for folder in [session, other_session]:
+            folder.mkdir(parents=True)
+            create_file(self.source, folder / 'data.bin', 'copy', digest_index=self.index)
+            self.index.digest(folder / 'data.bin')
+        self.index.digest(self.source)
+
+        subset = self.index.subset([session])
+        self.assertEqual(list(subset.copies), [os.path.abspath(session / 'data.bin')])
+        # digests of the copied sources are kept
+        self.assertEqual(sorted(subset.digests), sorted([os.path.abspath(session / 'data.bin'),
+                                                         os.path.abspath(self.source)]))
+        self.assertEqual(subset.changes().digests, {})
+
+        (session / 'new.bin').write_bytes(b'new')
+        subset.digest(session / 'new.bin')
+        subset.digest(session / 'data.bin')
+        changes = subset.changes()
+        self.assertEqual(list(changes.digests), [os.path.abspath(session / 'new.bin')])
+        self.assertEqual(changes.copies, {})
+
+        self.index.update(changes)
+        self.assertIn(os.path.abspath(session / 'new.bin'), self.index.digests)
+
+    def test_create_file_skip_identical(self):
+        destination = test_directory / 'destination.bin'
+        create_file(self.source, destination, 'copy', digest_index=self.index)
+        signature = os.stat(destination)
+
+        stats = create_file(self.source, destination, 'copy', exist_ok=True,
+                            digest_index=self.index)
+        self.assertEqual(stats.method, 'skip')
+        self.assertEqual(os.stat(destination).st_ino, signature.st_ino)
+        self.assertEqual(os.stat(destination).st_mtime_ns, signature.st_mtime_ns)
+
+        self.source.write_bytes(b'changed')
+        with self.assertRaises(ValueError):
+            create_file(self.source, destination, 'copy', exist_ok=True,
+                        digest_index=self.index)
+
+    def tearDown(self):
+        initialize_test_directory(clean=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
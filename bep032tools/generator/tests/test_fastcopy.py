@@ -0,0 +1,86 @@
+import os
+import unittest
+from unittest import mock
+
+from bep032tools.generator.tests.utils import initialize_test_directory, test_directory
+from bep032tools.generator.fastcopy import copy_file, link_or_copy_file, COPY_METHODS
+from bep032tools.generator.BEP032Generator import create_file
+
+
+class TestFastCopy(unittest.TestCase):
+
+    def setUp(self):
+        initialize_test_directory(clean=True)
+        self.source = test_directory / 'source.bin'
+        self.content = os.urandom(3 * 1024 * 1024 + 17)
+        self.source.write_bytes(self.content)
+        os.chmod(self.source, 0o640)
+
+    def test_copy_file(self):
+        destination = test_directory / 'destination.bin'
+        stats = copy_file(self.source, destination)
+        self.assertIn(stats.method, [name for name, _ in COPY_METHODS])
+        self.assertEqual(stats.size, len(self.content))
+        self.assertGreater(stats.rate, 0)
+        self.assertEqual(destination.read_bytes(), self.content)
+        self.assertEqual(os.stat(destination).st_mode, os.stat(self.source).st_mode)
+
+    def test_copy_methods(self):
+        # the kernel and userspace copy methods are supported on all linux file systems
+        for method in ['copy_file_range', 'sendfile', 'buffered']:
+            destination = test_directory / f'destination_{method}.bin'
+            stats = copy_file(self.source, destination, methods=[method])
+            self.assertEqual(stats.method, method)
+            self.assertEqual(destination.read_bytes(), self.content)
+
+    def test_copy_empty_file(self):
+        source = test_directory / 'empty.bin'
+        source.touch()
+        destination = test_directory / 'destination.bin'
+        stats = copy_file(source, destination, methods=['buffered'])
+        self.assertEqual(stats.size, 0)
+        self.assertEqual(destination.read_bytes(), b'')
+
+    def test_copy_file_range_no_data(self):
+        # some file systems report 0 bytes copied instead of an error
+        destination = test_directory / 'destination.bin'
+        with mock.patch('os.copy_file_range', return_value=0):
+            stats = copy_file(self.source, destination,
+                              methods=['copy_file_range', 'sendfile', 'buffered'])
+        self.assertEqual(stats.method, 'sendfile')
+        self.assertEqual(destination.read_bytes(), self.content)
+
+    def test_copy_file_range_short_copy(self):
+        def copy_file_range(src_fd, dst_fd, count, offset_src, offset_dst):
+            if offset_src > 0:
+                return 0
+            os.pwrite(dst_fd, os.pread(src_fd, 1024, 0), 0)
+            return 1024
+
+        destination = test_directory / 'destination.bin'
+        with mock.patch('os.copy_file_range', side_effect=copy_file_range):
+            with self.assertRaises(OSError):
+                copy_file(self.source, destination, methods=['copy_file_range', 'buffered'])
+
+    def test_link_or_copy_file(self):
+        destination = test_directory / 'destination.bin'
+        stats = link_or_copy_file(self.source, destination)
+        self.assertEqual(stats.method, 'link')
+        self.assertTrue(os.path.samefile(self.source, destination))
+
+    def test_create_file(self):
+        destination = test_directory / 'destination.bin'
+        stats = create_file(self.source, destination, mode='auto')
+        self.assertEqual(stats.method, 'link')
+
+        stats = create_file(self.source, destination, mode='copy', exist_ok=True)
+        self.assertNotEqual(stats.method, 'link')
+        self.assertFalse(os.path.samefile(self.source, destination))
+        self.assertEqual(destination.read_bytes(), self.content)
+
+    def tearDown(self):
+        initialize_test_directory(clean=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
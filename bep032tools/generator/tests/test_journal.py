@@ -0,0 +1,177 @@
+import subprocess
+import sys
+import unittest
+from unittest import mock
+from pathlib import Path
+
+from bep032tools.generator.tests.utils import (initialize_test_directory, test_directory,
+                                               generate_example_csv_file)
+from bep032tools.generator.journal import GenerationJournal
+from bep032tools.generator.BEP032Generator import BEP032Data, iter_csv_rows
+from bep032tools.validator.BEP032Validator import is_valid
+
+
+class TestGenerationJournal(unittest.TestCase):
+
+    def setUp(self):
+        initialize_test_directory(clean=True)
+
+    def test_resume(self):
+        output = test_directory / 'output.nix'
+        journal = GenerationJournal(test_directory)
+        journal.begin('unit1', [output])
+        output.write_text('complete')
+        journal.commit('unit1', [output])
+        journal.begin('unit2', [test_directory / 'partial.nix'])
+
+        journal = GenerationJournal(test_directory, resume=True)
+        self.assertTrue(journal.is_completed('unit1'))
+        self.assertFalse(journal.is_completed('unit2'))
+
+        # a new journal discards previous records
+        journal = GenerationJournal(test_directory)
+        self.assertFalse(journal.is_completed('unit1'))
+
+    def test_modified_unit(self):
+        outputs = [test_directory / 'output1.nix', test_directory / 'output2.nix']
+        journal = GenerationJournal(test_directory)
+        for output in outputs:
+            journal.begin(output.stem, [output])
+            output.write_text('complete')
+            journal.commit(output.stem, [output])
+        outputs[0].write_text('modified')
+        outputs[1].unlink()
+
+        journal = GenerationJournal(test_directory, resume=True)
+        for output in outputs:
+            self.assertFalse(journal.is_completed(output.stem))
+        # files of modified units are removed before creating them again
+        journal.begin('output1', [outputs[0]])
+        self.assertFalse(outputs[0].exists())
+
+    def test_partial_unit_removed(self):
+        partial = test_directory / 'partial.nix'
+        journal = GenerationJournal(test_directory)
+        journal.begin('unit', [partial])
+        partial.write_text('trunc')
+        # simulate a record interrupted while being written
+        with open(journal.path, 'a') as f:
+            f.write('{"event": "do')
+
+        journal = GenerationJournal(test_directory, resume=True)
+        journal.begin('unit', [partial])
+        self.assertFalse(partial.exists())
+
+    def test_relaxed_durability(self):
+        output = test_directory / 'output.nix'
+        output.write_text('complete')
+        with mock.patch('os.fsync') as fsync:
+            journal = GenerationJournal(test_directory, durability='relaxed')
+            journal.begin('unit', [output])
+            journal.commit('unit', [output])
+            fsync.assert_not_called()
+            GenerationJournal(test_directory).begin('unit', [output])
+            fsync.assert_called()
+        with self.assertRaises(ValueError):
+            GenerationJournal(test_directory, durability='none')
+
+    def test_unit_id(self):
+        self.assertEqual(GenerationJournal.unit_id({'a': 1, 'b': 2}, 'nix'),
+                         GenerationJournal.unit_id({'b': 2, 'a': 1}, 'nix'))
+        self.assertNotEqual(GenerationJournal.unit_id({'a': 1}, 'nix'),
+                            GenerationJournal.unit_id({'a': 1}, None))
+
+    def tearDown(self):
+        initialize_test_directory(clean=True)
+
+
+class TestResumeGeneration(unittest.TestCase):
+
+    def setUp(self):
+        test_dir = Path(initialize_test_directory(clean=True))
+        self.test_dir = test_dir / 'generateTest'
+        self.csv_file = generate_example_csv_file(mode='full')
+
+    def test_resume(self):
+        rows = list(iter_csv_rows(self.csv_file))
+        BEP032Data.generate_bids_dataset(self.csv_file, self.test_dir)
+        data_files = sorted(self.test_dir.rglob('*_ephys.nix'))
+        self.assertEqual(len(data_files), len(rows))
+        # the journal is removed after a successful run
+        self.assertFalse((self.test_dir / GenerationJournal(self.test_dir).path.name).exists())
+
+        # simulate a run interrupted while processing the last row
+        journal = GenerationJournal(self.test_dir)
+        for row in rows[:-1]:
+            journal.commit(journal.unit_id(row, None), [])
+        journal.begin(journal.unit_id(rows[-1], None), [data_files[-1]])
+        data_files[-1].write_text('truncated')
+        # files of completed rows are not created again
+        data_files[0].unlink()
+
+        BEP032Data.generate_bids_dataset(self.csv_file, self.test_dir, resume=True)
+        self.assertFalse(data_files[0].exists())
+        self.assertEqual(data_files[-1].read_text(), '')
+
+    def test_resume_modified_row(self):
+        rows = list(iter_csv_rows(self.csv_file))
+        BEP032Data.generate_bids_dataset(self.csv_file, self.test_dir)
+        data_files = sorted(self.test_dir.rglob('*_ephys.nix'))
+        expected = data_files[0].read_bytes()
+
+        # simulate an interrupted run, after which a data file of a completed row was modified
+        journal = GenerationJournal(self.test_dir)
+        for row, data_file in zip(rows, data_files):
+            journal.commit(journal.unit_id(row, None), [data_file])
+        data_files[0].write_text('modified')
+        stat = data_files[1].stat()
+
+        BEP032Data.generate_bids_dataset(self.csv_file, self.test_dir, resume=True)
+        self.assertEqual(data_files[0].read_bytes(), expected)
+        # unchanged rows are not processed again
+        self.assertEqual(data_files[1].stat().st_mtime_ns, stat.st_mtime_ns)
+        self.assertEqual(data_files[1].stat().st_ino, stat.st_ino)
+
+    def test_resume_after_kill(self):
+        # kill the generation while the second data file is being copied
+        code = f"""
+import os
+from bep032tools.generator import BEP032Generator
+
+original_copy_file = BEP032Generator.copy_file
+copies = []
+
+def copy_file(source, destination):
+    if copies:
+        with open(destination, 'wb') as f:
+            f.write(b'partial')
+        os._exit(1)
+    copies.append(source)
+    return original_copy_file(source, destination)
+
+BEP032Generator.copy_file = copy_file
+BEP032Generator.BEP032Data.generate_bids_dataset({str(self.csv_file)!r}, {str(self.test_dir)!r})
+"""
+        process = subprocess.run([sys.executable, '-c', code])
+        self.assertEqual(process.returncode, 1)
+        self.assertEqual(len(list(self.test_dir.rglob('.*.tmp'))), 1)
+
+        BEP032Data.generate_bids_dataset(self.csv_file, self.test_dir, resume=True)
+        self.assertEqual(list(self.test_dir.rglob('.*.tmp')), [])
+        # the resumed dataset is validated as a dataset generated without interruption
+        reference_dir = self.test_dir.parent / 'reference'
+        BEP032Data.generate_bids_dataset(self.csv_file, reference_dir)
+        errors = is_valid(self.test_dir)[1]
+        reference_errors = [error.replace(str(reference_dir), str(self.test_dir))
+                            for error in is_valid(reference_dir)[1]]
+        self.assertEqual(sorted(errors), sorted(reference_errors))
+        self.assertFalse(any('.tmp' in error for error in errors))
+
+    def tearDown(self):
+        initialize_test_directory(clean=True)
+        for i in range(4):
+            Path(f'my_data_file_{i}.nix').unlink(missing_ok=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import unittest
+
+from bep032tools.generator.tests.utils import initialize_test_directory, test_directory
+from bep032tools.generator.metadata_cache import MetadataCache
+
+
+class TestMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        initialize_test_directory(clean=True)
+        self.cache_file = test_directory / 'cache' / 'metadata.sqlite'
+        self.data_file = test_directory / 'data.nwb'
+        self.data_file.write_text('data')
+
+    def test_persistence(self):
+        cache = MetadataCache(self.cache_file)
+        self.assertIsNone(cache.get(self.data_file, [0]))
+        cache.put(self.data_file, [0], {'subject': ['mouse']})
+        cache.save()
+
+        cache = MetadataCache(self.cache_file)
+        self.assertEqual(cache.get(self.data_file, [0]), {'subject': ['mouse']})
+        # records are only valid for the same parameters
+        self.assertIsNone(cache.get(self.data_file, [1]))
+
+    def test_modified_file(self):
+        cache = MetadataCache(self.cache_file)
+        cache.put(self.data_file, [0], 'record')
+        cache.save()
+
+        stat = os.stat(self.data_file)
+        os.utime(self.data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        self.assertIsNone(MetadataCache(self.cache_file).get(self.data_file, [0]))
+
+    def test_unsaved_records(self):
+        cache = MetadataCache(self.cache_file)
+        cache.put(self.data_file, [0], 'record')
+        self.assertEqual(cache.get(self.data_file, [0]), 'record')
+        self.assertIsNone(MetadataCache(self.cache_file).get(self.data_file, [0]))
+
+    def tearDown(self):
+        initialize_test_directory(clean=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
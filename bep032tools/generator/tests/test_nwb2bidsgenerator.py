@@ -1,13 +1,22 @@
+import shutil
 import tempfile
 import unittest
 from pathlib import Path
 import re
-from bep032tools.generator.tests.utils import test_directory
+from unittest import mock
+
+import h5py
+import pandas as pd
+
+from bep032tools.generator.tests.utils import (test_directory, initialize_test_directory,
+                                               generate_example_nwb_files)
 from datalad.api import install, Dataset
 import os
 ON_GITHUB = 'GITHUB_WORKFLOW' in os.environ
 
-from bep032tools.generator.nwb2bidsgenerator import NwbToBIDS, is_valid
+from bep032tools.generator.nwb2bidsgenerator import NwbToBIDS, is_valid, _extract_file_metadata
+from bep032tools.generator.nwbheader import read_nwb_header, UnsupportedNwbFile
+from bep032tools.validator.BEP032Validator import WRITTEN_FILES_FILENAME
 
 
 @unittest.skipIf(ON_GITHUB, 'Not running NWB test on github for performance reasons')
@@ -72,3 +81,172 @@ class TestNwbBIDSGenerator(unittest.TestCase):
         matching_error = [e for e in search_results if e is not None]
         assert matching_error, 'mandatory file rule validation error'
 
+
+class TestNwbMetadataExtraction(unittest.TestCase):
+
+    def setUp(self):
+        initialize_test_directory(clean=True)
+        self.datadir = test_directory / 'nwb_dataset'
+        generate_example_nwb_files(self.datadir)
+
+    def assertMetadataEqual(self, first, second):
+        pd.testing.assert_frame_equal(first._participants_dict['data'],
+                                      second._participants_dict['data'])
+        self.assertEqual(first.get_dataset_description(), second.get_dataset_description())
+        self.assertEqual(list(first._sessions_dict), list(second._sessions_dict))
+        for subject, sessions in first._sessions_dict.items():
+            pd.testing.assert_frame_equal(sessions['data'],
+                                          second._sessions_dict[subject]['data'])
+            for session in sessions['data']['session_id']:
+                for attribute in ['_channels_dict', '_contacts_dict', '_probes_dict']:
+                    pd.testing.assert_frame_equal(
+                        getattr(first, attribute)[subject][session]['data'],
+                        getattr(second, attribute)[subject][session]['data'])
+                self.assertEqual(first._ephys_dict[subject][session],
+                                 second._ephys_dict[subject][session])
+                self.assertEqual(first._nwbfile_name_dict[subject][session],
+                                 second._nwbfile_name_dict[subject][session])
+
+    def test_parallel_extraction(self):
+        self.assertMetadataEqual(NwbToBIDS(self.datadir), NwbToBIDS(self.datadir, workers=2))
+
+    def test_channel_and_contact_tables(self):
+        n2b = NwbToBIDS(self.datadir, probe_type='chronic')
+        for subject, session, probe in [('sub-mouse0', 'ses-ses0', 'probe0'),
+                                        ('sub-mouse1', 'ses-ses1', 'probe1')]:
+            channels = n2b._channels_dict[subject][session]['data']
+            self.assertEqual(list(channels['channel_id']), [0, 1, 2])
+            self.assertEqual(list(channels['sampling_frequency']), [30000.] * 3)
+            contacts = n2b._contacts_dict[subject][session]['data']
+            self.assertEqual(list(contacts['y']), [0., 1., 2.])
+            self.assertEqual(list(contacts['probe_id']), [probe] * 3)
+            probes = n2b._probes_dict[subject][session]['data']
+            self.assertEqual(probes.values.tolist(), [[probe, 'chronic']])
+
+    def test_prefix_labels(self):
+        # labels being prefixes of previously found labels are distinct subjects and sessions
+        files = sorted(self.datadir.glob('*.nwb'))
+        for nwb_file, path, value in [(files[0], 'general/subject/subject_id', 'mouse10'),
+                                      (files[1], 'general/session_id', 'ses30')]:
+            with h5py.File(nwb_file, 'a') as f:
+                del f[path]
+                f.create_dataset(path, data=value, dtype=h5py.string_dtype())
+
+        n2b = NwbToBIDS(self.datadir)
+        self.assertEqual(list(n2b._participants_dict['data']['participant_id']),
+                         ['sub-mouse10', 'sub-mouse1', 'sub-mouse0'])
+        self.assertEqual(list(n2b._sessions_dict['sub-mouse1']['data']['session_id']),
+                         ['ses-ses30', 'ses-ses3'])
+
+    def test_header_reader(self):
+        self.assertMetadataEqual(NwbToBIDS(self.datadir, reader='pynwb'),
+                                 NwbToBIDS(self.datadir, reader='header'))
+
+    def test_header_reader_fallback(self):
+        nwb_file = sorted(self.datadir.glob('*.nwb'))[0]
+        with h5py.File(nwb_file, 'a') as f:
+            f['acquisition/recording'].attrs['namespace'] = 'ndx-custom'
+        with self.assertRaises(UnsupportedNwbFile):
+            read_nwb_header(nwb_file)
+
+        # files not supported by the header reader are read with pynwb
+        with h5py.File(nwb_file, 'a') as f:
+            f['acquisition/recording'].attrs['namespace'] = 'core'
+        expected = _extract_file_metadata(NwbToBIDS, nwb_file, {}, reader='pynwb')
+        with mock.patch('bep032tools.generator.nwb2bidsgenerator.read_nwb_header',
+                        side_effect=UnsupportedNwbFile()):
+            observed = _extract_file_metadata(NwbToBIDS, nwb_file, {}, reader='header')
+        pd.testing.assert_frame_equal(expected['channels'], observed['channels'])
+        self.assertEqual(expected['subject'], observed['subject'])
+
+    def test_metadata_cache(self):
+        cache_file = test_directory / 'nwb_metadata.sqlite'
+        expected = NwbToBIDS(self.datadir, metadata_cache=cache_file)
+
+        with mock.patch('bep032tools.generator.nwb2bidsgenerator._extract_file_metadata') as \
+                extract:
+            cached = NwbToBIDS(self.datadir, metadata_cache=cache_file)
+            extract.assert_not_called()
+        self.assertMetadataEqual(expected, cached)
+
+        # modified files are read again
+        modified = sorted(self.datadir.glob('*.nwb'))[1]
+        stat = os.stat(modified)
+        os.utime(modified, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        with mock.patch('bep032tools.generator.nwb2bidsgenerator._extract_file_metadata',
+                        wraps=_extract_file_metadata) as extract:
+            self.assertMetadataEqual(expected, NwbToBIDS(self.datadir, metadata_cache=cache_file))
+            self.assertEqual(extract.call_count, 1)
+            self.assertEqual(extract.call_args[0][1], modified)
+
+    def test_metadata_cache_inserted_file(self):
+        cache_file = test_directory / 'nwb_metadata.sqlite'
+        files = sorted(self.datadir.glob('*.nwb'))
+        # subjects without identifier are labelled by the position of the file
+        with h5py.File(files[-1], 'a') as f:
+            del f['general/subject']
+        n2b = NwbToBIDS(self.datadir, metadata_cache=cache_file)
+        self.assertIn('sub-noname3', list(n2b._participants_dict['data']['participant_id']))
+
+        # a file inserted in front does not invalidate the cached metadata of the other files
+        shutil.copy(files[0], self.datadir / 'a_file.nwb')
+        with mock.patch('bep032tools.generator.nwb2bidsgenerator._extract_file_metadata',
+                        wraps=_extract_file_metadata) as extract:
+            n2b = NwbToBIDS(self.datadir, metadata_cache=cache_file)
+            self.assertEqual(extract.call_count, 1)
+            self.assertEqual(extract.call_args[0][1], self.datadir / 'a_file.nwb')
+        self.assertIn('sub-noname4', list(n2b._participants_dict['data']['participant_id']))
+        self.assertIn('sub-noname4', n2b._nwbfile_name_dict)
+
+    def test_organize(self):
+        output = test_directory / 'bids'
+        n2b = NwbToBIDS(self.datadir, workers=2)
+        stats = n2b.organize(output_path=output, validate=False, workers=3)
+        self.assertEqual(len(list(output.glob('sub-*/ses-*/ephys/*.nwb'))), 4)
+        # dataset description, participants, 2 sessions files and 5 files per session
+        self.assertEqual(stats.files, 24)
+        self.assertEqual(stats.size, sum(f.stat().st_size for f in output.rglob('*')
+                                         if f.is_file() and f.suffix != '.nwb'
+                                         and f.name != WRITTEN_FILES_FILENAME))
+        self.assertGreater(stats.rate, 0)
+        validation_output = is_valid(output)
+        self.assertTrue(validation_output[0], validation_output[1])
+
+    def test_organize_sync(self):
+        output = test_directory / 'bids'
+        stats = NwbToBIDS(self.datadir).organize(output_path=output, validate=False, sync=True)
+        self.assertEqual((stats.files, stats.unchanged, stats.removed), (24, 0, 0))
+        links = sorted(output.glob('sub-*/ses-*/ephys/*.nwb'))
+        link_times = [os.lstat(link).st_mtime_ns for link in links]
+
+        # unchanged dataset: files not written by the converter are left alone
+        user_files = [output / 'README', output / 'sub-mouse0' / 'notes.tsv',
+                      output / 'derivatives' / 'sub-mouse1' / 'analysis.tsv',
+                      output / '.git' / 'objects' / 'object']
+        for user_file in user_files:
+            user_file.parent.mkdir(parents=True, exist_ok=True)
+            user_file.write_text('user content')
+        stats = NwbToBIDS(self.datadir).organize(output_path=output, validate=False, sync=True)
+        self.assertEqual((stats.files, stats.size, stats.unchanged, stats.removed),
+                         (0, 0, 24, 0))
+        self.assertEqual([os.lstat(link).st_mtime_ns for link in links], link_times)
+
+        # removed session: files written by the previous run are removed together with the
+        # session folder and the sessions file is updated
+        (self.datadir / 'file3.nwb').unlink()
+        stats = NwbToBIDS(self.datadir).organize(output_path=output, validate=False, sync=True)
+        self.assertEqual((stats.files, stats.unchanged, stats.removed), (1, 18, 5))
+        self.assertFalse((output / 'sub-mouse1' / 'ses-ses3').exists())
+        self.assertNotIn('ses3', (output / 'sub-mouse1' / 'sub-mouse1_sessions.tsv').read_text())
+        for user_file in user_files:
+            self.assertEqual(user_file.read_text(), 'user content')
+
+        for user_file in user_files[:2]:
+            user_file.unlink()
+        shutil.rmtree(output / 'derivatives')
+        shutil.rmtree(output / '.git')
+        validation_output = is_valid(output)
+        self.assertTrue(validation_output[0], validation_output[1])
+
+    def tearDown(self):
+        initialize_test_directory(clean=True)
@@ -0,0 +1,79 @@
+import subprocess
+import sys
+import unittest
+
+import numpy as np
+
+from bep032tools.generator.tests.utils import initialize_test_directory, test_directory
+from bep032tools.generator.BEP032Generator import convert_data, BEP032Data
+
+try:
+    import neo
+
+    HAVE_NEO = True
+except ImportError:
+    HAVE_NEO = False
+
+
+class TestOptionalNeo(unittest.TestCase):
+
+    def test_import_without_neo(self):
+        # neo is an optional dependency of the generator
+        code = ("import sys; sys.modules['neo'] = None; "
+                "import bep032tools.generator.BEP032Generator, "
+                "bep032tools.generator.BEP032Templater")
+        subprocess.run([sys.executable, '-c', code], check=True)
+
+
+@unittest.skipUnless(HAVE_NEO, 'requires neo')
+class TestStreamingConversion(unittest.TestCase):
+
+    def setUp(self):
+        initialize_test_directory(clean=True)
+        # raw binary data is read by neo with two int16 channels by default
+        self.source = test_directory / 'recording.raw'
+        self.data = (np.arange(2 * 1001) % 1000).astype('int16').reshape(-1, 2)
+        self.data.tofile(self.source)
+
+    def read_signal(self, filename):
+        with neo.NixIO(str(filename), mode='ro') as io:
+            block = io.read_block()
+        return block.segments[0].analogsignals[0]
+
+    def test_chunked_conversion(self):
+        # a buffer of 10 samples per channel requires multiple chunks
+        output_file = convert_data(self.source, 'nix', streaming=True, chunk_size=40)
+        streamed = self.read_signal(output_file)
+        output_file.unlink()
+
+        output_file = convert_data(self.source, 'nix')
+        expected = self.read_signal(output_file)
+
+        self.assertEqual(streamed.shape, self.data.shape)
+        np.testing.assert_array_equal(streamed.magnitude, expected.magnitude)
+        self.assertEqual(streamed.t_start, expected.t_start)
+        self.assertEqual(streamed.sampling_rate, expected.sampling_rate)
+
+    def test_unsupported_format(self):
+        with self.assertRaises(ValueError):
+            convert_data(self.source, 'nwb', streaming=True)
+
+    def test_organize_data_files(self):
+        basedir = test_directory / 'project'
+        basedir.mkdir()
+        data = BEP032Data('sub1', 'ses1')
+        data.basedir = basedir
+        data.generate_directory_structure()
+        data.register_data_sources(self.source)
+        data.organize_data_files(mode='copy', autoconvert='nix', streaming=True)
+
+        observed_files = list(data.get_data_folder().glob('*.nix'))
+        self.assertEqual(len(observed_files), 1)
+        self.assertEqual(self.read_signal(observed_files[0]).shape, self.data.shape)
+
+    def tearDown(self):
+        initialize_test_directory(clean=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,16 @@
 import copy
+import json
 import unittest
+from unittest import mock
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 
 from bep032tools.generator.tests.utils import (initialize_test_directory, test_directory)
-from bep032tools.generator.utils import (save_tsv, save_json, merge_dfs_by_index, merge_dict)
+from bep032tools.generator.utils import (save_tsv, save_json, merge_dfs_by_index, merge_dict,
+                                         MetadataStore, metadata_file_exists, find_conflicts,
+                                         Conflict, merge_many)
 
 
 class TestUtils(unittest.TestCase):
@@ -197,3 +201,148 @@ class TestUtils(unittest.TestCase):
         merged = merge_dict(d1, d2)
 
         self.assertDictEqual(expected, merged)
+
+
+class TestMetadataStore(unittest.TestCase):
+
+    def setUp(self) -> None:
+        initialize_test_directory()
+        self.store = MetadataStore()
+
+    def test_buffered_tsv(self):
+        path = test_directory / 'participants.tsv'
+        for i in range(3):
+            df = pd.DataFrame({'participant_id': [f'sub-{i}'], 'age': [i]})
+            df.set_index('participant_id', inplace=True)
+            save_tsv(df, path, store=self.store)
+            # saving identical content does not conflict
+            save_tsv(df, path, store=self.store)
+
+        self.assertFalse(path.exists())
+        self.assertTrue(metadata_file_exists(path, store=self.store))
+        self.store.flush()
+
+        df_read = pd.read_csv(path, sep='\t', index_col=0, dtype=str)
+        self.assertListEqual(list(df_read.index), ['sub-0', 'sub-1', 'sub-2'])
+        self.assertListEqual(list(df_read['age']), ['0', '1', '2'])
+
+    def test_existing_tsv(self):
+        path = test_directory / 'participants.tsv'
+        df = pd.DataFrame({'participant_id': ['sub-0'], 'age': ['0']})
+        df.set_index('participant_id', inplace=True)
+        save_tsv(df, path)
+
+        df = pd.DataFrame({'participant_id': ['sub-0', 'sub-1'], 'sex': ['F', 'M']})
+        df.set_index('participant_id', inplace=True)
+        with self.store:
+            save_tsv(df, path, store=self.store)
+
+        df_read = pd.read_csv(path, sep='\t', index_col=0, dtype=str)
+        self.assertEqual(df_read.loc['sub-0', 'age'], '0')
+        self.assertEqual(df_read.loc['sub-1', 'sex'], 'M')
+
+    def test_tsv_conflict(self):
+        path = test_directory / 'participants.tsv'
+        df = pd.DataFrame({'participant_id': ['sub-0'], 'age': [1]})
+        df.set_index('participant_id', inplace=True)
+        self.store.save_tsv(df, path)
+
+        df = pd.DataFrame({'participant_id': ['sub-0'], 'age': [2]})
+        df.set_index('participant_id', inplace=True)
+        with self.assertRaises(ValueError):
+            self.store.save_tsv(df, path)
+
+    def test_buffered_json(self):
+        path = test_directory / 'dataset_description.json'
+        save_json({'Name': 'test', 'Authors': ['a']}, path)
+        save_json({'Authors': ['b']}, path, store=self.store)
+        save_json({'Authors': ['c']}, path, store=self.store)
+        with open(path) as f:
+            self.assertDictEqual(json.load(f), {'Name': 'test', 'Authors': ['a']})
+
+        self.store.flush()
+        with open(path) as f:
+            self.assertDictEqual(json.load(f), {'Name': 'test', 'Authors': ['a', 'b', 'c']})
+
+    def test_json_conflict(self):
+        path = test_directory / 'conflict_ephys.json'
+        self.store.save_json({'PowerLineFrequency': 50}, path)
+        self.store.save_json({'PowerLineFrequency': 60}, path)
+        # the pending content is merged when flushing
+        with mock.patch('bep032tools.generator.utils.merge_many',
+                        wraps=merge_many) as merge, self.assertRaises(ValueError):
+            self.store.flush()
+        merge.assert_called_once_with([{'PowerLineFrequency': 50}, {'PowerLineFrequency': 60}])
+        self.assertFalse(path.exists())
+
+
+class TestFindConflicts(unittest.TestCase):
+
+    def test_conflict_report(self):
+        a = pd.DataFrame({
+            "i": [1, 2, 3],
+            "a": ['a1', 'a2', None],
+            "b": ['b1', 'b2', 'b3']
+        })
+        a.set_index('i', inplace=True)
+        b = pd.DataFrame({
+            "i": [2, 3, 4],
+            "a": ['x2', 'a3', 'a4'],
+            "b": ['b2', 'y3', None]
+        })
+        b.set_index('i', inplace=True)
+
+        conflicts = find_conflicts(a, b)
+        self.assertListEqual(conflicts, [Conflict(2, 'a', 'a2', 'x2'),
+                                         Conflict(3, 'b', 'b3', 'y3')])
+
+        with self.assertRaises(ValueError) as context:
+            merge_dfs_by_index(a, b)
+        self.assertIn("'a2' != 'x2'", str(context.exception))
+
+    def test_no_overlap(self):
+        a = pd.DataFrame({"i": [1], "a": ['a1']})
+        a.set_index('i', inplace=True)
+        b = pd.DataFrame({"i": [2], "a": ['a2']})
+        b.set_index('i', inplace=True)
+        self.assertListEqual(find_conflicts(a, b), [])
+
+    def test_merge_symmetric(self):
+        a = pd.DataFrame({"i": [1, 2], "b": ['b1', None], "a": ['a1', 'a2']})
+        a.set_index('i', inplace=True)
+        b = pd.DataFrame({"i": [2, 3], "c": ['c2', 'c3'], "b": ['b2', None]})
+        b.set_index('i', inplace=True)
+        self.assertTrue(merge_dfs_by_index(a, b).equals(merge_dfs_by_index(b, a)))
+
+
+class TestMergeMany(unittest.TestCase):
+
+    def test_inputs_unchanged(self):
+        d1 = {'shared': {'list': [1], 'nested': {'a': 1}}, 'unchanged': {'b': [2]}}
+        d2 = {'shared': {'list': [2], 'nested': {'c': 3}}}
+        d1_copy = copy.deepcopy(d1)
+        d2_copy = copy.deepcopy(d2)
+
+        merged = merge_dict(d1, d2)
+        self.assertDictEqual(d1, d1_copy)
+        self.assertDictEqual(d2, d2_copy)
+        self.assertListEqual(merged['shared']['list'], [1, 2])
+        self.assertDictEqual(merged['shared']['nested'], {'a': 1, 'c': 3})
+        # branches not affected by the merge are shared
+        self.assertIs(merged['unchanged'], d1['unchanged'])
+
+    def test_merge_many(self):
+        dicts = [{'Procedure': {'Pharmaceuticals': {f'drug{i}': {'Dose': i}}},
+                  'Authors': [f'author{i}'], 'Name': 'test'} for i in range(5)]
+        dicts_copy = copy.deepcopy(dicts)
+
+        expected = dicts[0]
+        for d in dicts[1:]:
+            expected = merge_dict(expected, d)
+
+        self.assertDictEqual(merge_many(dicts), expected)
+        self.assertListEqual(dicts, dicts_copy)
+
+    def test_merge_many_conflict(self):
+        with self.assertRaises(ValueError):
+            merge_many([{'a': {'b': 1}}, {'a': {'b': 2}}])
@@ -71,3 +71,57 @@ def generate_example_csv_file(mode='simple'):
         raise ValueError(f'unknown mode {mode}')
 
     return file_path
+
+
+def generate_example_nwb_files(folder, n_files=4):
+    """
+    Create nwb files containing subject, session, electrode and recording information
+
+    Files alternate between two subjects, each file belongs to a separate session.
+
+    Parameters
+    ----------
+    folder: (str, path)
+        folder in which the files are created. Created if it does not exist.
+    n_files: int
+        number of files to create. Default: 4
+
+    Returns
+    -------
+    list
+        paths of the generated files
+    """
+    from datetime import datetime, timezone
+
+    import numpy as np
+    from pynwb import NWBFile, NWBHDF5IO
+    from pynwb.ecephys import ElectricalSeries
+    from pynwb.file import Subject
+
+    folder = pathlib.Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+
+    files = []
+    for i in range(n_files):
+        nwbfile = NWBFile(session_description=f'session {i}', identifier=f'file{i}',
+                          session_start_time=datetime(2020, 1, 1, tzinfo=timezone.utc),
+                          session_id=f'ses{i}', institution='INT', lab='NeuroPSI',
+                          experimenter=['Doe, John'])
+        nwbfile.subject = Subject(subject_id=f'mouse{i % 2}', species='Mus musculus', sex='F',
+                                  age='P90D')
+        device = nwbfile.create_device(name=f'probe{i % 2}')
+        group = nwbfile.create_electrode_group(name='shank0', description='shank',
+                                               location='CA1', device=device)
+        for contact in range(3):
+            nwbfile.add_electrode(x=0., y=float(contact), z=0., imp=1e6, location='CA1',
+                                  group=group, filtering='none')
+        electrodes = nwbfile.create_electrode_table_region(list(range(3)), 'all electrodes')
+        nwbfile.add_acquisition(ElectricalSeries(name='recording', data=np.zeros((10, 3)),
+                                                 electrodes=electrodes, rate=30000.))
+
+        path = folder / f'file{i}.nwb'
+        with NWBHDF5IO(str(path), 'w') as io:
+            io.write(nwbfile)
+        files.append(path)
+
+    return files
@@ -1,22 +1,43 @@
-import copy
 import json
 import os
+from collections import namedtuple
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
+from bep032tools.generator.atomic import AtomicGroup, atomic_open
 
-def save_tsv(dataframe, path_to_save):
+# maximal number of conflicts listed in the error message of `merge_dfs_by_index`
+MAX_REPORTED_CONFLICTS = 20
+
+Conflict = namedtuple('Conflict', ['index', 'column', 'left', 'right'])
+
+# options used by pandas when writing a csv file to a path
+TSV_OPEN_KWARGS = dict(encoding='utf-8', newline='')
+
+
+def save_tsv(dataframe, path_to_save, store=None, durability='full'):
     """
-    Append or create a tsv file corresponding of dataframe data
+    Append or create a tsv file corresponding of dataframe data. The file is replaced
+    atomically, see `atomic.AtomicGroup`.
+
     Parameters
     ----------
     dataframe: dataframe
         dataframe to save in a TSV format
     path_to_save: str
         path to save the TSV file
+    store: MetadataStore
+        if provided, the data is merged into the pending content of the store instead of being
+        written directly. Default: None
+    durability: str
+        see `atomic.AtomicGroup`. Ignored if a store is provided. Default: 'full'
 
     """
+    if store is not None:
+        return store.save_tsv(dataframe, path_to_save)
+
     path_to_save = path_to_save.with_suffix('.tsv')
 
     # Check if path exist and if the file is empty
@@ -26,16 +47,16 @@ def save_tsv(dataframe, path_to_save):
         # transforming all indices to str for comparison
         existing_df.set_index(existing_df.index.astype(str), inplace=True)
         dataframe.set_index(dataframe.index.astype(str), inplace=True)
-        merged_dfs = merge_dfs_by_index(existing_df, dataframe)
-        merged_dfs.to_csv(path_to_save, sep="\t", index=True)
+        dataframe = merge_dfs_by_index(existing_df, dataframe)
 
-    else:
-        dataframe.to_csv(path_to_save, sep="\t", index=True)
+    with atomic_open(path_to_save, durability=durability, **TSV_OPEN_KWARGS) as tsv_file:
+        dataframe.to_csv(tsv_file, sep="\t", index=True)
 
 
-def save_json(data_dict, path_to_save):
+def save_json(data_dict, path_to_save, store=None, durability='full'):
     """
-    Append or create a json file corresponding of dict data
+    Append or create a json file corresponding of dict data. The file is replaced atomically,
+    see `atomic.AtomicGroup`.
 
     Parameters
     ----------
@@ -45,18 +66,174 @@ def save_json(data_dict, path_to_save):
     path_to_save: str
         path to save the JSON file
 
+    store: MetadataStore
+        if provided, the data is merged into the pending content of the store instead of being
+        written directly. Default: None
+
+    durability: str
+        see `atomic.AtomicGroup`. Ignored if a store is provided. Default: 'full'
+
     """
+    if store is not None:
+        return store.save_json(data_dict, path_to_save)
+
     path_to_save = path_to_save.with_suffix('.json')
 
     if Path(path_to_save).exists():
         with open(path_to_save, 'r') as json_file:
             data_existing = json.load(json_file)
-            new_dict = merge_dict(data_existing, data_dict)
-        with open(path_to_save, 'w+') as json_file:
-            json.dump(new_dict, json_file, indent='  ')
-    else:
-        with open(path_to_save, 'w') as json_file:
-            json.dump(data_dict, json_file, indent='  ')
+            data_dict = merge_dict(data_existing, data_dict)
+
+    with atomic_open(path_to_save, durability=durability) as json_file:
+        json.dump(data_dict, json_file, indent='  ')
+
+
+def metadata_file_exists(path, store=None):
+    """
+    Check if a metadata file exists or is pending in a store
+
+    Parameters
+    ----------
+    path: (str, path)
+        path of the metadata file
+    store: MetadataStore
+        store to check for pending content. Default: None
+
+    Returns
+    -------
+    bool
+        True if the file exists
+    """
+    if store is not None:
+        return store.exists(path)
+    return Path(path).exists()
+
+
+class MetadataStore:
+    """
+    Buffer for the metadata files written during a generation run.
+
+    Content saved to a TSV or JSON file is merged with the pending content of the file in memory,
+    with the same semantics as `save_tsv` and `save_json`. Existing files are read only once, and
+    each file is written only once, when calling `flush`.
+
+    Values of TSV files are compared in the form they are written, i.e. as strings, such that
+    saving the same dataframe twice does not result in a conflict. The content saved to a JSON
+    file is collected and merged in a single pass when flushing (see `merge_many`), such that
+    conflicting JSON content is only reported by `flush`.
+
+    The store can be used as a context manager, which flushes the pending content on exit.
+
+    Parameters
+    ----------
+    durability: str
+        durability of the written files, see `atomic.AtomicGroup`. Default: 'full'
+    """
+
+    def __init__(self, durability='full'):
+        self.durability = durability
+        self.tsv = {}
+        # content of each json file to be merged, starting with the content of the existing file
+        self.json = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+    def exists(self, path):
+        """
+        Check if a metadata file is pending or exists on disk
+
+        Parameters
+        ----------
+        path: (str, path)
+            path of the metadata file
+
+        Returns
+        -------
+        bool
+            True if the file exists
+        """
+        path = Path(path)
+        return path in self.tsv or path in self.json or path.exists()
+
+    def save_tsv(self, dataframe, path_to_save):
+        """
+        Merge dataframe data into the pending content of a tsv file, see `save_tsv`
+
+        Parameters
+        ----------
+        dataframe: dataframe
+            dataframe to save in a TSV format
+        path_to_save: str
+            path to save the TSV file
+        """
+        path_to_save = Path(path_to_save).with_suffix('.tsv')
+
+        existing_df = self.tsv.get(path_to_save)
+        if existing_df is None and path_to_save.exists() and os.path.getsize(path_to_save) > 1:
+            existing_df = pd.read_csv(path_to_save, sep='\t', index_col=0, dtype=str)
+            existing_df.set_index(existing_df.index.astype(str), inplace=True)
+
+        new_df = _as_written(dataframe)
+        if existing_df is not None and dataframe.size > 0:
+            self.tsv[path_to_save] = merge_dfs_by_index(existing_df, new_df)
+        else:
+            self.tsv[path_to_save] = new_df
+
+    def save_json(self, data_dict, path_to_save):
+        """
+        Merge dict data into the pending content of a json file, see `save_json`
+
+        Parameters
+        ----------
+        data_dict: dict
+            dict to save in a json format
+        path_to_save: str
+            path to save the JSON file
+        """
+        path_to_save = Path(path_to_save).with_suffix('.json')
+
+        if path_to_save not in self.json:
+            self.json[path_to_save] = []
+            if path_to_save.exists():
+                with open(path_to_save, 'r') as json_file:
+                    self.json[path_to_save].append(json.load(json_file))
+
+        # shallow copy, such that later changes of the top level of the dict are not saved
+        self.json[path_to_save].append(dict(data_dict))
+
+    def flush(self):
+        """
+        Write all pending content to the metadata files. The files are committed as a single
+        `atomic.AtomicGroup`, i.e. no file is replaced before all of them were written.
+
+        Raises
+        ----------
+        ValueError
+            if the content saved to a JSON file contains contradicting values
+        """
+        json_content = {path: merge_many(dicts) for path, dicts in self.json.items()}
+        with AtomicGroup(self.durability) as group:
+            for path, dataframe in self.tsv.items():
+                with group.open(path, **TSV_OPEN_KWARGS) as tsv_file:
+                    dataframe.to_csv(tsv_file, sep="\t", index=True)
+            for path, data in json_content.items():
+                with group.open(path) as json_file:
+                    json.dump(data, json_file, indent='  ')
+        self.tsv.clear()
+        self.json.clear()
+
+
+def _as_written(dataframe):
+    # convert values and index to the strings written to a tsv file, keeping missing values
+    written = dataframe.astype(str).where(dataframe.notna(), np.nan)
+    written.index = dataframe.index.astype(str)
+    written.index.name = dataframe.index.name
+    return written
 
 
 def merge_dict(original_data, new_data):
@@ -69,6 +246,9 @@ def merge_dict(original_data, new_data):
     Overlapping lists are extended and nested dictionaries are merged
     recursively.
 
+    The input dictionaries are not modified. Only the nested dictionaries and lists changed by
+    the merge are copied, all other values are shared between the inputs and the result.
+
     Parameters
     ----------
     original_data : dict
@@ -82,34 +262,71 @@ def merge_dict(original_data, new_data):
         if the data type of the value is neither iterable or basic dtype
 
     """
-    # deep copying input dictionary to not overwrite existing values in-place
-    result = copy.deepcopy(original_data)
+    result = dict(original_data)
+    _merge_into(result, new_data, owned={id(result)})
+    return result
+
+
+def merge_many(dicts):
+    """
+    Merge multiple dictionaries in a single pass, see `merge_dict`.
+
+    Equivalent to merging the dictionaries one after the other, but each nested dictionary and
+    list of the result is copied at most once.
+
+    Parameters
+    ----------
+    dicts : iterable
+        dictionaries to merge
+
+    Returns
+    ----------
+    dict
+        the merged content
+
+    Raises
+    ----------
+    ValueError
+        if the dictionaries contain contradicting values
+    """
+    result = {}
+    owned = {id(result)}
+    for data in dicts:
+        _merge_into(result, data, owned)
+    return result
+
+
+def _merge_into(target, new_data, owned):
+    # merge `new_data` into `target` in place. Nested dictionaries and lists are copied before
+    # being modified unless they were created by the merge, i.e. their id is in `owned`
     for key in new_data.keys():
-        if key not in original_data:
+        if key not in target:
             # new entry that does not exist -> just added it
-            result[key] = new_data[key]
-        else:
-            # deal with simple data types
-            if not isinstance(original_data[key], (list, dict)):
-                if new_data[key] == original_data[key]:
-                    continue
-                else:
-                    # contradicting values can not be merged
-                    raise ValueError(f"Error different values for the same key "
-                                     f"{key}: {new_data[key]} "
-                                     f"{original_data[key]}")
-
-            # merge lists by concatenation of values
-            if type(original_data[key]) == list:
-                result[key].extend(new_data[key])
-            # merge dictionaries recursively
-            elif type(original_data[key]) == dict:
-                result[key] = merge_dict(result[key], new_data[key])
+            target[key] = new_data[key]
+            continue
+
+        existing = target[key]
+        # deal with simple data types
+        if not isinstance(existing, (list, dict)):
+            if new_data[key] == existing:
+                continue
             else:
-                raise ValueError(f"Can not merge unexpected data type: "
-                                 f"{type(original_data[key])}")
+                # contradicting values can not be merged
+                raise ValueError(f"Error different values for the same key "
+                                 f"{key}: {new_data[key]} "
+                                 f"{existing}")
 
-    return result
+        if id(existing) not in owned:
+            existing = type(existing)(existing)
+            owned.add(id(existing))
+            target[key] = existing
+
+        # merge lists by concatenation of values
+        if isinstance(existing, list):
+            existing.extend(new_data[key])
+        # merge dictionaries recursively
+        else:
+            _merge_into(existing, new_data[key], owned)
 
 
 def merge_dfs_by_index(df1, df2):
@@ -142,14 +359,47 @@ def merge_dfs_by_index(df1, df2):
         raise ValueError('Dataframes have incompatible indexes: '
                          f'{df1.index.name} != {df2.index.name}.')
 
-    # check for contradicting values by comparing A+B with B+A
-    left_combine = df1.combine_first(df2)
-    right_combine = df2.combine_first(df1)
+    conflicts = find_conflicts(df1, df2)
+    if conflicts:
+        report = '\n'.join(f'  {c.index!r}, {c.column!r}: {c.left!r} != {c.right!r}'
+                           for c in conflicts[:MAX_REPORTED_CONFLICTS])
+        if len(conflicts) > MAX_REPORTED_CONFLICTS:
+            report += f'\n  ... and {len(conflicts) - MAX_REPORTED_CONFLICTS} more'
+        raise ValueError(f'Dataframes have incompatible values (index, column):\n{report}')
+
+    merged = df2.combine_first(df1)
+    # recent pandas versions preserve the column order of the calling dataframe
+    return merged[df1.columns.union(df2.columns)]
 
-    # ignoring dtypes when checking equality
-    if not left_combine.astype(object).equals(right_combine.astype(object)):
-        raise ValueError('Dataframes have incompatible values: '
-                         f'{left_combine.compare(right_combine)}')
 
-    return right_combine
+def find_conflicts(df1, df2):
+    """
+    Find the cells of two dataframes containing different values.
+
+    Only cells present and not missing in both dataframes (matched by index and column labels)
+    are compared, such that the memory used is proportional to the overlap of the dataframes.
+
+    Parameters
+    ----------
+    df1: dataframe
+        first dataframe
+    df2: dataframe
+        second dataframe
+
+    Returns
+    -------
+    list
+        `Conflict` tuples (index, column, left, right) naming the cell and the values of df1
+        (left) and df2 (right)
+    """
+    index = df1.index.intersection(df2.index)
+    columns = df1.columns.intersection(df2.columns)
+    if index.empty or columns.empty:
+        return []
+
+    left = df1.loc[index, columns].to_numpy(dtype=object)
+    right = df2.loc[index, columns].to_numpy(dtype=object)
+    differ = pd.notna(left) & pd.notna(right) & (left != right)
 
+    return [Conflict(index[i], columns[j], left[i, j], right[i, j])
+            for i, j in zip(*np.nonzero(differ))]
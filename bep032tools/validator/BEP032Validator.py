@@ -1,12 +1,75 @@
 import os
 import os.path as op
 import re
+import json
+import time
+import hashlib
 import argparse
 import pathlib
+import posixpath
+import tarfile
+import zipfile
+import threading
+from collections import namedtuple
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 from bep032tools.rulesStructured import RULES_SET
 
+# name of the file storing the results of previous validation runs (see `is_valid`)
+MANIFEST_FILENAME = '.bep032_validation_cache'
+MANIFEST_VERSION = 2
+# name of the file storing content digests of the files created by the generator
+DIGEST_INDEX_FILENAME = '.bep032_digest_index'
+# name of the journal of an ongoing generation run
+JOURNAL_FILENAME = '.bep032_generation_journal'
+# name of the file listing the files written by the nwb converter
+WRITTEN_FILES_FILENAME = '.bep032_written_files'
+# bookkeeping files of bep032tools, ignored at the top level of a data set
+IGNORED_FILENAMES = (MANIFEST_FILENAME, DIGEST_INDEX_FILENAME, JOURNAL_FILENAME,
+                     WRITTEN_FILES_FILENAME)
+# directories modified less than this many nanoseconds before a validation run are not cached,
+# since further modifications within the timestamp resolution of the file system would go unnoticed
+RACY_WINDOW_NS = 2 * 10 ** 9
+
+
+class ErrorRecord(namedtuple('ErrorRecord', ['level', 'path', 'rule', 'kind'])):
+    """
+    Description of a single violation of the BIDS-animal-ephys specifications
+
+    Parameters
+    ----------
+    level: int or None
+        level of the rules that were applied, i.e. the depth of the checked directory with
+        respect to the root of the data set
+    path: str
+        path of the offending file or directory, or of the directory in which a mandatory
+        file or folder is missing
+    rule: list or None
+        the mandatory rule that is not fulfilled; None for naming errors
+    kind: str
+        type of the error, one of the keys of `ErrorRecord.MESSAGES`
+    """
+    __slots__ = ()
 
-def is_valid(input_directory):
+    MESSAGES = {
+        'missing_input': "Input folder does not exist: {path}",
+        'unexpected_level': "Unexpected folder level : {path}",
+        'mandatory_folder': "Mandatory folder not found for this rule : {rule}",
+        'folder_naming': "Naming rule not respected for this directory : {path}",
+        'file_naming': "Naming rule not respected for this file : {name}",
+        'mandatory_file': "Mandatory file not found for this rule : {rule}",
+    }
+
+    @property
+    def message(self):
+        return self.MESSAGES[self.kind].format(path=self.path, rule=self.rule,
+                                               name=op.basename(self.path))
+
+    def __str__(self):
+        return self.message
+
+
+def is_valid(input_directory, workers=1, incremental=False):
     """
     Checks the validity of a data set with respect to the BIDS-animal-ephys specifications.
     The specifications that define what is checked by this function is available in the following document:
@@ -17,6 +80,10 @@ def is_valid(input_directory):
     ----------
     input_directory : string
         Name of the root directory containing the data set to be checked
+    workers : int
+        see `iter_errors`
+    incremental : bool
+        see `iter_errors`
 
     Returns
     -------
@@ -27,102 +94,475 @@ def is_valid(input_directory):
 
         ``list`` : List of errors (empty if the data set is valid)
     """
+    error_list = [error.message for error in
+                  iter_errors(input_directory, workers=workers, incremental=incremental)]
 
+    # if there are no errors, the data set is valid!
+    valid = len(error_list) == 0
+
+    return valid, error_list
+
+
+def iter_errors(input_directory, workers=1, incremental=False):
+    """
+    Checks a data set with respect to the BIDS-animal-ephys specifications and yields the
+    errors as soon as they are found.
+
+    Stopping the iteration early stops the validation, e.g. to fail fast on the first error.
+
+    Parameters
+    ----------
+    input_directory : string
+        Name of the root directory containing the data set to be checked. This can also be a tar
+        or zip archive of the data set, which is checked without extracting it (see
+        `walk_archive`). `workers` and `incremental` do not apply to archives.
+    workers : int
+        Number of threads used to check the top-level (subject) directories of the data set
+        concurrently. Errors are reported in the same order as for a serial check. Default: 1
+    incremental : bool
+        Reuse the results of the previous incremental run for all directories that were not
+        modified since then. The results are stored in a `.bep032_validation_cache` manifest at the
+        root of the data set, which is otherwise ignored by the validation. The manifest is only
+        updated if the iteration is completed. Default: False
+
+    Yields
+    -------
+    ErrorRecord
+        description of each error found in the data set
+    """
     input_directory = pathlib.Path(input_directory).resolve()
 
-    # count the number of / or \ in the directory name to estimate its "depth"
-    initial_depth = len(input_directory.parents)
+    if not input_directory.exists():
+        yield ErrorRecord(None, str(input_directory), None, 'missing_input')
+        return
+
+    if is_archive(input_directory):
+        for root, depth, dirs, files in walk_archive(str(input_directory)):
+            yield from validate_directory(root, depth, dirs, files)
+        return
+
+    root = str(input_directory)
+    dirs, files, subdirs = scan_directory(root)
+    files = [f for f in files if f not in IGNORED_FILENAMES]
+    yield from validate_directory(root, 0, dirs, files)
+
+    if incremental:
+        records = {}
+        iter_tree = partial(_iter_tree_incremental, manifest=load_manifest(root), records=records,
+                            racy_limit=time.time_ns() - RACY_WINDOW_NS)
+    else:
+        iter_tree = _iter_tree
+
+    # subject directories are independent of each other and can be checked concurrently
+    if workers > 1 and len(subdirs) > 1:
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = [executor.submit(lambda top: list(iter_tree(top, stop=stop)), subdir)
+                   for subdir in subdirs]
+        try:
+            for future in futures:
+                yield from future.result()
+        finally:
+            # abort pending and running subtrees in case the iteration is stopped early
+            stop.set()
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+    else:
+        for subdir in subdirs:
+            yield from iter_tree(subdir)
+
+    if incremental:
+        save_manifest(root, records)
+
+
+def validate_directory(root, depth, dirs, files, rules=None):
+    """
+    Check the content of a single directory against the rules of its level
+
+    Parameters
+    ----------
+    root: str
+        path of the directory
+    depth: int
+        level of the directory with respect to the root of the data set
+    dirs: list
+        names of the sub-directories of the directory
+    files: list
+        names of the files of the directory
+    rules: CompiledRuleSet
+        rules to check the directory against. Default: COMPILED_RULES_SET
+
+    Returns
+    ----------
+    list
+        List of ErrorRecord (empty if the directory is valid)
+    """
+    if rules is None:
+        rules = COMPILED_RULES_SET
 
     error_list = []
 
-    if not input_directory.exists():
-        error_list.append(f"Input folder does not exist: {input_directory}")
-
-    # walk through the directory tree using the os.walk function
-    for ind, (root, dirs, files) in enumerate(os.walk(input_directory)):
-        # estimate at which level we are
-        depth = len(pathlib.Path(root).resolve().parents) - initial_depth
-
-        ###
-        # extract rules for this level!
-        ###
-        if depth not in range(len(RULES_SET)):
-            error_list.append(f"Unexpected folder level : {root}")
-            continue
-        currentdepth_rules = RULES_SET[depth]
-
-        ###
-        # 1.check whether the "mandatory Folders" are present at this level
-        #
-        ###
-        if currentdepth_rules["mandatory_folders"]:
-            # loop over rules, each rule corresponding to one mandatory folder
-            for current_mandatoryfolder_rule in currentdepth_rules[
-                    "mandatory_folders"]:
-                # create the list of regexp
-                list_of_mandatory_folders = build_rule_regexp(current_mandatoryfolder_rule)
-                for mandatory_folders in list_of_mandatory_folders:
-                    dir_res = [search(mandatory_folders, d) is None for d in dirs]
-                    if all(dir_res):
-                        error_list.append(
-                            "Mandatory folder not found for this rule : {}".
-                            format(current_mandatoryfolder_rule))
-
-        ###
-        # 2. check whether the rules are followed for the folders at this level ("authorized folders")
-        #
-        ###
-        for folder in dirs:
-            folder_errs = [
-                search(authorized_folders_rule, folder) is None
-                for authorized_folders_rule in build_rule_regexp(
-                    currentdepth_rules["authorized_folders"])
-            ]
-            # if none of the authorized rules is respected, raise an error
-            if all(folder_errs):
-                error_list.append("Naming rule not respected for this directory : {}"
-                                  "".format(op.join(root, folder)))
-
-        ###
-        # 3. check whether rules are followed for files within the folder at this level ("authorized data and
-        #    metadata files")
-        ###
-        for current_file in files:
-            file_res = list()
-            for rules in currentdepth_rules["authorized_metadata_files"]:
-                file_res.extend([
-                    search(authorized_metadata_file_rule, current_file) is None
-                    for authorized_metadata_file_rule in build_rule_regexp(rules)
-                ])
-
-            for rules in currentdepth_rules["authorized_data_files"]:
-                file_res.extend([
-                    search(authorized_data_file_rule, current_file) is None
-                    for authorized_data_file_rule in build_rule_regexp(rules)
-                ])
-                # if none of the authorized rules is respected, raise an error
-
-            if all(file_res):
-                error_list.append("Naming rule not respected for this file : {}".format(current_file))
-
-        ###
-        # 4. check whether the "mandatory files" are actually present at this level!
-        ###
-        if len(currentdepth_rules["mandatory_files"]) > 0:
-            # loop over rules, each rule corresponding to one mandatory file
-            for current_mandatoryfiles_rule in currentdepth_rules["mandatory_files"]:
-                list_of_mandatory_files = build_rule_regexp(current_mandatoryfiles_rule)
-                for mandatory_files in list_of_mandatory_files:
-                    file_res = [search(mandatory_files, file) is None for file in files]
-                    if all(file_res):
-                        error_list.append(
-                            "Mandatory file not found for this rule : {}".
-                            format(current_mandatoryfiles_rule))
+    ###
+    # extract rules for this level!
+    ###
+    if depth not in range(len(rules)):
+        error_list.append(ErrorRecord(depth, root, None, 'unexpected_level'))
+        return error_list
+    currentdepth_rules = rules[depth]
+
+    ###
+    # 1.check whether the "mandatory Folders" are present at this level
+    #
+    ###
+    # loop over rules, each rule corresponding to one mandatory folder
+    for current_mandatoryfolder_rule, mandatory_folders_regexps in currentdepth_rules[
+            "mandatory_folders"]:
+        for mandatory_folders in mandatory_folders_regexps:
+            if not any(mandatory_folders.search(d) for d in dirs):
+                error_list.append(ErrorRecord(depth, root, current_mandatoryfolder_rule,
+                                              'mandatory_folder'))
+
+    ###
+    # 2. check whether the rules are followed for the folders at this level ("authorized folders")
+    #
+    ###
+    for folder in dirs:
+        # if none of the authorized rules is respected, raise an error
+        if rules.classify_folder(depth, folder) is None:
+            error_list.append(ErrorRecord(depth, op.join(root, folder), None, 'folder_naming'))
+
+    ###
+    # 3. check whether rules are followed for files within the folder at this level
+    #    ("authorized data and metadata files")
+    ###
+    for current_file in files:
+        # if none of the authorized rules is respected, raise an error
+        if rules.classify_file(depth, current_file) is None:
+            error_list.append(ErrorRecord(depth, op.join(root, current_file), None, 'file_naming'))
+
+    ###
+    # 4. check whether the "mandatory files" are actually present at this level!
+    ###
+    # loop over rules, each rule corresponding to one mandatory file
+    for current_mandatoryfiles_rule, mandatory_files_regexps in currentdepth_rules[
+            "mandatory_files"]:
+        for mandatory_files in mandatory_files_regexps:
+            if not any(mandatory_files.search(file) for file in files):
+                error_list.append(ErrorRecord(depth, root, current_mandatoryfiles_rule,
+                                              'mandatory_file'))
+
+    return error_list
+
+
+def scan_directory(path):
+    """
+    List the content of a single directory using os.scandir
 
-    # if there are no errors, the data set is valid!
-    valid = len(error_list) == 0
+    Entries are sorted by name to make the walk independent of the file system order. As for
+    os.walk, symbolic links to directories are listed as directories but are not descended into
+    and directories that can not be listed are treated as empty.
 
-    return valid, error_list
+    Parameters
+    ----------
+    path: str
+        path of the directory to list
+
+    Returns
+    ----------
+    tuple
+        a tuple of size 3 containing the names of the sub-directories, the names of the files and
+        the paths of the sub-directories to descend into
+    """
+    dirs, files, subdirs = [], [], []
+    try:
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except OSError:
+        return dirs, files, subdirs
+
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        if is_dir:
+            dirs.append(entry.name)
+            if not entry.is_symlink():
+                subdirs.append(entry.path)
+        else:
+            files.append(entry.name)
+
+    return dirs, files, subdirs
+
+
+def walk_directory(top, depth=0):
+    """
+    Walk a directory tree top-down, keeping track of the level of each directory
+
+    Parameters
+    ----------
+    top: str
+        path of the directory to start from
+    depth: int
+        level of `top` with respect to the root of the data set. Default: 0
+
+    Yields
+    ----------
+    tuple
+        (root, depth, dirs, files) for each directory of the tree
+    """
+    dirs, files, subdirs = scan_directory(top)
+    yield top, depth, dirs, files
+    for subdir in subdirs:
+        yield from walk_directory(subdir, depth + 1)
+
+
+def is_archive(path):
+    """
+    Check whether a path points to a tar or zip archive
+
+    Parameters
+    ----------
+    path: str
+        path to check
+
+    Returns
+    ----------
+    bool
+        True if `path` is a file in tar or zip format
+    """
+    return op.isfile(path) and (zipfile.is_zipfile(path) or tarfile.is_tarfile(path))
+
+
+def read_archive_index(path):
+    """
+    Build the directory tree of a tar or zip archive from its member index
+
+    Only the member headers are read: for zip archives the central directory, for uncompressed
+    tar archives the header blocks, skipping the data blocks. Compressed tar archives have to be
+    decompressed to reach all headers. Directories that have no member of their own are inferred
+    from the paths of their content. Symbolic links to directories of the archive are listed as
+    directories, but are not descended into, as for data sets on disk.
+
+    If the archive contains a single top-level directory and no top-level files, this directory
+    is considered as the root of the data set, unless it is itself an authorized top-level folder
+    of a data set (e.g. the only subject folder of an archived data set).
+
+    Parameters
+    ----------
+    path: str
+        path of the archive
+
+    Returns
+    ----------
+    tuple
+        a tuple of size 2 containing the path components of the root of the data set within the
+        archive and a dictionary mapping the path components of each directory to a dictionary
+        of its entries. Entries map to 'dir', 'dirlink' or 'file'.
+    """
+    tree = {(): {}}
+    links = []
+
+    def add_entry(parts, kind):
+        for idx in range(len(parts)):
+            parent, name = parts[:idx], parts[idx]
+            if idx < len(parts) - 1 or kind == 'dir':
+                tree[parent][name] = 'dir'
+                tree.setdefault(parts[:idx + 1], {})
+            else:
+                # an entry that also has content is a directory, whatever the member order
+                tree[parent].setdefault(name, kind)
+
+    def split_name(name):
+        return tuple(part for part in name.replace('\\', '/').split('/') if part not in ('', '.'))
+
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                parts = split_name(info.filename)
+                if parts:
+                    add_entry(parts, 'dir' if info.is_dir() else 'file')
+    else:
+        with tarfile.open(path) as archive:
+            for member in archive:
+                parts = split_name(member.name)
+                if not parts:
+                    continue
+                if member.isdir():
+                    add_entry(parts, 'dir')
+                else:
+                    add_entry(parts, 'file')
+                    if member.issym():
+                        links.append((parts, member.linkname))
+
+    for parts, linkname in links:
+        target = split_name(posixpath.normpath(posixpath.join('/'.join(parts[:-1]), linkname)))
+        if not posixpath.isabs(linkname) and target in tree \
+                and tree[parts[:-1]][parts[-1]] == 'file':
+            tree[parts[:-1]][parts[-1]] = 'dirlink'
+
+    base = ()
+    if list(tree[()].values()) == ['dir'] and \
+            COMPILED_RULES_SET.classify_folder(0, next(iter(tree[()]))) is None:
+        base = tuple(tree[()])
+
+    return base, tree
+
+
+def walk_archive(path):
+    """
+    Walk the directory tree of a tar or zip archive without extracting it
+
+    Parameters
+    ----------
+    path: str
+        path of the archive
+
+    Yields
+    ----------
+    tuple
+        (root, depth, dirs, files) for each directory of the data set in the archive, root being
+        the path of the directory prefixed by the path of the archive
+    """
+    base, tree = read_archive_index(path)
+
+    def walk(parts, depth):
+        entries = tree.get(parts, {})
+        names = sorted(entries)
+        dirs = [name for name in names if entries[name] != 'file']
+        files = [name for name in names if entries[name] == 'file']
+        yield op.join(path, *parts), depth, dirs, files
+        for name in dirs:
+            if entries[name] == 'dir':
+                yield from walk(parts + (name,), depth + 1)
+
+    yield from walk(base, 0)
+
+
+def _iter_tree(top, depth=1, stop=None):
+    for root, current_depth, dirs, files in walk_directory(top, depth):
+        if stop is not None and stop.is_set():
+            return
+        yield from validate_directory(root, current_depth, dirs, files)
+
+
+def _iter_tree_incremental(top, depth=1, manifest=None, records=None, racy_limit=None, stop=None):
+    stack = [(top, depth)]
+    while stack:
+        if stop is not None and stop.is_set():
+            return
+        root, current_depth = stack.pop()
+        signature = directory_signature(root)
+        cached = manifest.get(root) if manifest else None
+        if signature is not None and cached is not None and cached['signature'] == signature:
+            errors = [ErrorRecord(*error) for error in cached['errors']]
+            subdir_names = cached['subdirs']
+        else:
+            dirs, files, subdirs = scan_directory(root)
+            errors = validate_directory(root, current_depth, dirs, files)
+            subdir_names = [op.basename(subdir) for subdir in subdirs]
+            # the target of a symbolic link can change without modifying the directory itself
+            if len(subdirs) != len(dirs):
+                signature = None
+
+        # directories modified during or right before this run are checked again next time
+        if records is not None and signature is not None \
+                and (racy_limit is None or signature[0] < racy_limit):
+            records[root] = {'signature': signature, 'errors': errors, 'subdirs': subdir_names}
+
+        yield from errors
+        # push in reverse order to visit sub-directories in the same order as walk_directory
+        stack.extend((op.join(root, name), current_depth + 1) for name in reversed(subdir_names))
+
+
+def directory_signature(path):
+    """
+    Signature of a directory used to detect modifications between incremental validation runs
+
+    Adding, removing or renaming an entry of a directory updates its modification time. The inode
+    number detects directories that were replaced and the link count tracks the number of
+    sub-directories on most file systems. The content of the entries is not relevant for the
+    validation.
+
+    Parameters
+    ----------
+    path: str
+        path of the directory
+
+    Returns
+    ----------
+    list or None
+        [mtime in ns, inode, link count]; None if the directory can not be accessed
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_ino, stat.st_nlink]
+
+
+def _rules_fingerprint():
+    return hashlib.sha1(repr(RULES_SET).encode()).hexdigest()
+
+
+def load_manifest(root):
+    """
+    Load the directory records of a previous incremental validation run
+
+    Parameters
+    ----------
+    root: str
+        root directory of the data set
+
+    Returns
+    ----------
+    dict
+        records of the validated directories by path. Empty if no usable manifest exists, e.g. if
+        it was created by a different version of the validation rules or for a data set located
+        elsewhere.
+    """
+    try:
+        with open(op.join(root, MANIFEST_FILENAME), 'r') as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION \
+            or manifest.get('root') != root or manifest.get('rules') != _rules_fingerprint():
+        return {}
+
+    return manifest.get('directories', {})
+
+
+def save_manifest(root, records):
+    """
+    Save the directory records of an incremental validation run
+
+    The manifest is written to a temporary file first and then renamed, such that an interrupted
+    run never leaves a truncated manifest behind.
+
+    Parameters
+    ----------
+    root: str
+        root directory of the data set
+    records: dict
+        records of the validated directories by path
+    """
+    manifest = {'version': MANIFEST_VERSION,
+                'root': root,
+                'rules': _rules_fingerprint(),
+                'directories': records}
+    manifest_path = op.join(root, MANIFEST_FILENAME)
+    tmp_path = manifest_path + '.tmp'
+    try:
+        with open(tmp_path, 'w') as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.replace(tmp_path, manifest_path)
+    except OSError:
+        # a read-only data set can still be validated, only without caching
+        if op.exists(tmp_path):
+            os.remove(tmp_path)
 
 
 def search(rules, where):
@@ -174,6 +614,129 @@ def build_rule_regexp(rules):
     return list_of_rules
 
 
+class CompiledRuleSet:
+    """
+    Precompiled representation of a set of rules as defined in rulesStructured.py
+
+    For each level of the hierarchy, the authorized folder rules are merged into a single
+    alternation regexp and the authorized data and metadata file rules into another one. Each
+    alternative is wrapped into a named group, such that a single search call is sufficient to
+    decide whether a name is authorized and which rule it matches. Mandatory rules are compiled
+    individually, since each of them has to be checked for presence separately.
+
+    Parameters
+    ----------
+    rules_set: list
+        list of rule dictionaries, one per level (see `bep032tools.rulesStructured.RULES_SET`)
+    """
+
+    def __init__(self, rules_set=RULES_SET):
+        self.levels = [self._compile_level(level_rules) for level_rules in rules_set]
+
+    def __len__(self):
+        return len(self.levels)
+
+    def __getitem__(self, depth):
+        return self.levels[depth]
+
+    @staticmethod
+    def _compile_level(level_rules):
+        folder_patterns = [('folder', pattern) for pattern in
+                           build_rule_regexp(level_rules['authorized_folders'])]
+        file_patterns = []
+        for kind, key in [('metadata', 'authorized_metadata_files'),
+                          ('data', 'authorized_data_files')]:
+            for rules in level_rules[key]:
+                file_patterns.extend([(kind, pattern) for pattern in build_rule_regexp(rules)])
+
+        folder_regexp, folder_groups = merge_rule_regexp(folder_patterns)
+        file_regexp, file_groups = merge_rule_regexp(file_patterns)
+
+        return {
+            'folder_regexp': folder_regexp,
+            'folder_groups': folder_groups,
+            'file_regexp': file_regexp,
+            'file_groups': file_groups,
+            'mandatory_folders': [(rule, [re.compile(p) for p in build_rule_regexp(rule)])
+                                  for rule in level_rules['mandatory_folders']],
+            'mandatory_files': [(rule, [re.compile(p) for p in build_rule_regexp(rule)])
+                                for rule in level_rules['mandatory_files']],
+        }
+
+    def classify_folder(self, depth, name):
+        """
+        Find the authorized folder rule matched by a folder name
+
+        Parameters
+        ----------
+        depth: int
+            level of the hierarchy the folder is located in
+        name: str
+            name of the folder
+
+        Returns
+        ----------
+        tuple or None
+            ('folder', regexp) of the first matching rule; None if no rule matches
+        """
+        level = self.levels[depth]
+        return _classify(level['folder_regexp'], level['folder_groups'], name)
+
+    def classify_file(self, depth, name):
+        """
+        Find the authorized data or metadata file rule matched by a file name
+
+        Parameters
+        ----------
+        depth: int
+            level of the hierarchy the file is located in
+        name: str
+            name of the file
+
+        Returns
+        ----------
+        tuple or None
+            (kind, regexp) of the first matching rule, kind being 'metadata' or 'data';
+            None if no rule matches
+        """
+        level = self.levels[depth]
+        return _classify(level['file_regexp'], level['file_groups'], name)
+
+
+def merge_rule_regexp(patterns):
+    """
+    Merge a list of regular expressions into a single compiled alternation
+
+    Parameters
+    ----------
+    patterns: list
+        list of (kind, regexp) tuples
+
+    Returns
+    ----------
+    tuple
+        the compiled alternation (None if `patterns` is empty) and a dictionary mapping the
+        name of the group of each alternative to its (kind, regexp) tuple
+    """
+    groups = {f'rule{idx}': pattern for idx, pattern in enumerate(patterns)}
+    if not groups:
+        return None, groups
+    regexp = '|'.join(f'(?P<{name}>{pattern})' for name, (_, pattern) in groups.items())
+    return re.compile(regexp), groups
+
+
+def _classify(regexp, groups, name):
+    if regexp is None:
+        return None
+    match = regexp.search(name)
+    if match is None:
+        return None
+    return groups[match.lastgroup]
+
+
+COMPILED_RULES_SET = CompiledRuleSet(RULES_SET)
+
+
 def main():
     """
     Main file of the BEP032Validator.
@@ -183,15 +746,19 @@ def main():
 
     Usage via command line:
 
-    BEP032Validator.py [-h] [-v] path
+    BEP032Validator.py [-h] [-v] [-j JOBS] [--incremental] [--max-errors N] [--fail-fast] path
 
     positional arguments:
     path
-        Name of the directory that contains the data set to be checked
+        Name of the directory that contains the data set to be checked, or of a tar or zip
+        archive of the data set
 
     optional arguments:
-            -h, --help, -v, --verbose
+            -h, --help, -v, --verbose, -j JOBS, --jobs JOBS, --incremental,
+            --max-errors N, --fail-fast
 
+    Errors are printed as soon as they are found. The exit status is 1 if the data set does not
+    respect the specifications.
     """
 
     parser = argparse.ArgumentParser()
@@ -199,8 +766,26 @@ def main():
                         "--verbose",
                         action="store_true",
                         help="increase output verbosity")
+    parser.add_argument("-j",
+                        "--jobs",
+                        type=int,
+                        default=1,
+                        help="number of subject directories checked in parallel")
+    parser.add_argument("--incremental",
+                        action="store_true",
+                        help="only check directories modified since the last incremental run")
+    parser.add_argument("--max-errors",
+                        type=int,
+                        default=None,
+                        metavar="N",
+                        help="stop the validation after N errors")
+    parser.add_argument("--fail-fast",
+                        action="store_const",
+                        const=1,
+                        dest="max_errors",
+                        help="stop the validation at the first error (same as --max-errors 1)")
     parser.add_argument("directory",
-                        help="Name of the directory to be checked")
+                        help="Name of the directory (or tar/zip archive) to be checked")
     args = parser.parse_args()
 
     try:
@@ -211,17 +796,29 @@ def main():
     if not directory:
         print(f"Directory does not exist: {directory}")
         exit(1)
-    dataset_validity, error_list = is_valid(directory)
-    if dataset_validity:
+
+    errors = iter_errors(directory, workers=args.jobs, incremental=args.incremental)
+    error_count = 0
+    for error in errors:
+        if error_count == 0:
+            print("Attention!\n"
+                  f"{directory} does not respect the BIDS-animal-ephys specifications")
+            if args.verbose:
+                print("\nHere are the errors that have been identified:")
+        error_count += 1
+        if args.verbose:
+            print("  " + error.message, flush=True)
+        if args.max_errors is not None and error_count >= args.max_errors:
+            errors.close()
+            if args.verbose:
+                print(f"\nValidation stopped after {error_count} error(s)")
+            break
+
+    if error_count == 0:
         print("Congratulations!\n"
               f"{directory} respects the BIDS-animal-ephys specifications")
     else:
-        print("Attention!\n" 
-              f"{directory} does not respect the BIDS-animal-ephys specifications")
-        if args.verbose:
-            print("\nHere are the errors that have been identified:")
-            for error_message in error_list:
-                print("  " + error_message)
+        exit(1)
 
 
 if __name__ == "__main__":
@@ -1,9 +1,15 @@
 import os
+import json
+import shutil
+import tarfile
+import tempfile
+import zipfile
 import subprocess as sp
 import unittest
 from unittest import TestCase
 from pathlib import Path
 from bep032tools.validator import BEP032Validator as CHK
+from bep032tools.rulesStructured import RULES_SET
 
 try:
     sp.run(['BEP032Validator', '-h'], stdout=sp.PIPE)
@@ -111,6 +117,208 @@ class Test(TestCase):
                          3)  # check if there is 3 error reported
 
 
+class TestCompiledRuleSet(TestCase):
+
+    def setUp(self):
+        self.rules = CHK.CompiledRuleSet(RULES_SET)
+
+    def test_levels(self):
+        self.assertEqual(len(self.rules), len(RULES_SET))
+
+    def test_classify_file(self):
+        self.assertEqual(self.rules.classify_file(0, 'participants.tsv'),
+                         ('metadata', 'participants(.tsv|.json)'))
+        self.assertEqual(self.rules.classify_file(3, 'sub-1_ses-1_ephys.nix')[0], 'data')
+        self.assertEqual(self.rules.classify_file(3, 'sub-1_ses-1_ephys.json')[0], 'metadata')
+        self.assertIsNone(self.rules.classify_file(3, 'sub-1_ses-1_eys.nix'))
+
+    def test_classify_folder(self):
+        self.assertEqual(self.rules.classify_folder(0, 'sub-enya'),
+                         ('folder', '^sub-([a-zA-Z0-9]+)$'))
+        self.assertIsNone(self.rules.classify_folder(1, 'ses-2020_01'))
+
+    def test_same_result_as_individual_rules(self):
+        # every name of the test datasets has to be accepted by the merged regexp if and only
+        # if it is accepted by one of the individual rules
+        for root, dirs, files in os.walk(Path(dir_path) / "dataset"):
+            for depth, level_rules in enumerate(RULES_SET):
+                file_rules = [r for key in ['authorized_metadata_files', 'authorized_data_files']
+                              for rules in level_rules[key] for r in CHK.build_rule_regexp(rules)]
+                for f in files:
+                    expected = any(CHK.search(r, f) for r in file_rules)
+                    self.assertEqual(self.rules.classify_file(depth, f) is not None, expected)
+                folder_rules = CHK.build_rule_regexp(level_rules['authorized_folders'])
+                for d in dirs:
+                    expected = any(CHK.search(r, d) for r in folder_rules)
+                    self.assertEqual(self.rules.classify_folder(depth, d) is not None, expected)
+
+
+class TestWalker(TestCase):
+
+    def test_walk_depth(self):
+        path = Path(dir_path) / "dataset" / "exp-validMultipleSession"
+        walked = {os.path.relpath(root, path): depth
+                  for root, depth, dirs, files in CHK.walk_directory(str(path))}
+        self.assertEqual(walked['.'], 0)
+        self.assertEqual(walked['sub-enya'], 1)
+        self.assertEqual(walked[os.path.join('sub-enya', 'ses-20200102')], 2)
+        self.assertEqual(walked[os.path.join('sub-enya', 'ses-20200102', 'ephys')], 3)
+        self.assertEqual(len(walked), 6)
+
+    def test_parallel_same_result(self):
+        datasets = Path(dir_path) / "dataset"
+        # the dataset folder itself contains many top-level directories
+        for path in [datasets] + sorted(datasets.iterdir()):
+            self.assertEqual(CHK.is_valid(path, workers=4), CHK.is_valid(path))
+
+
+class TestIterErrors(TestCase):
+
+    def test_records(self):
+        path = Path(dir_path) / "dataset" / "exp-MultipleError"
+        errors = list(CHK.iter_errors(path))
+        self.assertEqual([str(e) for e in errors], CHK.is_valid(path)[1])
+        self.assertEqual(sorted(e.kind for e in errors),
+                         ['mandatory_file', 'mandatory_file', 'mandatory_file'])
+        for error in errors:
+            self.assertTrue(os.path.isdir(error.path))
+            self.assertIn(error.rule, RULES_SET[error.level]['mandatory_files'])
+
+    def test_naming_record(self):
+        path = Path(dir_path) / "dataset" / "exp-nonAuthorizedDataFilesError"
+        error, = CHK.iter_errors(path)
+        self.assertEqual(error.kind, 'file_naming')
+        self.assertEqual(os.path.basename(error.path), 'sub-001_ses-20200101_eys.nix')
+        self.assertIsNone(error.rule)
+
+    def test_missing_input(self):
+        path = Path(dir_path) / "dataset" / "non-existent-folder"
+        error, = CHK.iter_errors(path)
+        self.assertEqual(error.kind, 'missing_input')
+        self.assertIsNone(error.level)
+
+    def test_stop_early(self):
+        datasets = Path(dir_path) / "dataset"
+        for workers in [1, 4]:
+            errors = CHK.iter_errors(datasets, workers=workers)
+            first = next(errors)
+            errors.close()
+            self.assertEqual(first.message, CHK.is_valid(datasets)[1][0])
+
+
+class TestIncremental(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = Path(self.tmp_dir) / "exp-validMultipleSession"
+        shutil.copytree(Path(dir_path) / "dataset" / "exp-validMultipleSession", self.path)
+        # directories modified right before a run are not cached
+        for root, dirs, files in os.walk(self.path):
+            os.utime(root, (1e9, 1e9))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_same_result(self):
+        expected = CHK.is_valid(self.path)
+        self.assertEqual(CHK.is_valid(self.path, incremental=True), expected)
+        self.assertTrue((self.path / CHK.MANIFEST_FILENAME).exists())
+        # the manifest itself is ignored by complete and incremental runs
+        self.assertEqual(CHK.is_valid(self.path), expected)
+        self.assertEqual(CHK.is_valid(self.path, incremental=True, workers=2), expected)
+
+    def test_bookkeeping_files_ignored(self):
+        expected = CHK.is_valid(self.path)
+        for filename in CHK.IGNORED_FILENAMES:
+            (self.path / filename).touch()
+        self.assertEqual(CHK.is_valid(self.path), expected)
+
+    def test_cached_results_reused(self):
+        CHK.is_valid(self.path, incremental=True)
+        manifest_path = self.path / CHK.MANIFEST_FILENAME
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        session = str(self.path.resolve() / "sub-enya" / "ses-20200101")
+        manifest['directories'][session]['errors'] = [[2, session + '/cached', None,
+                                                       'file_naming']]
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f)
+
+        self.assertEqual(CHK.is_valid(self.path, incremental=True),
+                         (False, ['Naming rule not respected for this file : cached']))
+
+    def test_modified_directory_checked(self):
+        CHK.is_valid(self.path, incremental=True)
+        ephys = self.path / "sub-enya" / "ses-20200101" / "ephys"
+        (ephys / "sub-001_ses-20200101_eys.nix").touch()
+
+        expected = CHK.is_valid(self.path)
+        self.assertEqual(len(expected[1]), 1)
+        self.assertEqual(CHK.is_valid(self.path, incremental=True), expected)
+
+
+class TestArchive(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.datasets = Path(dir_path) / "dataset"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def assertSameResult(self, archive, dataset, archive_root):
+        valid, errors = CHK.is_valid(dataset)
+        archive_valid, archive_errors = CHK.is_valid(archive)
+        self.assertEqual(archive_valid, valid)
+        self.assertEqual(archive_errors,
+                         [e.replace(str(dataset), archive_root) for e in errors])
+
+    def test_tar(self):
+        for dataset in sorted(self.datasets.iterdir()):
+            archive = os.path.join(self.tmp_dir, dataset.name + '.tar')
+            with tarfile.open(archive, 'w') as tar:
+                tar.add(dataset, arcname=dataset.name)
+            self.assertSameResult(archive, dataset, os.path.join(archive, dataset.name))
+
+    def test_zip(self):
+        for dataset in sorted(self.datasets.iterdir()):
+            archive = os.path.join(self.tmp_dir, dataset.name + '.zip')
+            with zipfile.ZipFile(archive, 'w') as zf:
+                # no members for directories, these are inferred from the file paths
+                for root, dirs, files in os.walk(dataset):
+                    for f in files:
+                        zf.write(os.path.join(root, f),
+                                 os.path.relpath(os.path.join(root, f), dataset))
+            self.assertSameResult(archive, dataset, archive)
+
+    def test_single_subject(self):
+        # a subject folder at the top level of an archive is part of the data set
+        dataset = Path(self.tmp_dir) / 'single'
+        shutil.copytree(self.datasets / "exp-valid" / "sub-enya", dataset / "sub-enya")
+        archive = os.path.join(self.tmp_dir, 'single.tar')
+        with tarfile.open(archive, 'w') as tar:
+            tar.add(dataset / "sub-enya", arcname='sub-enya')
+        self.assertEqual(CHK.read_archive_index(archive)[0], ())
+        self.assertSameResult(archive, dataset, archive)
+        self.assertFalse(CHK.is_valid(archive)[0])
+
+    def test_tar_symlink(self):
+        dataset = self.datasets / "exp-valid"
+        archive = os.path.join(self.tmp_dir, 'links.tar')
+        with tarfile.open(archive, 'w') as tar:
+            tar.add(dataset, arcname='.')
+            link = tarfile.TarInfo('sub-enya/ses-20200103')
+            link.type = tarfile.SYMTYPE
+            link.linkname = 'ses-20200102'
+            tar.addfile(link)
+        self.assertEqual(CHK.is_valid(archive), (True, []))
+
+    def test_not_an_archive(self):
+        path = self.datasets / "exp-valid" / "participants.tsv"
+        self.assertFalse(CHK.is_archive(str(path)))
+        self.assertEqual(CHK.is_valid(path)[0], False)
+
+
 class TestInputLevels(TestCase):
     @classmethod
     def switch_dir(self, directory):